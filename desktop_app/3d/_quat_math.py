@@ -0,0 +1,53 @@
+"""
+四元数数学内核 - 渲染热路径使用
+可用numba时编译为本地代码，否则以普通Python执行
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils'))
+
+from jit import njit
+
+
+@njit(cache=True, fastmath=True)
+def quat_to_matrix(q, out):
+    """
+    四元数转换为OpenGL旋转矩阵（列主序）
+    
+    Args:
+        q: 四元数数组 [w, x, y, z]
+        out: 长度16的float32输出数组（原地写入）
+    """
+    w = q[0]
+    x = q[1]
+    y = q[2]
+    z = q[3]
+    
+    xx = x * x
+    xy = x * y
+    xz = x * z
+    xw = x * w
+    
+    yy = y * y
+    yz = y * z
+    yw = y * w
+    
+    zz = z * z
+    zw = z * w
+    
+    out[0] = 1.0 - 2.0 * (yy + zz)
+    out[1] = 2.0 * (xy + zw)
+    out[2] = 2.0 * (xz - yw)
+    out[3] = 0.0
+    out[4] = 2.0 * (xy - zw)
+    out[5] = 1.0 - 2.0 * (xx + zz)
+    out[6] = 2.0 * (yz + xw)
+    out[7] = 0.0
+    out[8] = 2.0 * (xz + yw)
+    out[9] = 2.0 * (yz - xw)
+    out[10] = 1.0 - 2.0 * (xx + yy)
+    out[11] = 0.0
+    out[12] = 0.0
+    out[13] = 0.0
+    out[14] = 0.0
+    out[15] = 1.0
@@ -1,14 +1,233 @@
 """
 3D模型定义 - 用于OpenGL渲染的几何体
+
+线宽、光照等渲染状态由渲染器（GLStateCache）统一设置，模型只负责绘制几何。
 """
 from OpenGL.GL import *
-from OpenGL.GLU import *
+import ctypes
 import math
+import numpy as np
+
+
+# 交错顶点格式：颜色以RGBA字节存储（4字节，替代3个float的12字节）
+VERTEX_COLOR = np.dtype([('pos', 'f4', 3), ('col', 'u1', 4)])                          # 16字节
+VERTEX_NORMAL_COLOR = np.dtype([('pos', 'f4', 3), ('normal', 'f4', 3), ('col', 'u1', 4)])  # 28字节
+
+
+def _pack_vertices(positions, colors, normals=None):
+    """
+    打包交错顶点数组
+    
+    Args:
+        positions: (N, 3) 顶点位置
+        colors: (N, 3) 或 (3,) RGB颜色（0~1浮点）
+        normals: (N, 3) 法线，None表示无法线
+        
+    Returns:
+        VERTEX_COLOR 或 VERTEX_NORMAL_COLOR 结构化数组
+    """
+    dtype = VERTEX_COLOR if normals is None else VERTEX_NORMAL_COLOR
+    data = np.empty(len(positions), dtype=dtype)
+    data['pos'] = positions
+    if normals is not None:
+        data['normal'] = normals
+    data['col'][..., :3] = np.round(np.asarray(colors) * 255.0).astype(np.uint8)
+    data['col'][..., 3] = 255
+    return data
+
+
+def _create_buffer(target, data, usage=GL_STATIC_DRAW):
+    """
+    创建并上传一个缓冲区对象
+    
+    Args:
+        target: 缓冲区类型（GL_ARRAY_BUFFER / GL_ELEMENT_ARRAY_BUFFER）
+        data: numpy数组
+        usage: 使用方式提示
+        
+    Returns:
+        缓冲区ID
+    """
+    # 以原始字节上传，兼容结构化dtype
+    raw = np.ascontiguousarray(data).view(np.uint8)
+    
+    buffer_id = glGenBuffers(1)
+    glBindBuffer(target, buffer_id)
+    glBufferData(target, raw.nbytes, raw, usage)
+    glBindBuffer(target, 0)
+    return buffer_id
+
+
+def _cylinder_vertices(r1, r2, h, slices):
+    """
+    生成与gluCylinder等价的三角形带顶点（沿+Z轴，底面半径r1，顶面半径r2）
+    
+    Args:
+        r1: 底面半径
+        r2: 顶面半径
+        h: 高度
+        slices: 圆周细分数
+        
+    Returns:
+        (2*(slices+1), 6) float32数组，每行为 (x, y, z, nx, ny, nz)
+    """
+    angles = np.linspace(0.0, 2.0 * math.pi, slices + 1)
+    sin_a = np.sin(angles)
+    cos_a = np.cos(angles)
+    
+    # 侧面法线带有锥度分量
+    nz = (r1 - r2) / h
+    inv_len = 1.0 / math.sqrt(1.0 + nz * nz)
+    
+    data = np.empty((slices + 1, 2, 6), dtype=np.float32)
+    data[:, 0, 0] = sin_a * r1
+    data[:, 0, 1] = cos_a * r1
+    data[:, 0, 2] = 0.0
+    data[:, 1, 0] = sin_a * r2
+    data[:, 1, 1] = cos_a * r2
+    data[:, 1, 2] = h
+    data[:, :, 3] = (sin_a * inv_len)[:, None]
+    data[:, :, 4] = (cos_a * inv_len)[:, None]
+    data[:, :, 5] = nz * inv_len
+    return data.reshape(-1, 6)
+
+
+def _disk_vertices(radius, slices):
+    """
+    生成与gluDisk(inner=0)等价的三角形带顶点（位于z=0平面，法线+Z）
+    
+    圆心与圆周点交替排列，使圆盘可与圆柱一起以三角形带批量绘制
+    
+    Args:
+        radius: 半径
+        slices: 圆周细分数
+        
+    Returns:
+        (2*(slices+1), 6) float32数组，每行为 (x, y, z, nx, ny, nz)
+    """
+    angles = np.linspace(0.0, 2.0 * math.pi, slices + 1)
+    data = np.zeros((slices + 1, 2, 6), dtype=np.float32)
+    data[:, 0, 0] = np.sin(angles) * radius
+    data[:, 0, 1] = np.cos(angles) * radius
+    data[:, :, 5] = 1.0
+    return data.reshape(-1, 6)
+
+
+def build_cylinder_vbo(r1, r2, h, slices):
+    """
+    构建圆柱/圆锥的三角形带VBO（位置+法线交错，步长24字节）
+    
+    Returns:
+        (_VertexArray, 顶点数)
+    """
+    data = _cylinder_vertices(r1, r2, h, slices)
+    vbo = _create_buffer(GL_ARRAY_BUFFER, data)
+    return _VertexArray(vbo, 24, normal_offset=12), len(data)
+
+
+class _VertexArray:
+    """
+    顶点数组状态
+    
+    驱动支持VAO时，缓冲区绑定与指针布局在创建时记录一次，绘制时只需一次
+    glBindVertexArray；不支持时（如旧版兼容上下文）退回到每次绘制重新设置指针。
+    """
+    
+    def __init__(self, vbo, stride, normal_offset=None, color_offset=None, ibo=None):
+        """
+        Args:
+            vbo: 顶点缓冲区ID（位置位于偏移0处）
+            stride: 顶点步长（字节）
+            normal_offset: 法线偏移（字节），None表示无法线
+            color_offset: RGBA字节颜色偏移（字节），None表示无逐顶点颜色
+            ibo: 索引缓冲区ID，None表示非索引绘制
+        """
+        self.vbo = vbo
+        self.stride = stride
+        self.normal_offset = normal_offset
+        self.color_offset = color_offset
+        self.ibo = ibo
+        
+        self._vao = None
+        if bool(glGenVertexArrays):
+            self._vao = glGenVertexArrays(1)
+            glBindVertexArray(self._vao)
+            self._setup()
+            glBindVertexArray(0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+    
+    def _setup(self):
+        """绑定缓冲区并设置顶点指针"""
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, self.stride, None)
+        
+        if self.normal_offset is not None:
+            glEnableClientState(GL_NORMAL_ARRAY)
+            glNormalPointer(GL_FLOAT, self.stride, ctypes.c_void_p(self.normal_offset))
+        
+        if self.color_offset is not None:
+            glEnableClientState(GL_COLOR_ARRAY)
+            glColorPointer(4, GL_UNSIGNED_BYTE, self.stride, ctypes.c_void_p(self.color_offset))
+        
+        if self.ibo is not None:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+    
+    def bind(self):
+        """绑定顶点数组（绘制前调用）"""
+        if self._vao is not None:
+            glBindVertexArray(self._vao)
+        else:
+            self._setup()
+    
+    def release(self):
+        """解除绑定（绘制后调用）"""
+        if self._vao is not None:
+            glBindVertexArray(0)
+            return
+        
+        if self.color_offset is not None:
+            glDisableClientState(GL_COLOR_ARRAY)
+        if self.normal_offset is not None:
+            glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        if self.ibo is not None:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
 
 class Cube:
     """立方体模型 - 代表传感器"""
     
+    # 六个面的顶点（单位立方体，±1）与颜色
+    _FACES = [
+        # 前面 (红色)
+        ((1.0, 0.0, 0.0), [(-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1)]),
+        # 后面 (黄色)
+        ((1.0, 1.0, 0.0), [(-1, -1, -1), (-1, 1, -1), (1, 1, -1), (1, -1, -1)]),
+        # 上面 (绿色)
+        ((0.0, 1.0, 0.0), [(-1, 1, -1), (-1, 1, 1), (1, 1, 1), (1, 1, -1)]),
+        # 下面 (橙色)
+        ((1.0, 0.5, 0.0), [(-1, -1, -1), (1, -1, -1), (1, -1, 1), (-1, -1, 1)]),
+        # 右面 (蓝色)
+        ((0.0, 0.0, 1.0), [(1, -1, -1), (1, 1, -1), (1, 1, 1), (1, -1, 1)]),
+        # 左面 (紫色)
+        ((0.5, 0.0, 0.5), [(-1, -1, -1), (-1, -1, 1), (-1, 1, 1), (-1, 1, -1)]),
+    ]
+    
+    # 8个角点
+    _CORNERS = [
+        (-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1),
+        (-1, -1, -1), (1, -1, -1), (1, 1, -1), (-1, 1, -1),
+    ]
+    
+    # 12条边的角点索引（前面4条、后面4条、连接前后4条）
+    _EDGE_INDICES = [
+        0, 1, 1, 2, 2, 3, 3, 0,
+        4, 5, 5, 6, 6, 7, 7, 4,
+        0, 4, 1, 5, 2, 6, 3, 7,
+    ]
+    
     def __init__(self, size=1.0):
         """
         初始化立方体
@@ -17,80 +236,38 @@ class Cube:
             size: 立方体边长
         """
         self.size = size
+        s = size / 2.0
         
-    def draw(self):
-        """绘制立方体"""
-        s = self.size / 2.0
-        
-        glBegin(GL_QUADS)
-        
-        # 前面 (红色)
-        glColor3f(1.0, 0.0, 0.0)
-        glVertex3f(-s, -s, s)
-        glVertex3f(s, -s, s)
-        glVertex3f(s, s, s)
-        glVertex3f(-s, s, s)
-        
-        # 后面 (黄色)
-        glColor3f(1.0, 1.0, 0.0)
-        glVertex3f(-s, -s, -s)
-        glVertex3f(-s, s, -s)
-        glVertex3f(s, s, -s)
-        glVertex3f(s, -s, -s)
+        # 交错顶点数据（位置 + RGBA字节颜色），构造时生成一次
+        positions = [vertex for _, quad in self._FACES for vertex in quad]
+        colors = [color for color, quad in self._FACES for _ in quad]
+        self._face_data = _pack_vertices(np.array(positions, dtype=np.float32) * s, colors)
+        self._corner_data = np.array(self._CORNERS, dtype=np.float32) * s
+        self._edge_indices = np.array(self._EDGE_INDICES, dtype=np.uint8)
         
-        # 上面 (绿色)
-        glColor3f(0.0, 1.0, 0.0)
-        glVertex3f(-s, s, -s)
-        glVertex3f(-s, s, s)
-        glVertex3f(s, s, s)
-        glVertex3f(s, s, -s)
-        
-        # 下面 (橙色)
-        glColor3f(1.0, 0.5, 0.0)
-        glVertex3f(-s, -s, -s)
-        glVertex3f(s, -s, -s)
-        glVertex3f(s, -s, s)
-        glVertex3f(-s, -s, s)
-        
-        # 右面 (蓝色)
-        glColor3f(0.0, 0.0, 1.0)
-        glVertex3f(s, -s, -s)
-        glVertex3f(s, s, -s)
-        glVertex3f(s, s, s)
-        glVertex3f(s, -s, s)
-        
-        # 左面 (紫色)
-        glColor3f(0.5, 0.0, 0.5)
-        glVertex3f(-s, -s, -s)
-        glVertex3f(-s, -s, s)
-        glVertex3f(-s, s, s)
-        glVertex3f(-s, s, -s)
+        # 顶点数组在首次绘制时创建（构造时OpenGL上下文可能尚未就绪）
+        self._faces = None
+        self._edges = None
         
-        glEnd()
+    def draw(self):
+        """绘制立方体"""
+        if self._faces is None:
+            # 六个面（位置+颜色交错，步长16字节）
+            self._faces = _VertexArray(_create_buffer(GL_ARRAY_BUFFER, self._face_data),
+                                       VERTEX_COLOR.itemsize, color_offset=12)
+            # 边框（8个角点 + 边索引）
+            self._edges = _VertexArray(_create_buffer(GL_ARRAY_BUFFER, self._corner_data), 0,
+                                       ibo=_create_buffer(GL_ELEMENT_ARRAY_BUFFER, self._edge_indices))
+        
+        self._faces.bind()
+        glDrawArrays(GL_QUADS, 0, 24)
+        self._faces.release()
         
         # 绘制边框（黑色）
         glColor3f(0.0, 0.0, 0.0)
-        glLineWidth(2.0)
-        
-        glBegin(GL_LINES)
-        # 前面的4条边
-        glVertex3f(-s, -s, s); glVertex3f(s, -s, s)
-        glVertex3f(s, -s, s); glVertex3f(s, s, s)
-        glVertex3f(s, s, s); glVertex3f(-s, s, s)
-        glVertex3f(-s, s, s); glVertex3f(-s, -s, s)
-        
-        # 后面的4条边
-        glVertex3f(-s, -s, -s); glVertex3f(s, -s, -s)
-        glVertex3f(s, -s, -s); glVertex3f(s, s, -s)
-        glVertex3f(s, s, -s); glVertex3f(-s, s, -s)
-        glVertex3f(-s, s, -s); glVertex3f(-s, -s, -s)
-        
-        # 连接前后的4条边
-        glVertex3f(-s, -s, s); glVertex3f(-s, -s, -s)
-        glVertex3f(s, -s, s); glVertex3f(s, -s, -s)
-        glVertex3f(s, s, s); glVertex3f(s, s, -s)
-        glVertex3f(-s, s, s); glVertex3f(-s, s, -s)
-        glEnd()
+        self._edges.bind()
+        glDrawElements(GL_LINES, 24, GL_UNSIGNED_BYTE, None)
+        self._edges.release()
 
 
 class Axes:
@@ -105,27 +282,29 @@ class Axes:
         """
         self.length = length
         
-    def draw(self):
-        """绘制坐标轴"""
-        glLineWidth(3.0)
-        glBegin(GL_LINES)
+        # 三条轴线 (x, y, z, r, g, b)：X红、Y绿、Z蓝
+        L = length
+        lines = np.array([
+            [0, 0, 0, 1, 0, 0], [L, 0, 0, 1, 0, 0],
+            [0, 0, 0, 0, 1, 0], [0, L, 0, 0, 1, 0],
+            [0, 0, 0, 0, 0, 1], [0, 0, L, 0, 0, 1],
+        ], dtype=np.float32)
+        self._line_data = _pack_vertices(lines[:, :3], lines[:, 3:])
         
-        # X轴 (红色)
-        glColor3f(1.0, 0.0, 0.0)
-        glVertex3f(0.0, 0.0, 0.0)
-        glVertex3f(self.length, 0.0, 0.0)
+        # 顶点数组在首次绘制时创建
+        self._lines = None
+        self._cone = None  # 三个箭头共享的圆锥
         
-        # Y轴 (绿色)
-        glColor3f(0.0, 1.0, 0.0)
-        glVertex3f(0.0, 0.0, 0.0)
-        glVertex3f(0.0, self.length, 0.0)
-        
-        # Z轴 (蓝色)
-        glColor3f(0.0, 0.0, 1.0)
-        glVertex3f(0.0, 0.0, 0.0)
-        glVertex3f(0.0, 0.0, self.length)
+    def draw(self):
+        """绘制坐标轴"""
+        if self._lines is None:
+            self._lines = _VertexArray(_create_buffer(GL_ARRAY_BUFFER, self._line_data),
+                                       VERTEX_COLOR.itemsize, color_offset=12)
+            self._cone = build_cylinder_vbo(0.15, 0.0, 0.3, 8)
         
-        glEnd()
+        self._lines.bind()
+        glDrawArrays(GL_LINES, 0, 6)
+        self._lines.release()
         
         # 绘制箭头
         self._draw_arrow_head(self.length, 0, 0, 1.0, 0.0, 0.0)  # X轴
@@ -135,7 +314,6 @@ class Axes:
     def _draw_arrow_head(self, x, y, z, r, g, b):
         """绘制箭头头部"""
         glColor3f(r, g, b)
-        arrow_size = 0.15
         
         glPushMatrix()
         glTranslatef(x, y, z)
@@ -146,10 +324,11 @@ class Axes:
             glRotatef(-90, 1, 0, 0)
         # Z轴不需要旋转
         
-        # 绘制圆锥
-        quadric = gluNewQuadric()
-        gluCylinder(quadric, arrow_size, 0.0, arrow_size * 2, 8, 1)
-        gluDeleteQuadric(quadric)
+        # 绘制圆锥（半径arrow_size，高度arrow_size * 2）
+        cone, count = self._cone
+        cone.bind()
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, count)
+        cone.release()
         
         glPopMatrix()
 
@@ -168,29 +347,31 @@ class Grid:
         self.size = size
         self.divisions = divisions
         
+        # 网格是静态几何体，线段端点只生成一次
+        half_size = size / 2.0
+        coords = np.linspace(-half_size, half_size, divisions + 1, dtype=np.float32)
+        n = divisions + 1
+        lines = np.zeros((n * 4, 3), dtype=np.float32)
+        # 平行于X轴的线
+        lines[0:2 * n:2] = np.column_stack([np.full(n, -half_size), np.zeros(n), coords])
+        lines[1:2 * n:2] = np.column_stack([np.full(n, half_size), np.zeros(n), coords])
+        # 平行于Z轴的线
+        lines[2 * n::2] = np.column_stack([coords, np.zeros(n), np.full(n, -half_size)])
+        lines[2 * n + 1::2] = np.column_stack([coords, np.zeros(n), np.full(n, half_size)])
+        self._lines = lines
+        self._count = len(lines)
+        self._vao = None
+        
     def draw(self):
         """绘制网格"""
-        glColor3f(0.5, 0.5, 0.5)
-        glLineWidth(1.0)
-        
-        step = self.size / self.divisions
-        half_size = self.size / 2.0
-        
-        glBegin(GL_LINES)
+        if self._vao is None:
+            self._vao = _VertexArray(_create_buffer(GL_ARRAY_BUFFER, self._lines), 0)
         
-        # 绘制平行于X轴的线
-        for i in range(self.divisions + 1):
-            z = -half_size + i * step
-            glVertex3f(-half_size, 0, z)
-            glVertex3f(half_size, 0, z)
-        
-        # 绘制平行于Z轴的线
-        for i in range(self.divisions + 1):
-            x = -half_size + i * step
-            glVertex3f(x, 0, -half_size)
-            glVertex3f(x, 0, half_size)
+        glColor3f(0.5, 0.5, 0.5)
         
-        glEnd()
+        self._vao.bind()
+        glDrawArrays(GL_LINES, 0, self._count)
+        self._vao.release()
 
 
 class Airplane:
@@ -205,196 +386,176 @@ class Airplane:
         """
         self.scale = scale
         
-    def draw(self):
-        """绘制波音737风格飞机"""
-        s = self.scale
+        # 所有部件在构造时变换到模型坐标并合并为一个网格
+        self._mesh_data, self._mdraw_first, self._mdraw_count = \
+            self._build_airplane_mesh(scale)
+        self._vao = None  # 首次绘制时上传
         
-        # 1. 机身和机头
-        self._draw_fuselage(s)
-        
-        # 2. 驾驶舱窗户
-        self._draw_windows(s)
-        
-        # 3. 主机翼
-        self._draw_wings(s)
-        
-        # 4. 发动机
-        self._draw_engines(s)
-        
-        # 5. 尾翼系统
-        self._draw_tail(s)
-    
-    def _draw_fuselage(self, s):
-        """绘制机身和机头（一体化）"""
-        # 主机身（白色圆柱）
-        glColor3f(0.92, 0.92, 0.92)
-        glPushMatrix()
-        glTranslatef(0, 0, -0.9 * s)
-        
-        quadric = gluNewQuadric()
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        
-        # 主机身圆柱
-        gluCylinder(quadric, 0.16 * s, 0.16 * s, 1.7 * s, 24, 1)
-        
-        # 后端封闭
-        gluDisk(quadric, 0, 0.16 * s, 24, 1)
+    def _build_airplane_mesh(self, s):
+        """
+        生成整架飞机的合并网格
         
-        # 机身前部收窄
-        glTranslatef(0, 0, 1.7 * s)
-        gluCylinder(quadric, 0.16 * s, 0.12 * s, 0.25 * s, 24, 1)
+        每个部件按原glTranslatef/glRotatef/glScalef顺序在CPU上一次性变换，
+        全部以三角形带存储，并记录各子段的起点与顶点数，供glMultiDrawArrays使用。
         
-        # 机头圆锥
-        glTranslatef(0, 0, 0.25 * s)
-        gluCylinder(quadric, 0.12 * s, 0.01 * s, 0.3 * s, 20, 1)
+        Args:
+            s: 缩放比例
+            
+        Returns:
+            (顶点数组, first数组, count数组)
+            顶点数组为 VERTEX_NORMAL_COLOR 结构化数组
+        """
+        body = (0.92, 0.92, 0.92)
+        stripe = (0.1, 0.3, 0.7)
+        window = (0.05, 0.05, 0.15)
+        wing = (0.88, 0.88, 0.88)
+        winglet = (0.85, 0.85, 0.85)
+        accent = (0.8, 0.1, 0.1)
+        nacelle = (0.78, 0.78, 0.82)
+        intake = (0.15, 0.15, 0.2)
+        exhaust = (0.25, 0.25, 0.3)
+        
+        parts = []
         
-        gluDeleteQuadric(quadric)
-        glPopMatrix()
+        # 1. 机身和机头
+        fuselage = _translate(0, 0, -0.9 * s)
+        parts.append((_cylinder_vertices(0.16 * s, 0.16 * s, 1.7 * s, 24), fuselage, body))
+        parts.append((_disk_vertices(0.16 * s, 24), fuselage, body))  # 后端封闭
+        taper = fuselage @ _translate(0, 0, 1.7 * s)
+        parts.append((_cylinder_vertices(0.16 * s, 0.12 * s, 0.25 * s, 24), taper, body))
+        nose = taper @ _translate(0, 0, 0.25 * s)
+        parts.append((_cylinder_vertices(0.12 * s, 0.01 * s, 0.3 * s, 20), nose, body))
         
         # 蓝色装饰条
-        glColor3f(0.1, 0.3, 0.7)
-        glPushMatrix()
-        glTranslatef(0, 0.165 * s, -0.5 * s)
-        quadric = gluNewQuadric()
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        gluCylinder(quadric, 0.17 * s, 0.17 * s, 1.3 * s, 24, 1)
-        gluDeleteQuadric(quadric)
-        glPopMatrix()
-    
-    def _draw_windows(self, s):
-        """绘制驾驶舱窗户"""
-        glColor3f(0.05, 0.05, 0.15)
-        
-        # 左窗
-        glPushMatrix()
-        glTranslatef(-0.08 * s, 0.05 * s, 1.15 * s)
-        glScalef(0.06 * s, 0.04 * s, 0.08 * s)
-        self._draw_box()
-        glPopMatrix()
-        
-        # 右窗
-        glPushMatrix()
-        glTranslatef(0.08 * s, 0.05 * s, 1.15 * s)
-        glScalef(0.06 * s, 0.04 * s, 0.08 * s)
-        self._draw_box()
-        glPopMatrix()
-    
-    def _draw_wings(self, s):
-        """绘制主机翼"""
-        glColor3f(0.88, 0.88, 0.88)
-        
-        # 左翼
-        glPushMatrix()
-        glTranslatef(-0.16 * s, -0.04 * s, 0.1 * s)
-        glRotatef(20, 0, 1, 0)  # 后掠角
-        glScalef(1.0 * s, 0.05 * s, 0.35 * s)
-        self._draw_box()
-        glPopMatrix()
+        parts.append((_cylinder_vertices(0.17 * s, 0.17 * s, 1.3 * s, 24),
+                      _translate(0, 0.165 * s, -0.5 * s), stripe))
+        
+        # 中轴线上的方块部件
+        boxes = [
+            # 5. 垂直尾翼
+            (wing, _translate(0, 0.22 * s, -0.7 * s) @ _scale(0.03 * s, 0.45 * s, 0.3 * s)),
+            # 红色装饰
+            (accent, _translate(0, 0.28 * s, -0.58 * s) @ _scale(0.031 * s, 0.08 * s, 0.06 * s)),
+        ]
         
-        # 右翼
-        glPushMatrix()
-        glTranslatef(0.16 * s, -0.04 * s, 0.1 * s)
-        glRotatef(-20, 0, 1, 0)  # 后掠角
-        glScalef(1.0 * s, 0.05 * s, 0.35 * s)
-        self._draw_box()
-        glPopMatrix()
+        # 左右对称的方块部件：只定义左侧，右侧由镜像变换生成
+        left_boxes = [
+            # 2. 驾驶舱窗户
+            (window, _translate(-0.08 * s, 0.05 * s, 1.15 * s) @ _scale(0.06 * s, 0.04 * s, 0.08 * s)),
+            # 3. 主机翼（后掠角20°）
+            (wing, _translate(-0.16 * s, -0.04 * s, 0.1 * s) @ _rotate(20, 0, 1, 0)
+             @ _scale(1.0 * s, 0.05 * s, 0.35 * s)),
+            # 翼尖小翼
+            (winglet, _translate(-1.15 * s, 0.05 * s, 0.15 * s) @ _rotate(80, 1, 0, 0)
+             @ _scale(0.03 * s, 0.18 * s, 0.06 * s)),
+            # 水平尾翼
+            (wing, _translate(-0.22 * s, 0.18 * s, -0.75 * s) @ _scale(0.45 * s, 0.03 * s, 0.22 * s)),
+        ]
+        for color, matrix in left_boxes:
+            boxes.append((color, matrix))
+            boxes.append((color, _MIRROR_X @ matrix))
+        
+        for color, matrix in boxes:
+            # 立方体每个面是一段独立的4顶点三角形带
+            for face in _BOX_FACE_STRIPS:
+                parts.append((face, matrix, color))
+        
+        # 4. 发动机（左侧定义，右侧镜像）
+        engine = _translate(-0.5 * s, -0.14 * s, 0.05 * s)
+        engine_parts = [
+            (_cylinder_vertices(0.09 * s, 0.09 * s, 0.42 * s, 20), engine, nacelle),
+            (_disk_vertices(0.09 * s, 20), engine, intake),  # 进气口
+            (_cylinder_vertices(0.09 * s, 0.08 * s, 0.05 * s, 20),
+             engine @ _translate(0, 0, 0.42 * s), exhaust),  # 尾喷口
+        ]
+        for data, matrix, color in engine_parts:
+            parts.append((data, matrix, color))
+            parts.append((data, _MIRROR_X @ matrix, color))
         
-        # 翼尖小翼（左）
-        glColor3f(0.85, 0.85, 0.85)
-        glPushMatrix()
-        glTranslatef(-1.15 * s, 0.05 * s, 0.15 * s)
-        glRotatef(80, 1, 0, 0)
-        glScalef(0.03 * s, 0.18 * s, 0.06 * s)
-        self._draw_box()
-        glPopMatrix()
+        chunks = [_transform_vertices(data, matrix, color) for data, matrix, color in parts]
+        counts = np.array([len(c) for c in chunks], dtype=np.int32)
+        firsts = np.zeros_like(counts)
+        firsts[1:] = np.cumsum(counts)[:-1]
+        return np.concatenate(chunks), firsts, counts
         
-        # 翼尖小翼（右）
-        glPushMatrix()
-        glTranslatef(1.15 * s, 0.05 * s, 0.15 * s)
-        glRotatef(80, 1, 0, 0)
-        glScalef(0.03 * s, 0.18 * s, 0.06 * s)
-        self._draw_box()
-        glPopMatrix()
+    def draw(self):
+        """绘制波音737风格飞机（位置+法线+颜色交错，步长28字节）"""
+        if self._vao is None:
+            self._vao = _VertexArray(_create_buffer(GL_ARRAY_BUFFER, self._mesh_data),
+                                     VERTEX_NORMAL_COLOR.itemsize, normal_offset=12, color_offset=24)
+        
+        # 所有部件一次绘制调用（颜色为逐顶点属性，子段之间无状态切换）
+        self._vao.bind()
+        glMultiDrawArrays(GL_TRIANGLE_STRIP, self._mdraw_first, self._mdraw_count,
+                          len(self._mdraw_first))
+        self._vao.release()
+
+
+# 单位立方体的六个面（外法线 + 四个角点，按三角形带顺序排列）
+_BOX_FACES = [
+    ((0, 0, -1), [(-0.5, -0.5, -0.5), (0.5, -0.5, -0.5), (-0.5, 0.5, -0.5), (0.5, 0.5, -0.5)]),
+    ((0, 0, 1), [(-0.5, -0.5, 0.5), (-0.5, 0.5, 0.5), (0.5, -0.5, 0.5), (0.5, 0.5, 0.5)]),
+    ((0, -1, 0), [(-0.5, -0.5, -0.5), (-0.5, -0.5, 0.5), (0.5, -0.5, -0.5), (0.5, -0.5, 0.5)]),
+    ((0, 1, 0), [(-0.5, 0.5, -0.5), (0.5, 0.5, -0.5), (-0.5, 0.5, 0.5), (0.5, 0.5, 0.5)]),
+    ((-1, 0, 0), [(-0.5, -0.5, -0.5), (-0.5, 0.5, -0.5), (-0.5, -0.5, 0.5), (-0.5, 0.5, 0.5)]),
+    ((1, 0, 0), [(0.5, -0.5, -0.5), (0.5, -0.5, 0.5), (0.5, 0.5, -0.5), (0.5, 0.5, 0.5)]),
+]
+
+# 每个面为 (4, 6) 数组：(x, y, z, nx, ny, nz)
+_BOX_FACE_STRIPS = [
+    np.array([list(v) + list(n) for v in quad], dtype=np.float32)
+    for n, quad in _BOX_FACES
+]
+
+
+# 关于YZ平面的镜像（左右对称部件共用一份定义）
+_MIRROR_X = np.diag([-1.0, 1.0, 1.0, 1.0])
+
+
+def _translate(x, y, z):
+    """平移矩阵（4x4）"""
+    m = np.eye(4)
+    m[:3, 3] = (x, y, z)
+    return m
+
+
+def _scale(x, y, z):
+    """缩放矩阵（4x4）"""
+    return np.diag([x, y, z, 1.0])
+
+
+def _rotate(angle, x, y, z):
+    """绕单位轴(x, y, z)旋转angle度的矩阵（4x4），与glRotatef一致"""
+    a = math.radians(angle)
+    c = math.cos(a)
+    s = math.sin(a)
+    t = 1.0 - c
+    m = np.eye(4)
+    m[:3, :3] = [
+        [t * x * x + c, t * x * y - s * z, t * x * z + s * y],
+        [t * x * y + s * z, t * y * y + c, t * y * z - s * x],
+        [t * x * z - s * y, t * y * z + s * x, t * z * z + c],
+    ]
+    return m
+
+
+def _transform_vertices(data, matrix, color):
+    """
+    将部件顶点变换到模型坐标并附加颜色
     
-    def _draw_engines(self, s):
-        """绘制发动机吊舱"""
-        engine_x = [-0.5 * s, 0.5 * s]
-        
-        glColor3f(0.78, 0.78, 0.82)
-        for x in engine_x:
-            glPushMatrix()
-            glTranslatef(x, -0.14 * s, 0.05 * s)
-            
-            quadric = gluNewQuadric()
-            gluQuadricNormals(quadric, GLU_SMOOTH)
-            
-            # 发动机外壳
-            gluCylinder(quadric, 0.09 * s, 0.09 * s, 0.42 * s, 20, 1)
-            
-            # 进气口
-            glColor3f(0.15, 0.15, 0.2)
-            gluDisk(quadric, 0, 0.09 * s, 20, 1)
-            
-            # 尾喷口
-            glColor3f(0.25, 0.25, 0.3)
-            glTranslatef(0, 0, 0.42 * s)
-            gluCylinder(quadric, 0.09 * s, 0.08 * s, 0.05 * s, 20, 1)
-            
-            gluDeleteQuadric(quadric)
-            glColor3f(0.78, 0.78, 0.82)  # 恢复颜色
-            glPopMatrix()
+    Args:
+        data: (N, 6) 数组，每行为 (x, y, z, nx, ny, nz)
+        matrix: 4x4模型变换矩阵
+        color: RGB颜色
+        
+    Returns:
+        VERTEX_NORMAL_COLOR 结构化数组
+    """
+    linear = matrix[:3, :3]
+    positions = data[:, 0:3] @ linear.T + matrix[:3, 3]
     
-    def _draw_tail(self, s):
-        """绘制尾翼系统"""
-        glColor3f(0.88, 0.88, 0.88)
-        
-        # 垂直尾翼
-        glPushMatrix()
-        glTranslatef(0, 0.22 * s, -0.7 * s)
-        glScalef(0.03 * s, 0.45 * s, 0.3 * s)
-        self._draw_box()
-        glPopMatrix()
-        
-        # 红色装饰
-        glColor3f(0.8, 0.1, 0.1)
-        glPushMatrix()
-        glTranslatef(0, 0.28 * s, -0.58 * s)
-        glScalef(0.031 * s, 0.08 * s, 0.06 * s)
-        self._draw_box()
-        glPopMatrix()
-        
-        # 水平尾翼（左）
-        glColor3f(0.88, 0.88, 0.88)
-        glPushMatrix()
-        glTranslatef(-0.22 * s, 0.18 * s, -0.75 * s)
-        glScalef(0.45 * s, 0.03 * s, 0.22 * s)
-        self._draw_box()
-        glPopMatrix()
-        
-        # 水平尾翼（右）
-        glPushMatrix()
-        glTranslatef(0.22 * s, 0.18 * s, -0.75 * s)
-        glScalef(0.45 * s, 0.03 * s, 0.22 * s)
-        self._draw_box()
-        glPopMatrix()
+    # 法线使用逆转置矩阵变换（非均匀缩放下保持垂直）
+    normals = data[:, 3:6] @ np.linalg.inv(linear)
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
     
-    def _draw_box(self):
-        """绘制单位立方体"""
-        glBegin(GL_QUADS)
-        
-        # 各个面
-        vertices = [
-            [[-0.5, -0.5, -0.5], [0.5, -0.5, -0.5], [0.5, 0.5, -0.5], [-0.5, 0.5, -0.5]],
-            [[-0.5, -0.5, 0.5], [-0.5, 0.5, 0.5], [0.5, 0.5, 0.5], [0.5, -0.5, 0.5]],
-            [[-0.5, -0.5, -0.5], [-0.5, -0.5, 0.5], [0.5, -0.5, 0.5], [0.5, -0.5, -0.5]],
-            [[-0.5, 0.5, -0.5], [0.5, 0.5, -0.5], [0.5, 0.5, 0.5], [-0.5, 0.5, 0.5]],
-            [[-0.5, -0.5, -0.5], [-0.5, 0.5, -0.5], [-0.5, 0.5, 0.5], [-0.5, -0.5, 0.5]],
-            [[0.5, -0.5, -0.5], [0.5, -0.5, 0.5], [0.5, 0.5, 0.5], [0.5, 0.5, -0.5]]
-        ]
-        
-        for face in vertices:
-            for vertex in face:
-                glVertex3fv(vertex)
-        
-        glEnd()
-
+    return _pack_vertices(positions, color, normals)
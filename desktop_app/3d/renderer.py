@@ -7,11 +7,192 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from PyQt5.QtWidgets import QOpenGLWidget
 from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QOpenGLContext
 from OpenGL.GL import *
 from OpenGL.GLU import *
+from OpenGL.GL import shaders
 import numpy as np
 
 from models import Cube, Axes, Grid, Airplane
+from _quat_math import quat_to_matrix
+
+
+# 着色器：顶点阶段输出眼坐标位置与法线，片元阶段按需计算漫反射光照
+# 使用GLSL 1.20（兼容上下文），继续沿用矩阵栈与顶点数组
+VERTEX_SHADER = """
+#version 120
+varying vec4 v_color;
+varying vec3 v_normal;
+varying vec3 v_position;
+
+void main()
+{
+    v_color = gl_Color;
+    v_normal = normalize(gl_NormalMatrix * gl_Normal);
+    v_position = vec3(gl_ModelViewMatrix * gl_Vertex);
+    gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+uniform bool lit;
+uniform vec3 lightPos;
+varying vec4 v_color;
+varying vec3 v_normal;
+varying vec3 v_position;
+
+const float AMBIENT = 0.5;   // 全局环境光0.2 + 光源环境光0.3
+const float DIFFUSE = 0.8;
+
+void main()
+{
+    if (!lit) {
+        gl_FragColor = v_color;
+        return;
+    }
+    vec3 n = normalize(v_normal);
+    vec3 l = normalize(lightPos - v_position);
+    float diff = max(dot(n, l), 0.0);
+    gl_FragColor = vec4(v_color.rgb * min(AMBIENT + DIFFUSE * diff, 1.0), v_color.a);
+}
+"""
+
+# 已编译的着色器程序缓存：OpenGL上下文 -> {(顶点着色器源码, 片元着色器源码): 程序ID}
+# 程序ID只在创建它的上下文中有效，上下文销毁时丢弃对应条目
+_PROGRAM_CACHE = {}
+
+
+def get_program(vs, fs):
+    """
+    获取当前上下文中的着色器程序（同一上下文内相同源码只编译链接一次）
+    
+    Args:
+        vs: 顶点着色器源码
+        fs: 片元着色器源码
+        
+    Returns:
+        OpenGL程序ID
+    """
+    context = QOpenGLContext.currentContext()
+    programs = _PROGRAM_CACHE.get(context)
+    if programs is None:
+        programs = _PROGRAM_CACHE[context] = {}
+        # 控件换顶层窗口等情况会重建上下文，旧上下文的程序随之失效
+        context.aboutToBeDestroyed.connect(lambda: _PROGRAM_CACHE.pop(context, None))
+    
+    key = (vs, fs)
+    program = programs.get(key)
+    if program is None:
+        program = shaders.compileProgram(
+            shaders.compileShader(vs, GL_VERTEX_SHADER),
+            shaders.compileShader(fs, GL_FRAGMENT_SHADER),
+        )
+        programs[key] = program
+    return program
+
+
+# 光源位置（眼坐标系）
+LIGHT_POSITION = (5.0, 5.0, 5.0)
+
+
+# 姿态变化判定阈值
+ATTITUDE_EPSILON = 1e-5
+
+
+def _values_changed(new, old, eps=ATTITUDE_EPSILON):
+    """
+    判断姿态数值是否发生变化
+    
+    Args:
+        new: 新值序列
+        old: 旧值序列（None表示尚无记录）
+        eps: 变化阈值
+        
+    Returns:
+        任一分量变化超过阈值时返回True
+    """
+    if old is None or old[0] is None:
+        return True
+    for a, b in zip(new, old):
+        if abs(a - b) > eps:
+            return True
+    return False
+
+
+def _camera_view_matrix(distance, rotation_x, rotation_y, out):
+    """
+    计算相机视图矩阵 T(0,0,-d) · Rx · Ry，写入列主序数组
+    
+    Args:
+        distance: 相机距离
+        rotation_x: 绕X轴旋转(度)
+        rotation_y: 绕Y轴旋转(度)
+        out: 长度16的float32输出数组
+    """
+    ax = np.radians(rotation_x)
+    ay = np.radians(rotation_y)
+    cx, sx = np.cos(ax), np.sin(ax)
+    cy, sy = np.cos(ay), np.sin(ay)
+    
+    rx = np.array([[1, 0, 0, 0],
+                   [0, cx, -sx, 0],
+                   [0, sx, cx, 0],
+                   [0, 0, 0, 1]])
+    ry = np.array([[cy, 0, sy, 0],
+                   [0, 1, 0, 0],
+                   [-sy, 0, cy, 0],
+                   [0, 0, 0, 1]])
+    t = np.eye(4)
+    t[2, 3] = -distance
+    
+    out[:] = (t @ rx @ ry).T.ravel()
+
+
+class GLStateCache:
+    """
+    OpenGL状态缓存
+    
+    记录当前线宽与光照开关，请求值与当前值相同时不发出GL调用，
+    避免每帧重复的状态切换。
+    """
+    
+    def __init__(self):
+        self.lit_location = -1  # 着色器中lit uniform的位置（-1表示使用固定管线）
+        self.reset()
+    
+    def reset(self):
+        """清空缓存（上下文重建后调用）"""
+        self._line_width = None
+        self._lit = None
+    
+    def set_line_width(self, width):
+        """
+        设置线宽
+        
+        Args:
+            width: 线宽（像素）
+        """
+        if width != self._line_width:
+            glLineWidth(width)
+            self._line_width = width
+    
+    def set_lighting(self, lit):
+        """
+        切换光照
+        
+        Args:
+            lit: True启用光照，False不使用光照（纯色）
+        """
+        if lit == self._lit:
+            return
+        if self.lit_location >= 0:
+            glUniform1i(self.lit_location, 1 if lit else 0)
+        elif lit:
+            glEnable(GL_LIGHTING)
+        else:
+            glDisable(GL_LIGHTING)
+        self._lit = lit
 
 
 class GL3DWidget(QOpenGLWidget):
@@ -39,21 +220,42 @@ class GL3DWidget(QOpenGLWidget):
         self.use_quaternion = True
         self.quaternion = [1.0, 0.0, 0.0, 0.0]  # [w, x, y, z]
         
+        # 四元数旋转矩阵缓存（仅在四元数变化时重新计算）
+        self._qbuf = np.array(self.quaternion, dtype=np.float32)
+        self._qmat = np.empty(16, dtype=np.float32)
+        quat_to_matrix(self._qbuf, self._qmat)  # 预热（numba首次调用时编译）
+        self._qmat_dirty = True
+        
+        # 上一次绘制的姿态（姿态未变化时跳过重绘）
+        self._last_quat = None
+        self._last_euler = (None, None, None)
+        
         # 相机参数
         self.camera_distance = 8.0
         self.camera_rotation_x = 30.0
         self.camera_rotation_y = 45.0
+        self._camera_dirty = True
+        self._view = np.empty(16, dtype=np.float32)  # 相机视图矩阵（列主序）
         
         # 鼠标交互
         self.last_mouse_x = 0
         self.last_mouse_y = 0
         self.mouse_pressed = False
         
+        # 着色器程序（initializeGL中创建，失败时退回固定管线）
+        self._program = None
+        self._gl_state = GLStateCache()
+        
         # 启用鼠标追踪
         self.setMouseTracking(False)
         
     def initializeGL(self):
         """初始化OpenGL"""
+        # 输出实际协商得到的上下文参数
+        fmt = self.format()
+        print(f"🎨 OpenGL上下文: {fmt.majorVersion()}.{fmt.minorVersion()}, "
+              f"MSAA采样数: {fmt.samples()}, 深度缓冲: {fmt.depthBufferSize()}位")
+        
         # 设置背景颜色（深色背景）
         glClearColor(0.1, 0.1, 0.15, 1.0)
         
@@ -61,14 +263,32 @@ class GL3DWidget(QOpenGLWidget):
         glEnable(GL_DEPTH_TEST)
         glDepthFunc(GL_LEQUAL)
         
-        # 启用光照
+        # 编译着色器程序
+        try:
+            self._program = get_program(VERTEX_SHADER, FRAGMENT_SHADER)
+            glUseProgram(self._program)
+            self._gl_state.lit_location = glGetUniformLocation(self._program, 'lit')
+            glUniform3f(glGetUniformLocation(self._program, 'lightPos'), *LIGHT_POSITION)
+            glUseProgram(0)
+        except Exception as e:
+            print(f"⚠️ 着色器编译失败，使用固定管线光照: {e}")
+            self._program = None
+            self._gl_state.lit_location = -1
+            self._init_fixed_function_lighting()
+        self._gl_state.reset()
+        
+        # 启用多重采样抗锯齿（采样数由main.py中的QSurfaceFormat指定）
+        glEnable(GL_MULTISAMPLE)
+        
+    def _init_fixed_function_lighting(self):
+        """初始化固定管线光照（着色器不可用时的回退方案）"""
         glEnable(GL_LIGHTING)
         glEnable(GL_LIGHT0)
         glEnable(GL_COLOR_MATERIAL)
         glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
         
         # 设置光源
-        light_position = [5.0, 5.0, 5.0, 1.0]
+        light_position = [*LIGHT_POSITION, 1.0]
         light_ambient = [0.3, 0.3, 0.3, 1.0]
         light_diffuse = [0.8, 0.8, 0.8, 1.0]
         
@@ -78,13 +298,7 @@ class GL3DWidget(QOpenGLWidget):
         
         # 启用平滑着色
         glShadeModel(GL_SMOOTH)
-        
-        # 启用抗锯齿
-        glEnable(GL_LINE_SMOOTH)
-        glHint(GL_LINE_SMOOTH_HINT, GL_NICEST)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        
+    
     def resizeGL(self, w, h):
         """窗口大小改变时调用"""
         glViewport(0, 0, w, h)
@@ -100,22 +314,27 @@ class GL3DWidget(QOpenGLWidget):
         """绘制场景"""
         # 清除缓冲区
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity()
         
-        # 设置相机
-        glTranslatef(0.0, 0.0, -self.camera_distance)
-        glRotatef(self.camera_rotation_x, 1.0, 0.0, 0.0)
-        glRotatef(self.camera_rotation_y, 0.0, 1.0, 0.0)
+        # 设置相机（视图矩阵仅在相机参数变化时重新计算）
+        if self._camera_dirty:
+            _camera_view_matrix(self.camera_distance, self.camera_rotation_x,
+                                self.camera_rotation_y, self._view)
+            self._camera_dirty = False
+        glLoadMatrixf(self._view)
         
-        # 绘制网格（地面）
-        glDisable(GL_LIGHTING)
-        self.grid.draw()
-        glEnable(GL_LIGHTING)
+        if self._program is not None:
+            glUseProgram(self._program)
         
-        # 绘制坐标轴
-        glDisable(GL_LIGHTING)
+        # 按状态排序绘制：网格（无光照，线宽1）→ 坐标轴（无光照，线宽3）→ 模型（光照，线宽2）
+        state = self._gl_state
+        state.set_lighting(False)
+        state.set_line_width(1.0)
+        self.grid.draw()
+        state.set_line_width(3.0)
         self.axes.draw()
-        glEnable(GL_LIGHTING)
+        
+        state.set_lighting(True)
+        state.set_line_width(2.0)
         
         # 绘制传感器模型（应用姿态旋转）
         glPushMatrix()
@@ -133,12 +352,18 @@ class GL3DWidget(QOpenGLWidget):
         if self.model_type == 'cube':
             self.cube.draw()
         elif self.model_type == 'custom' and self.custom_model:
-            self.custom_model.draw()
+            self.custom_model.draw_surface()
+            state.set_lighting(False)
+            state.set_line_width(1.0)
+            self.custom_model.draw_wireframe()
         else:
             self.airplane.draw()
         
         glPopMatrix()
         
+        if self._program is not None:
+            glUseProgram(0)
+        
     def update_attitude(self, roll, pitch, yaw, quaternion=None):
         """
         更新姿态角
@@ -149,12 +374,22 @@ class GL3DWidget(QOpenGLWidget):
             yaw: 偏航角(度)
             quaternion: 四元数 [w, x, y, z]，如果提供则优先使用
         """
+        euler = (roll, pitch, yaw)
+        changed = _values_changed(euler, self._last_euler)
+        
+        if quaternion is not None and _values_changed(quaternion, self._last_quat):
+            self.quaternion = quaternion
+            self._last_quat = tuple(quaternion)
+            self._qmat_dirty = True
+            changed = True
+        
+        if not changed:
+            return  # 姿态未变化，无需重绘
+        
         self.roll = roll
         self.pitch = pitch
         self.yaw = yaw
-        
-        if quaternion is not None:
-            self.quaternion = quaternion
+        self._last_euler = euler
         
         self.update()  # 触发重绘
     
@@ -164,32 +399,13 @@ class GL3DWidget(QOpenGLWidget):
         
         使用四元数计算旋转矩阵，比欧拉角更精确
         """
-        w, x, y, z = self.quaternion
-        
-        # 四元数到旋转矩阵的转换
-        # 优化算法，避免重复计算
-        xx = x * x
-        xy = x * y
-        xz = x * z
-        xw = x * w
-        
-        yy = y * y
-        yz = y * z
-        yw = y * w
-        
-        zz = z * z
-        zw = z * w
-        
-        # 构建3x3旋转矩阵（OpenGL使用列主序）
-        matrix = [
-            1.0 - 2.0 * (yy + zz), 2.0 * (xy + zw),       2.0 * (xz - yw),       0.0,
-            2.0 * (xy - zw),       1.0 - 2.0 * (xx + zz), 2.0 * (yz + xw),       0.0,
-            2.0 * (xz + yw),       2.0 * (yz - xw),       1.0 - 2.0 * (xx + yy), 0.0,
-            0.0,                   0.0,                   0.0,                   1.0
-        ]
+        if self._qmat_dirty:
+            self._qbuf[:] = self.quaternion
+            quat_to_matrix(self._qbuf, self._qmat)
+            self._qmat_dirty = False
         
         # 应用矩阵变换
-        glMultMatrixf(matrix)
+        glMultMatrixf(self._qmat)
     
     def set_use_quaternion(self, use_quaternion):
         """
@@ -231,6 +447,7 @@ class GL3DWidget(QOpenGLWidget):
         self.camera_distance = 8.0
         self.camera_rotation_x = 30.0
         self.camera_rotation_y = 45.0
+        self._camera_dirty = True
         self.update()
     
     def mousePressEvent(self, event):
@@ -258,6 +475,7 @@ class GL3DWidget(QOpenGLWidget):
             self.last_mouse_x = event.x()
             self.last_mouse_y = event.y()
             
+            self._camera_dirty = True
             self.update()
     
     def wheelEvent(self, event):
@@ -268,5 +486,6 @@ class GL3DWidget(QOpenGLWidget):
         # 限制缩放范围
         self.camera_distance = max(3.0, min(20.0, self.camera_distance))
         
+        self._camera_dirty = True
         self.update()
 
@@ -17,6 +17,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uti
 
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QSurfaceFormat
 
 # 导入主窗口类
 from main_window import MainWindow  # noqa: E402
@@ -24,6 +25,17 @@ from main_window import MainWindow  # noqa: E402
 
 def main():
     """主函数"""
+    # 默认OpenGL表面格式（必须在创建QApplication之前统一协商）
+    # - 渲染器使用GLSL 1.20着色器 + 矩阵栈/顶点数组，需要2.1兼容上下文
+    # - 使用帧缓冲级4x MSAA抗锯齿，替代GL_LINE_SMOOTH + 混合
+    fmt = QSurfaceFormat()
+    fmt.setRenderableType(QSurfaceFormat.OpenGL)
+    fmt.setVersion(2, 1)
+    fmt.setProfile(QSurfaceFormat.CompatibilityProfile)
+    fmt.setSamples(4)
+    fmt.setDepthBufferSize(24)
+    QSurfaceFormat.setDefaultFormat(fmt)
+    
     # 创建应用
     app = QApplication(sys.argv)
     app.setApplicationName('3D姿态可视化')
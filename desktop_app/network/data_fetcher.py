@@ -2,112 +2,365 @@
 数据获取模块 - 从ESP32-S3获取传感器数据
 高性能版本：异步处理、智能重试、减少卡顿
 """
-import sys
-import os
-import requests
+import logging
+import http.client
+import socket
+import struct
 import json
-from PyQt5.QtCore import QThread, pyqtSignal, QMutex
+import random
+import threading
+from urllib.parse import urlsplit
+from PyQt5.QtCore import QThread, pyqtSignal
 import time
-from collections import deque
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from typing import Optional
+
+from ring_buffer import SensorRingBuffer
+
+logger = logging.getLogger(__name__)
+
+# 优先使用orjson（C/Rust实现，解析速度远快于标准库json），未安装时回退
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_loads(buf):
+        # 标准库json不接受memoryview，需先转成bytes
+        return json.loads(bytes(buf))
+
+# JSON数据必需字段（frozenset子集判断在C层完成）
+_REQUIRED_KEYS = frozenset(('accelX', 'accelY', 'accelZ',
+                            'gyroX', 'gyroY', 'gyroZ', 'temperature'))
+
+# 运动判定阈值：各轴变化均小于阈值时视为与上一样本相同（加速度g，角速度°/s）
+_MOTION_EPS = (('accelX', 1e-3), ('accelY', 1e-3), ('accelZ', 1e-3),
+               ('gyroX', 0.05), ('gyroY', 0.05), ('gyroZ', 0.05))
+
+
+def _near_identical(data, prev):
+    """
+    判断样本是否与上一个发送的样本几乎相同
+    
+    Args:
+        data: 当前数据字典
+        prev: 上一个发送的数据字典（可为None）
+        
+    Returns:
+        所有运动轴变化都小于阈值时返回True
+    """
+    if prev is None:
+        return False
+    for key, eps in _MOTION_EPS:
+        if abs(data[key] - prev[key]) >= eps:
+            return False
+    return True
+
+
+# 请求头只构建一次，每次请求复用
+_HEADERS = {'Connection': 'keep-alive'}
+
+# /data_bin二进制数据包（小端，36字节）：7×float + float角度 + uint16原始角度 + uint16标志位
+_PACKET = struct.Struct('<8fHH')
+_PACKET_FLAG_ANGLE_VALID = 0x02
+_BINARY_SUFFIX = '_bin'
+
+# 可选：msgspec按固定结构直接解码（C实现，无需中间字典和Python层字段校验）
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+if msgspec is not None:
+    class SensorPacket(msgspec.Struct):
+        """ESP32数据包结构（缺少必需字段时解码抛出ValidationError）"""
+        accelX: float
+        accelY: float
+        accelZ: float
+        gyroX: float
+        gyroY: float
+        gyroZ: float
+        temperature: float
+        angle: Optional[float] = None   # 旧版固件没有MT6701字段
+        angleRaw: int = 0
+        angleValid: bool = False
+
+
+def binary_to_dict(fields):
+    """
+    将二进制数据包解包结果转换为与ESP32 JSON一致的数据字典
+    
+    Args:
+        fields: _PACKET.unpack_from()返回的元组
+        
+    Returns:
+        数据字典
+    """
+    ax, ay, az, gx, gy, gz, temp, angle, angle_raw, flags = fields
+    return {
+        'accelX': ax, 'accelY': ay, 'accelZ': az,
+        'gyroX': gx, 'gyroY': gy, 'gyroZ': gz,
+        'temperature': temp,
+        'angle': angle,
+        'angleRaw': angle_raw,
+        'angleValid': bool(flags & _PACKET_FLAG_ANGLE_VALID),
+    }
+
+
+def packet_to_dict(pkt):
+    """
+    将SensorPacket转换为与ESP32 JSON一致的数据字典
+    
+    Args:
+        pkt: SensorPacket实例
+        
+    Returns:
+        数据字典（旧版固件的数据包不含angle相关键）
+    """
+    data = {
+        'accelX': pkt.accelX, 'accelY': pkt.accelY, 'accelZ': pkt.accelZ,
+        'gyroX': pkt.gyroX, 'gyroY': pkt.gyroY, 'gyroZ': pkt.gyroZ,
+        'temperature': pkt.temperature,
+    }
+    if pkt.angle is not None:
+        data['angle'] = pkt.angle
+        data['angleRaw'] = pkt.angleRaw
+        data['angleValid'] = pkt.angleValid
+    return data
 
 
 class DataFetcher(QThread):
     """后台线程：从ESP32获取传感器数据"""
     
     # 信号：传输数据
-    data_received = pyqtSignal(dict)
+    data_received = pyqtSignal(dict)           # 单个样本（兼容旧接口）
+    data_batch_received = pyqtSignal(list)     # 批量样本（合并跨线程信号分发）
     connection_status = pyqtSignal(bool, str)  # (是否连接, 状态消息)
+    samples_available = pyqtSignal(int)        # 环形缓冲区有新样本（当前待读数量）
+    
+    # 批量发送条件：攒够BATCH_SIZE个样本或距上次发送超过BATCH_INTERVAL秒
+    BATCH_SIZE = 4
+    BATCH_INTERVAL = 0.05
     
-    def __init__(self, url="http://192.168.3.57/data", interval=100):
+    # 新样本通知的最小间隔(秒)：消费者一次读空环形缓冲区，无需逐样本唤醒
+    NOTIFY_INTERVAL = 0.05
+    
+    def __init__(self, url="http://192.168.3.57/data", interval=100,
+                 emit_single=True, emit_batch=True):
         """
         初始化数据获取器
         
+        所有样本都会写入环形缓冲区self.ring，消费者可用定时器批量读取，
+        完全绕过跨线程信号；信号发送可按需关闭。
+        
         Args:
             url: ESP32的数据API地址
             interval: 数据获取间隔(毫秒)
+            emit_single: 是否逐个发送data_received信号（兼容旧接口）
+            emit_batch: 是否发送data_batch_received批量信号
         """
         super().__init__()
         self.url = url
         self.interval = interval / 1000.0  # 转换为秒
         self.running = False
+        self._stop_event = threading.Event()  # stop()时置位，唤醒节拍或退避等待
         self.timeout = 0.5  # 请求超时时间(秒) - 减少到0.5秒，避免长时间卡顿
         
         # 性能优化：减少状态更新频率
         self.last_status_time = 0
         self.status_update_interval = 2.0  # 最多每2秒更新一次状态
         
-        # 创建优化的requests session（连接池复用）
-        self.session = requests.Session()
-        
-        # 配置连接池和重试策略
-        retry_strategy = Retry(
-            total=0,  # 不自动重试（我们手动控制）
-            backoff_factor=0,
-            status_forcelist=[]
-        )
-        adapter = HTTPAdapter(
-            pool_connections=1,
-            pool_maxsize=1,
-            max_retries=retry_strategy,
-            pool_block=False
-        )
-        self.session.mount("http://", adapter)
+        # 样本环形缓冲区（单生产者/单消费者）
+        self.ring = SensorRingBuffer(1024)
+        
+        # 批量发送缓冲
+        self.emit_single = emit_single
+        self.emit_batch = emit_batch
+        self._batch = []
+        self._last_emit = 0.0
+        self._last_notify = 0.0
+        self._prev = None  # 上一个发送的样本，用于跳过静止时的重复数据
+        
+        # msgspec结构化解码器（未安装时使用JSON字典 + 字段子集校验）
+        self._decoder = msgspec.json.Decoder(SensorPacket) if msgspec is not None else None
+        
+        # 可复用的响应体接收缓冲区（按需几何扩容，避免每次请求分配新bytes）
+        self._buf = bytearray(1024)
+        self._view = memoryview(self._buf)
+        
+        # 持久HTTP连接（URL只解析一次，出错时关闭，下次请求自动重连）
+        self._conn = None
+        self._set_target(url)
         
         # 性能统计
         self.success_count = 0
         self.error_count = 0
         self.last_success_time = 0
         
+    def _set_target(self, url):
+        """
+        解析URL并重建HTTP连接
+        
+        Args:
+            url: ESP32的数据API地址
+        """
+        parts = urlsplit(url)
+        self._host = parts.hostname
+        self._port = parts.port or 80
+        self._path = parts.path or '/'
+        self._binary = self._path.endswith(_BINARY_SUFFIX)  # /data_bin返回二进制数据包
+        if parts.query:
+            self._path += '?' + parts.query
+        
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+    
+    def _grow_buffer(self, size):
+        """
+        将接收缓冲区扩容到不小于size的2的幂（保留已读内容）
+        
+        Args:
+            size: 需要的最小容量(字节)
+        """
+        capacity = len(self._buf)
+        while capacity < size:
+            capacity *= 2
+        buf = bytearray(capacity)
+        buf[:len(self._buf)] = self._buf
+        self._buf = buf
+        self._view = memoryview(buf)
+    
+    def _read_body(self, response):
+        """
+        将响应体直接读入复用缓冲区
+        
+        Args:
+            response: http.client.HTTPResponse
+            
+        Returns:
+            指向缓冲区有效数据的memoryview（下次读取前有效）
+        """
+        length = response.length
+        if length is not None:
+            # 已知Content-Length：一次readinto读满
+            if length > len(self._buf):
+                self._grow_buffer(length)
+            n = response.readinto(self._view[:length])
+            return self._view[:n]
+        
+        # 无Content-Length（分块传输）：循环读取，缓冲区满时扩容
+        n = 0
+        while True:
+            if n == len(self._buf):
+                self._grow_buffer(n * 2)
+            k = response.readinto(self._view[n:])
+            if not k:
+                break
+            n += k
+        return self._view[:n]
+    
     def run(self):
         """线程运行函数 - 优化版，减少卡顿"""
         self.running = True
+        self._stop_event.clear()
         consecutive_errors = 0
         max_errors = 3  # 减少最大错误次数，更快恢复
         skip_count = 0  # 跳过次数，用于降级策略
         
+        # 热路径上的属性查找预先绑定到局部变量
+        mono = time.monotonic
+        wait_stop = self._stop_event.wait
+        ring = self.ring
+        read_body = self._read_body
+        unpack = _PACKET.unpack_from
+        decoder = self._decoder
+        required = _REQUIRED_KEYS
+        emit_data = self.data_received.emit
+        # 是否需要逐样本信号（关闭时跳过字典转换和去重，样本只进入环形缓冲区）
+        emitting = self.emit_single or self.emit_batch
+        emit_status = self.connection_status.emit
+        
+        # 预先建立TCP连接，首个样本不再承担握手延迟
+        # （在工作线程中进行，避免阻塞构造DataFetcher的GUI线程；失败时由首次请求重连）
+        try:
+            self._conn.connect()
+        except OSError:
+            self._conn.close()
+        
+        # 以单调时钟维护绝对截止时间，避免系统时间跳变和sleep误差累积
+        deadline = mono() + self.interval
+        
         while self.running:
-            request_start = time.time()
-            
+            conn = self._conn  # set_url()可能替换连接，每轮重新取
             try:
-                # 使用session发送请求（连接复用，性能更好）
-                response = self.session.get(
-                    self.url, 
-                    timeout=self.timeout,
-                    headers={'Connection': 'keep-alive'}  # 保持连接
-                )
+                # 复用持久连接发送请求（连接断开后http.client会自动重连）
+                conn.request('GET', self._path, headers=_HEADERS)
+                response = conn.getresponse()
+                body = read_body(response)  # 必须读完响应体，连接才能复用
+                now = mono()  # 本轮唯一的时间采样，时间戳与状态节流共用
                 
-                if response.status_code == 200:
-                    # 解析JSON数据
-                    data = response.json()
+                status = response.status
+                if status == 200:
+                    if self._binary:
+                        # 定长二进制数据包：一次unpack_from，无需解析和字段校验
+                        fields = unpack(body)
+                        ring.push_binary(now, fields)
+                        data = binary_to_dict(fields) if emitting else None
+                    elif decoder is not None:
+                        # 按固定结构解码，字段缺失由msgspec在C层报错
+                        pkt = decoder.decode(body)
+                        ring.push_packet(now, pkt)
+                        data = packet_to_dict(pkt) if emitting else None
+                    else:
+                        # 解析JSON数据（解析结果即数据字典，无需额外转换）
+                        data = _json_loads(body)
+                        
+                        # 验证数据完整性
+                        if not required <= data.keys():
+                            raise ValueError("数据格式不完整")
+                        ring.push(now, data)
                     
-                    # 验证数据完整性
-                    required_keys = ['accelX', 'accelY', 'accelZ', 
-                                   'gyroX', 'gyroY', 'gyroZ', 'temperature']
+                    # 通知消费者读取环形缓冲区（限频，避免逐样本排队事件）
+                    if now - self._last_notify >= self.NOTIFY_INTERVAL:
+                        self.samples_available.emit(len(ring))
+                        self._last_notify = now
                     
-                    if all(key in data for key in required_keys):
-                        # 发送数据信号
-                        self.data_received.emit(data)
-                        
-                        # 成功统计
-                        self.success_count += 1
-                        self.last_success_time = time.time()
-                        
-                        # 重置错误计数和跳过次数
-                        if consecutive_errors > 0 or skip_count > 0:
-                            consecutive_errors = 0
-                            skip_count = 0
-                            current_time = time.time()
-                            if current_time - self.last_status_time >= self.status_update_interval:
-                                self.connection_status.emit(True, "✓ 连接正常")
-                                self.last_status_time = current_time
-                    else:
-                        raise ValueError("数据格式不完整")
+                    # 按需发送数据信号；静止时跳过与上次几乎相同的样本
+                    # （环形缓冲区仍保留全部样本，姿态解算的时间步长不受影响）
+                    if emitting and not _near_identical(data, self._prev):
+                        self._prev = data
+                        if self.emit_single:
+                            emit_data(data)
+                        if self.emit_batch:
+                            self._batch.append(data)
+                            if len(self._batch) >= self.BATCH_SIZE or now - self._last_emit >= self.BATCH_INTERVAL:
+                                self.data_batch_received.emit(self._batch)
+                                self._batch = []
+                                self._last_emit = now
+                    
+                    # 成功统计
+                    self.success_count += 1
+                    self.last_success_time = now
+                    
+                    # 重置错误计数和跳过次数
+                    if consecutive_errors > 0 or skip_count > 0:
+                        consecutive_errors = 0
+                        skip_count = 0
+                        if now - self.last_status_time >= self.status_update_interval:
+                            emit_status(True, "✓ 连接正常")
+                            self.last_status_time = now
+                elif status == 404 and self._binary:
+                    # 旧版固件没有二进制接口，回退到JSON接口
+                    head, _, tail = self.url.rpartition(_BINARY_SUFFIX)
+                    json_url = head + tail
+                    logger.warning("设备不支持二进制数据接口，回退到: %s", json_url)
+                    self.set_url(json_url)
                 else:
-                    raise Exception(f"HTTP {response.status_code}")
+                    raise Exception(f"HTTP {status}")
                     
-            except requests.exceptions.Timeout:
+            except socket.timeout:
+                conn.close()  # 丢弃可能残留半个响应的连接
                 consecutive_errors += 1
                 self.error_count += 1
                 
@@ -118,18 +371,19 @@ class DataFetcher(QThread):
                     pass
                 elif consecutive_errors >= 2:
                     # 连续超时才报错
-                    current_time = time.time()
-                    if current_time - self.last_status_time >= self.status_update_interval:
-                        self.connection_status.emit(False, f"✗ 连接不稳定")
-                        self.last_status_time = current_time
+                    now = mono()
+                    if now - self.last_status_time >= self.status_update_interval:
+                        emit_status(False, f"✗ 连接不稳定")
+                        self.last_status_time = now
                 
-            except requests.exceptions.ConnectionError:
+            except (ConnectionError, http.client.HTTPException, OSError):
+                conn.close()
                 consecutive_errors += 1
                 self.error_count += 1
-                current_time = time.time()
-                if current_time - self.last_status_time >= self.status_update_interval:
-                    self.connection_status.emit(False, f"✗ 设备离线")
-                    self.last_status_time = current_time
+                now = mono()
+                if now - self.last_status_time >= self.status_update_interval:
+                    emit_status(False, f"✗ 设备离线")
+                    self.last_status_time = now
                 
             except Exception as e:
                 consecutive_errors += 1
@@ -137,36 +391,40 @@ class DataFetcher(QThread):
                 # 其他错误静默处理，不频繁报错
                 
             # 智能等待策略
-            request_time = time.time() - request_start
-            
             if consecutive_errors >= max_errors:
-                # 连续错误过多，增加等待时间
-                time.sleep(1.0)
-                consecutive_errors = max_errors - 1
+                # 连续错误过多：指数退避（上限5秒）并加随机抖动，设备离线时几乎不占CPU和网络
+                # 等待可被stop()立即打断，断开/关闭窗口时GUI线程无需等满退避时间
+                wait_stop(min(5.0, 0.1 * (1 << min(consecutive_errors, 6))) + random.random() * 0.05)
+                deadline = mono() + self.interval
             else:
-                # 动态调整等待时间，补偿请求耗时
-                wait_time = max(0, self.interval - request_time)
-                if wait_time > 0:
-                    time.sleep(wait_time)
+                # 等待到本轮截止时间（100ms节拍下系统sleep的粒度误差可忽略，不做自旋）
+                now = mono()
+                if deadline > now:
+                    wait_stop(deadline - now)
+                    now = mono()
+                deadline += self.interval
+                # 请求耗时过长落后于节拍时重新同步，避免连续补发
+                if deadline < now:
+                    deadline = now + self.interval
+        
+        self._conn.close()
     
     def stop(self):
         """停止数据获取"""
         self.running = False
+        self._stop_event.set()  # 打断正在进行的节拍或退避等待
+        self.wait()  # 等待线程结束（线程退出时关闭连接）
         
-        # 关闭session
-        if hasattr(self, 'session'):
-            self.session.close()
-        
-        self.wait()  # 等待线程结束
-        
-        # 打印统计信息
-        if self.success_count > 0:
-            success_rate = self.success_count / (self.success_count + self.error_count) * 100
-            print(f"📊 数据获取统计: 成功 {self.success_count} 次, 失败 {self.error_count} 次, 成功率 {success_rate:.1f}%")
+        # 统计信息走DEBUG日志：默认不输出，避免控制台编码拖慢GUI线程的退出
+        total = self.success_count + self.error_count
+        logger.debug("数据获取统计: 成功 %d 次, 失败 %d 次, 成功率 %.1f%%",
+                     self.success_count, self.error_count,
+                     self.success_count / max(1, total) * 100)
     
     def set_url(self, url):
         """更新URL地址"""
         self.url = url
+        self._set_target(url)
     
     def set_interval(self, interval):
         """
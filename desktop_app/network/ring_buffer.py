@@ -0,0 +1,162 @@
+"""
+传感器样本环形缓冲区
+单生产者/单消费者：数据获取线程写入，GUI线程通过定时器批量读取
+"""
+import numpy as np
+
+
+# 样本记录格式（字段名与ESP32 JSON键一致）
+SENSOR_RECORD_DTYPE = np.dtype([
+    ('t', 'f8'),             # 接收时间（time.monotonic，秒）
+    ('accelX', 'f4'), ('accelY', 'f4'), ('accelZ', 'f4'),
+    ('gyroX', 'f4'), ('gyroY', 'f4'), ('gyroZ', 'f4'),
+    ('temperature', 'f4'),
+    ('angle', 'f4'),
+    ('angleRaw', 'u2'),
+    ('angleValid', '?'),
+    ('hasAngle', '?'),       # 固件是否提供MT6701字段（旧版固件没有）
+])
+
+
+class SensorRingBuffer:
+    """
+    固定容量的传感器样本环形缓冲区
+    
+    记录预先分配在numpy结构化数组中，稳态下写入不产生任何内存分配。
+    生产者先写记录再推进head，消费者只推进tail；在GIL下整数赋值是原子的，
+    因此无需加锁。消费者读取过慢导致覆盖时，丢弃最旧的样本。
+    """
+    
+    def __init__(self, capacity=1024):
+        """
+        初始化环形缓冲区
+        
+        Args:
+            capacity: 容量（必须为2的幂）
+        """
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError(f"容量必须为2的幂: {capacity}")
+        
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self.records = np.zeros(capacity, dtype=SENSOR_RECORD_DTYPE)
+        self._head = 0  # 已写入样本总数（仅生产者修改）
+        self._tail = 0  # 已读取样本总数（仅消费者修改）
+    
+    def push(self, t, data):
+        """
+        写入一个样本（生产者线程调用）
+        
+        Args:
+            t: 接收时间(秒)
+            data: ESP32返回的数据字典
+        """
+        has_angle = 'angle' in data
+        self.records[self._head & self._mask] = (
+            t,
+            data['accelX'], data['accelY'], data['accelZ'],
+            data['gyroX'], data['gyroY'], data['gyroZ'],
+            data['temperature'],
+            data['angle'] if has_angle else 0.0,
+            data.get('angleRaw', 0),
+            data.get('angleValid', False),
+            has_angle,
+        )
+        self._head += 1  # 记录写完后再发布
+    
+    def push_packet(self, t, pkt):
+        """
+        写入一个msgspec解码的样本（生产者线程调用）
+        
+        Args:
+            t: 接收时间(秒)
+            pkt: SensorPacket实例
+        """
+        has_angle = pkt.angle is not None
+        self.records[self._head & self._mask] = (
+            t,
+            pkt.accelX, pkt.accelY, pkt.accelZ,
+            pkt.gyroX, pkt.gyroY, pkt.gyroZ,
+            pkt.temperature,
+            pkt.angle if has_angle else 0.0,
+            pkt.angleRaw,
+            pkt.angleValid,
+            has_angle,
+        )
+        self._head += 1
+    
+    def push_binary(self, t, fields):
+        """
+        写入一个二进制数据包样本（生产者线程调用）
+        
+        Args:
+            t: 接收时间(秒)
+            fields: (accelX, accelY, accelZ, gyroX, gyroY, gyroZ,
+                     temperature, angle, angleRaw, flags)
+        """
+        ax, ay, az, gx, gy, gz, temp, angle, angle_raw, flags = fields
+        self.records[self._head & self._mask] = (
+            t, ax, ay, az, gx, gy, gz, temp,
+            angle, angle_raw, bool(flags & 0x02), True,  # 标志位bit1：角度有效
+        )
+        self._head += 1
+    
+    def drain(self):
+        """
+        取出所有未读样本（消费者线程调用）
+        
+        Returns:
+            按时间顺序排列的结构化数组副本（无新数据时长度为0）
+        """
+        head = self._head
+        tail = self._tail
+        if head - tail > self.capacity:
+            tail = head - self.capacity  # 发生覆盖，丢弃最旧样本
+        
+        count = head - tail
+        start = tail & self._mask
+        if start + count <= self.capacity:
+            out = self.records[start:start + count].copy()
+        else:
+            out = np.concatenate((self.records[start:],
+                                  self.records[:start + count - self.capacity]))
+        
+        self._tail = head
+        return out
+    
+    def __len__(self):
+        """未读样本数"""
+        return min(self._head - self._tail, self.capacity)
+
+
+class SensorFrame:
+    """
+    最新传感器样本的轻量容器（__slots__，无实例字典）
+    
+    字段名与ESP32 JSON键一致；旧版固件没有MT6701数据时angle为None。
+    设计为预先创建一个实例后原地更新，避免逐样本分配。
+    """
+    
+    __slots__ = ('accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ',
+                 'temperature', 'angle', 'angleRaw', 'angleValid')
+    
+    def __init__(self):
+        """初始化为零值（无MT6701数据）"""
+        self.accelX = self.accelY = self.accelZ = 0.0
+        self.gyroX = self.gyroY = self.gyroZ = 0.0
+        self.temperature = 0.0
+        self.angle = None
+        self.angleRaw = 0
+        self.angleValid = False
+    
+    def update_from_record(self, record):
+        """
+        用环形缓冲区的样本记录原地更新
+        
+        Args:
+            record: SENSOR_RECORD_DTYPE记录
+        """
+        (_, self.accelX, self.accelY, self.accelZ,
+         self.gyroX, self.gyroY, self.gyroZ, self.temperature,
+         angle, self.angleRaw, self.angleValid, has_angle) = record.item()
+        self.angle = angle if has_angle else None
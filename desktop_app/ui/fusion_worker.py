@@ -0,0 +1,88 @@
+"""
+姿态融合工作对象
+在独立线程中运行EKF/Madgwick姿态解算，GUI线程只负责显示
+"""
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+
+class FusionWorker(QObject):
+    """
+    姿态融合工作对象（通过moveToThread运行在独立QThread中）
+
+    所有槽函数都经由排队信号调用，滤波器状态只在工作线程中访问，无需加锁。
+    """
+
+    # 信号：(roll, pitch, yaw, 四元数, EKF不确定性或None)
+    attitude_ready = pyqtSignal(float, float, float, object, object)
+
+    def __init__(self, ekf_estimator, attitude_calculator, use_ekf=True):
+        """
+        初始化融合工作对象
+
+        Args:
+            ekf_estimator: AdaptiveEKFAttitudeEstimator实例
+            attitude_calculator: AttitudeCalculator实例（Madgwick）
+            use_ekf: 是否使用EKF算法
+        """
+        super().__init__()
+        self.ekf_estimator = ekf_estimator
+        self.attitude_calculator = attitude_calculator
+        self.use_ekf = use_ekf
+
+    @pyqtSlot(object)
+    def new_batch(self, samples):
+        """
+        按顺序处理一批传感器样本，只发送最后一个样本后的姿态结果
+        
+        Args:
+            samples: (K, 8)数组，列为accelX/Y/Z、gyroX/Y/Z、temperature、angle
+                     （angle为NaN表示磁力计数据无效）
+        """
+        accels = samples[:, 0:3]
+        gyros = samples[:, 3:6]
+        
+        if self.use_ekf:
+            # EKF批量更新，每个样本只进入一次编译内核
+            mags = samples[:, 7]
+            valids = ~np.isnan(mags)
+            self.ekf_estimator.update_batch(
+                accels, gyros, np.where(valids, mags, 0.0), valids, dt=0.1
+            )
+            uncertainty = self.ekf_estimator.get_uncertainty()
+            roll, pitch, yaw, quaternion = self.ekf_estimator.get_state()
+        else:
+            roll, pitch, yaw = self.attitude_calculator.update_batch(accels, gyros, dt=0.1)
+            uncertainty = None
+            quaternion = self.attitude_calculator.get_quaternion()
+        
+        self.attitude_ready.emit(roll, pitch, yaw, quaternion, uncertainty)
+    
+    @pyqtSlot(bool)
+    def set_algorithm(self, use_ekf):
+        """
+        切换姿态算法并重置对应滤波器
+
+        Args:
+            use_ekf: True使用EKF，False使用Madgwick
+        """
+        self.use_ekf = use_ekf
+        self.reset()
+
+    @pyqtSlot()
+    def reset(self):
+        """重置当前算法的滤波器状态"""
+        if self.use_ekf:
+            self.ekf_estimator.reset()
+        else:
+            self.attitude_calculator.reset()
+
+    @pyqtSlot(float)
+    def set_mag_trust(self, trust_factor):
+        """
+        设置EKF磁力计信任度
+
+        Args:
+            trust_factor: 信任度(0-1)
+        """
+        self.ekf_estimator.set_mag_trust(trust_factor)
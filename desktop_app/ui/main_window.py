@@ -3,6 +3,8 @@
 """
 import sys
 import os
+from collections import deque
+from functools import lru_cache
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -10,20 +12,109 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QComboBox, QGridLayout, QFrame, QSplitter,
                              QAction, QFileDialog, QMessageBox, QDockWidget, QApplication,
                              QScrollArea, QToolButton, QSlider, QCheckBox)
-from PyQt5.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve, QRect
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QPropertyAnimation, QEasingCurve, QRect
 from PyQt5.QtGui import QFont, QPalette, QColor, QIcon
+import numpy as np
 
 from renderer import GL3DWidget
 from data_fetcher import DataFetcher
+from ring_buffer import SensorFrame
 from quaternion import AttitudeCalculator, MadgwickQuaternion
 from kalman_filter import AdaptiveEKFAttitudeEstimator
 from model_loader import load_model
-from realtime_plot import AccelerometerPlot, GyroscopePlot, AttitudePlot, EncoderAnglePlot
+from fusion_worker import FusionWorker
+
+
+# 传感器历史缓冲区（SoA）的列布局
+HISTORY_COLUMNS = ('accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ',
+                   'temperature', 'angle')
+COL_ACCEL = slice(0, 3)
+COL_GYRO = slice(3, 6)
+COL_ANGLE = slice(7, 8)
+HISTORY_SIZE = 1024  # 必须为2的幂
+
+# 标签文本格式（预先绑定format方法，刷新时直接调用）
+_ACCEL_FMT = "{:.3f} g".format
+_GYRO_FMT = "{:.2f} °/s".format
+_TEMP_FMT = "{:.2f} °C".format
+_DEG_FMT = "{:.2f}°".format
+_RAW_SUFFIX = " / 16383"  # MT6701原始值满量程（整数直接str()后拼接）
+_RAW_EMPTY = "--" + _RAW_SUFFIX
+_UNCERTAINTY_FMT = "不确定性: ±{:.2f}° ±{:.2f}° ±{:.2f}°".format
+
+# 状态样式表（模块级常量，只在状态切换时设置，避免Qt重复解析CSS）
+_STATUS_QSS_TEMPLATE = """
+    QLabel {{
+        background-color: {};
+        color: {};
+        padding: 10px;
+        border-radius: 5px;
+        font-weight: bold;
+    }}
+"""
+_STATUS_IDLE_QSS = _STATUS_QSS_TEMPLATE.format('#2a2a2a', '#888')
+_STATUS_CONNECTED_QSS = _STATUS_QSS_TEMPLATE.format('#2d5016', '#7ed321')
+_STATUS_DISCONNECTED_QSS = _STATUS_QSS_TEMPLATE.format('#5a1616', '#ff6b6b')
+_DISCONNECT_BTN_QSS = """
+    QPushButton {
+        background-color: #ff6b6b;
+        color: white;
+    }
+"""
+_ENCODER_OK_QSS = 'color: #7ed321; font-size: 11px; font-weight: bold;'
+_ENCODER_BAD_QSS = 'color: #ff6b6b; font-size: 11px; font-weight: bold;'
+_ENCODER_NA_QSS = 'color: #888; font-size: 11px;'
+_ENCODER_STATUS = {
+    'ok': ('🟢 正常', _ENCODER_OK_QSS),
+    'bad': ('🔴 无效', _ENCODER_BAD_QSS),
+    'na': ('⚪ 未安装', _ENCODER_NA_QSS),
+}
+
+# 曲线图类型 -> (realtime_plot中的类名, 停靠窗口标题)，顺序即默认的上下堆叠顺序
+# realtime_plot（及pyqtgraph）在首次打开曲线图时才导入，加快主窗口启动
+PLOT_SPECS = {
+    'accel': ('AccelerometerPlot', "加速度计曲线"),
+    'gyro': ('GyroscopePlot', "陀螺仪曲线"),
+    'attitude': ('AttitudePlot', "姿态角曲线"),
+    'encoder': ('EncoderAnglePlot', "MT6701角度曲线"),
+}
+
+# 资源目录（样式表等）
+_ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets')
+
+
+@lru_cache(maxsize=None)
+def _load_stylesheet(name):
+    """
+    读取assets目录下的QSS样式表（结果缓存，多个窗口共享同一字符串）
+    
+    Args:
+        name: 样式表文件名
+        
+    Returns:
+        样式表文本
+    """
+    path = os.path.join(_ASSETS_DIR, name)
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _noop(*args, **kwargs):
+    """空操作（曲线图未显示时的推送占位函数）"""
 
 
 class MainWindow(QMainWindow):
     """主窗口"""
     
+    # 发往姿态融合线程的信号（排队连接，跨线程安全）
+    fusion_batch = pyqtSignal(object)
+    fusion_reset = pyqtSignal()
+    fusion_algorithm = pyqtSignal(bool)
+    fusion_mag_trust = pyqtSignal(float)
+    
+    # 融合线程中最多允许的待处理批次数，超过时样本留在历史缓冲区等待下一批
+    MAX_FUSION_PENDING = 2
+    
     def __init__(self):
         super().__init__()
         
@@ -34,9 +125,39 @@ class MainWindow(QMainWindow):
         # 备用：Madgwick算法（用于对比）
         self.attitude_calculator = AttitudeCalculator(alpha=0.98)
         
-        # UI更新节流（减少卡顿）- 在数据获取器之前初始化
-        self.ui_update_counter = 0
-        self.ui_update_skip = 2  # 每3次数据更新一次UI文本（保持3D和曲线图实时）
+        # 姿态融合线程：滤波器只在工作线程中运行，GUI线程只接收结果
+        self._fusion_worker = FusionWorker(self.ekf_estimator, self.attitude_calculator, self.use_ekf)
+        self._fusion_thread = QThread()
+        self._fusion_worker.moveToThread(self._fusion_thread)
+        self.fusion_batch.connect(self._fusion_worker.new_batch)
+        self.fusion_reset.connect(self._fusion_worker.reset)
+        self.fusion_algorithm.connect(self._fusion_worker.set_algorithm)
+        self.fusion_mag_trust.connect(self._fusion_worker.set_mag_trust)
+        self._fusion_worker.attitude_ready.connect(self._apply_attitude)
+        self._fusion_inflight = deque()  # 已提交、尚未返回结果的各批样本数（只在GUI线程中访问）
+        self._fusion_backlog = 0  # 已写入历史缓冲区、尚未送去融合的样本数
+        self._fusion_thread.start(QThread.HighPriority)
+        
+        # 文本标签批量刷新（减少卡顿）：样本只记录最新值，由10Hz定时器统一setText，
+        # 3D和曲线图仍逐样本实时更新
+        self._sensor_frame = SensorFrame()  # 最新样本，原地更新
+        self._latest_sample = None  # 有未显示的新样本时指向_sensor_frame
+        self._latest_attitude = None
+        
+        # 上次应用的状态（None表示尚未设置），样式表只在状态切换时重新设置
+        self._last_conn_state = None
+        self._last_encoder_state = None
+        self._label_cache = {}  # QLabel -> 上次设置的文本
+        
+        self.label_timer = QTimer(self)
+        self.label_timer.setTimerType(Qt.CoarseTimer)
+        self.label_timer.setInterval(100)
+        self.label_timer.timeout.connect(self._flush_labels)
+        
+        # 所有曲线图共用一个20Hz重绘定时器（只重绘可见且有新数据的曲线图）
+        self.plot_timer = QTimer(self)
+        self.plot_timer.setInterval(50)
+        self.plot_timer.timeout.connect(self._plot_tick)
         
         # 显示算法信息
         if self.use_ekf:
@@ -52,25 +173,32 @@ class MainWindow(QMainWindow):
         # 数据获取器
         self.data_fetcher = None
         
-        # 原始传感器数据
-        self.sensor_data = {
-            'accelX': 0.0, 'accelY': 0.0, 'accelZ': 0.0,
-            'gyroX': 0.0, 'gyroY': 0.0, 'gyroZ': 0.0,
-            'temperature': 0.0,
-            'angle': 0.0,
-            'angleRaw': 0,
-            'angleValid': False
-        }
+        # 传感器历史数据：按列（HISTORY_COLUMNS）存放的环形缓冲区，
+        # 每个样本一次整行写入，曲线图直接使用行切片视图
+        self.sensor_history = np.zeros((HISTORY_SIZE, len(HISTORY_COLUMNS)), dtype=np.float32)
+        self._history_head = 0  # 已写入样本总数
+        
+        # 曲线图批量推送：每plot_batch个样本向曲线图追加一次（滤波器仍逐样本运行）
+        self.plot_batch = 1
+        self._plot_pending = 0      # 尚未推送到曲线图的样本数
+        self._attitude_points = []  # 尚未推送的姿态角结果
         
         # 实时曲线图（停靠窗口）
         self.accel_plot = None
         self.gyro_plot = None
         self.attitude_plot = None
         self.encoder_plot = None
+        # 预先绑定的曲线图推送方法（曲线图未显示时为_noop，热路径无需判空和属性查找）
+        self._push_accel = _noop
+        self._push_gyro = _noop
+        self._push_attitude = _noop
+        self._push_encoder = _noop
         self.accel_dock = None
         self.gyro_dock = None
         self.attitude_dock = None
         self.encoder_dock = None
+        self._cached_plot_height = None     # _calculate_plot_height的缓存结果
+        self._plot_height_watched = False   # 是否已监听屏幕可用区域变化
         
         # 控制面板状态
         self.control_panel_expanded = True
@@ -78,6 +206,8 @@ class MainWindow(QMainWindow):
         self.toggle_panel_btn = None
         
         self.init_ui()
+        self.label_timer.start()
+        self.plot_timer.start()
         
     def init_ui(self):
         """初始化用户界面"""
@@ -104,6 +234,7 @@ class MainWindow(QMainWindow):
         self.gl_widget = GL3DWidget()
         # 设置最小尺寸，但允许自适应扩展
         self.gl_widget.setMinimumSize(600, 400)
+        self._update_attitude = self.gl_widget.update_attitude  # 预先绑定，热路径直接调用
         
         # 右侧：控制面板
         control_panel = self.create_control_panel()
@@ -129,38 +260,45 @@ class MainWindow(QMainWindow):
         QTimer.singleShot(100, self._show_default_plots)
     
     def _show_default_plots(self):
-        """默认显示所有曲线图"""
-        # 默认显示所有4个曲线图
-        
-        # 1. 加速度计曲线图
-        self.accel_plot_action.setChecked(True)
-        self.toggle_accel_plot(True)
-        
-        # 2. 陀螺仪曲线图
-        self.gyro_plot_action.setChecked(True)
-        self.toggle_gyro_plot(True)
-        
-        # 3. 姿态角曲线图
-        self.attitude_plot_action.setChecked(True)
-        self.toggle_attitude_plot(True)
-        
-        # 4. MT6701磁编码器角度曲线图
-        self.encoder_plot_action.setChecked(True)
-        self.toggle_encoder_plot(True)
-        
-        print("✅ 已自动打开所有曲线图（加速度计、陀螺仪、姿态角、MT6701角度）")
+        """默认显示所有曲线图（每个事件循环周期只创建一个，避免启动时界面卡顿）"""
+        # 默认显示所有4个曲线图：加速度计、陀螺仪、姿态角、MT6701磁编码器角度
+        self._plot_queue = deque([
+            (self.accel_plot_action, self.toggle_accel_plot),
+            (self.gyro_plot_action, self.toggle_gyro_plot),
+            (self.attitude_plot_action, self.toggle_attitude_plot),
+            (self.encoder_plot_action, self.toggle_encoder_plot),
+        ])
+        self._kick_plot_queue()
+    
+    def _kick_plot_queue(self):
+        """创建队列中的下一个曲线图，并把剩余的排到下一个事件循环周期"""
+        action, toggle = self._plot_queue.popleft()
+        action.setChecked(True)
+        toggle(True)
+        
+        if self._plot_queue:
+            QTimer.singleShot(0, self._kick_plot_queue)
+        else:
+            print("✅ 已自动打开所有曲线图（加速度计、陀螺仪、姿态角、MT6701角度）")
     
     def _calculate_plot_height(self):
         """
         计算曲线图窗口的合适高度
         
-        在Mac上，考虑程序坞高度，将可用高度均分给3个曲线图
+        在Mac上，考虑程序坞高度，将可用高度均分给3个曲线图。
+        结果只取决于屏幕可用区域，因此缓存起来，屏幕可用区域变化时才重新计算。
         
         Returns:
             int: 推荐的单个曲线图窗口高度
         """
+        if self._cached_plot_height is not None:
+            return self._cached_plot_height
+        
         # 获取屏幕可用区域（排除程序坞、菜单栏等）
         screen = QApplication.primaryScreen()
+        if not self._plot_height_watched:
+            screen.availableGeometryChanged.connect(self._invalidate_plot_height)
+            self._plot_height_watched = True
         available_geometry = screen.availableGeometry()
         
         # 可用高度
@@ -178,8 +316,13 @@ class MainWindow(QMainWindow):
         # 确保最小高度200px，最大高度400px
         plot_height = max(200, min(400, plot_height))
         
+        self._cached_plot_height = plot_height
         return plot_height
     
+    def _invalidate_plot_height(self, *args):
+        """屏幕可用区域变化时清除缓存的曲线图高度"""
+        self._cached_plot_height = None
+    
     def create_menu_bar(self):
         """创建菜单栏"""
         menubar = self.menuBar()
@@ -413,15 +556,7 @@ class MainWindow(QMainWindow):
         
         # 状态栏
         self.status_label = QLabel('⚪ 未连接')
-        self.status_label.setStyleSheet("""
-            QLabel {
-                background-color: #2a2a2a;
-                color: #888;
-                padding: 10px;
-                border-radius: 5px;
-                font-weight: bold;
-            }
-        """)
+        self.status_label.setStyleSheet(_STATUS_IDLE_QSS)
         layout.addWidget(self.status_label)
         
         layout.addStretch()
@@ -556,7 +691,7 @@ class MainWindow(QMainWindow):
         
         # 原始值显示
         layout.addWidget(QLabel('原始值:'), 1, 0)
-        self.encoder_raw_label = QLabel('-- / 16383')
+        self.encoder_raw_label = QLabel(_RAW_EMPTY)
         self.encoder_raw_label.setStyleSheet('color: #bbb; font-size: 12px;')
         layout.addWidget(self.encoder_raw_label, 1, 1)
         
@@ -594,6 +729,23 @@ class MainWindow(QMainWindow):
         self.model_combo.currentTextChanged.connect(self.on_model_changed)
         layout.addWidget(self.model_combo, 0, 1)
         
+        # 曲线图批量推送样本数（越大曲线刷新越少、CPU占用越低）
+        layout.addWidget(QLabel('曲线批量:'), 1, 0)
+        plot_batch_layout = QHBoxLayout()
+        self.plot_batch_slider = QSlider(Qt.Horizontal)
+        self.plot_batch_slider.setMinimum(1)
+        self.plot_batch_slider.setMaximum(10)
+        self.plot_batch_slider.setValue(self.plot_batch)
+        self.plot_batch_slider.setToolTip('每收到N个样本向曲线图推送一次')
+        self.plot_batch_slider.valueChanged.connect(self.on_plot_batch_changed)
+        plot_batch_layout.addWidget(self.plot_batch_slider)
+        
+        self.plot_batch_value_label = QLabel(str(self.plot_batch))
+        self.plot_batch_value_label.setFixedWidth(40)
+        self.plot_batch_value_label.setStyleSheet('color: #4ecdc4; font-weight: bold;')
+        plot_batch_layout.addWidget(self.plot_batch_value_label)
+        layout.addLayout(plot_batch_layout, 1, 1)
+        
         group.setLayout(layout)
         return group
     
@@ -656,81 +808,22 @@ class MainWindow(QMainWindow):
         return group
     
     def set_dark_theme(self):
-        """设置深色主题"""
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1a1a1a;
-            }
-            QWidget {
-                background-color: #1a1a1a;
-                color: #e0e0e0;
-            }
-            QGroupBox {
-                border: 2px solid #3a3a3a;
-                border-radius: 8px;
-                margin-top: 10px;
-                padding-top: 15px;
-                font-weight: bold;
-                color: #4ecdc4;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px;
-            }
-            QPushButton {
-                background-color: #4ecdc4;
-                color: #1a1a1a;
-                border: none;
-                padding: 10px;
-                border-radius: 5px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #45b8ac;
-            }
-            QPushButton:pressed {
-                background-color: #3da89d;
-            }
-            QLineEdit {
-                background-color: #2a2a2a;
-                border: 2px solid #3a3a3a;
-                border-radius: 5px;
-                padding: 5px;
-                color: #e0e0e0;
-            }
-            QLineEdit:focus {
-                border: 2px solid #4ecdc4;
-            }
-            QComboBox {
-                background-color: #2a2a2a;
-                border: 2px solid #3a3a3a;
-                border-radius: 5px;
-                padding: 5px;
-                color: #e0e0e0;
-            }
-            QLabel {
-                color: #e0e0e0;
-            }
-        """)
+        """设置深色主题（样式表从assets/dark_theme.qss读取，只读取一次）"""
+        self.setStyleSheet(_load_stylesheet('dark_theme.qss'))
     
     def toggle_connection(self):
         """切换连接状态"""
         if self.data_fetcher is None or not self.data_fetcher.running:
             # 开始连接
-            url = f"http://{self.ip_input.text()}/data"
-            self.data_fetcher = DataFetcher(url, interval=100)
-            self.data_fetcher.data_received.connect(self.on_data_received)
+            url = f"http://{self.ip_input.text()}/data_bin"  # 旧版固件会自动回退到/data
+            self.data_fetcher = DataFetcher(url, interval=100, emit_single=False, emit_batch=False)
             self.data_fetcher.connection_status.connect(self.on_connection_status)
+            # 有新样本时由获取线程通知（排队连接，在GUI线程中读空环形缓冲区）
+            self.data_fetcher.samples_available.connect(self._drain_sensor_ring)
             self.data_fetcher.start()
             
             self.connect_btn.setText('🔌 断开连接')
-            self.connect_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #ff6b6b;
-                    color: white;
-                }
-            """)
+            self.connect_btn.setStyleSheet(_DISCONNECT_BTN_QSS)
             self.ip_input.setEnabled(False)
         else:
             # 断开连接
@@ -739,142 +832,211 @@ class MainWindow(QMainWindow):
             self.connect_btn.setStyleSheet('')
             self.ip_input.setEnabled(True)
             self.status_label.setText('⚪ 已断开')
-            self.status_label.setStyleSheet("""
-                QLabel {
-                    background-color: #2a2a2a;
-                    color: #888;
-                    padding: 10px;
-                    border-radius: 5px;
-                    font-weight: bold;
-                }
-            """)
+            self.status_label.setStyleSheet(_STATUS_IDLE_QSS)
+            self._last_conn_state = None
     
-    def on_data_received(self, data):
-        """处理接收到的数据 - 优化版，减少UI刷新卡顿"""
-        self.sensor_data = data
-        
-        # UI更新节流：跳过部分UI文本更新，但保持3D和曲线图实时
-        self.ui_update_counter += 1
-        should_update_text = (self.ui_update_counter % (self.ui_update_skip + 1) == 0)
-        
-        # 文本标签更新（节流）
-        if should_update_text:
-            self.accel_x_label.setText(f"{data['accelX']:.3f} g")
-            self.accel_y_label.setText(f"{data['accelY']:.3f} g")
-            self.accel_z_label.setText(f"{data['accelZ']:.3f} g")
-            
-            self.gyro_x_label.setText(f"{data['gyroX']:.2f} °/s")
-            self.gyro_y_label.setText(f"{data['gyroY']:.2f} °/s")
-            self.gyro_z_label.setText(f"{data['gyroZ']:.2f} °/s")
-            
-            self.temp_label.setText(f"{data['temperature']:.2f} °C")
-        
-        # 更新MT6701磁编码器数据显示（节流）
-        mag_angle = None
-        mag_valid = False
-        if 'angle' in data and data.get('angleValid', False):
-            mag_angle = data['angle']
-            mag_valid = True
-            if should_update_text:
-                self.encoder_angle_label.setText(f"{data['angle']:.2f}°")
-                self.encoder_raw_label.setText(f"{data.get('angleRaw', 0)} / 16383")
-                self.encoder_status_label.setText('🟢 正常')
-                self.encoder_status_label.setStyleSheet('color: #7ed321; font-size: 11px; font-weight: bold;')
-        elif 'angle' in data:
-            # 数据存在但无效
-            if should_update_text:
-                self.encoder_angle_label.setText('N/A')
-                self.encoder_raw_label.setText('-- / 16383')
-                self.encoder_status_label.setText('🔴 无效')
-                self.encoder_status_label.setStyleSheet('color: #ff6b6b; font-size: 11px; font-weight: bold;')
-        else:
-            # 没有MT6701数据（向后兼容旧版固件）
-            if should_update_text:
-                self.encoder_angle_label.setText('--')
-                self.encoder_raw_label.setText('-- / 16383')
-                self.encoder_status_label.setText('⚪ 未安装')
-                self.encoder_status_label.setStyleSheet('color: #888; font-size: 11px;')
-        
-        # 根据选择的算法计算姿态（始终执行，保证数据准确）
-        if self.use_ekf:
-            # 使用EKF算法（融合加速度计、陀螺仪、磁力计）
-            roll, pitch, yaw = self.ekf_estimator.update(
-                data['accelX'], data['accelY'], data['accelZ'],
-                data['gyroX'], data['gyroY'], data['gyroZ'],
-                mag_angle=mag_angle, mag_valid=mag_valid,
-                dt=0.1
-            )
-            
-            # 更新不确定性显示（节流）
-            if should_update_text:
-                uncertainty = self.ekf_estimator.get_uncertainty()
-                self.uncertainty_label.setText(
-                    f"不确定性: ±{uncertainty[0]:.2f}° ±{uncertainty[1]:.2f}° ±{uncertainty[2]:.2f}°"
-                )
-            
-            # 从欧拉角计算四元数（用于3D渲染）
-            from quaternion import euler_to_quaternion
-            quaternion = euler_to_quaternion(roll, pitch, yaw)
-        else:
-            # 使用Madgwick算法
-            roll, pitch, yaw = self.attitude_calculator.update(
-                data['accelX'], data['accelY'], data['accelZ'],
-                data['gyroX'], data['gyroY'], data['gyroZ'],
-                dt=0.1
-            )
+    def _drain_sensor_ring(self, count=0):
+        """
+        读取环形缓冲区中的全部新样本并按顺序处理
+        
+        Args:
+            count: 通知发出时的待读样本数（仅作参考，实际读到缓冲区为空）
+        """
+        if self.data_fetcher is None:
+            return
+        self.on_records_received(self.data_fetcher.ring.drain())
+        self._submit_fusion_batch()
+    
+    def _submit_fusion_batch(self):
+        """把积压的样本从历史缓冲区切片成连续数组，一次性交给融合线程"""
+        if self._fusion_backlog == 0 or len(self._fusion_inflight) >= self.MAX_FUSION_PENDING:
+            return
+        count = min(self._fusion_backlog, HISTORY_SIZE)
+        self._fusion_backlog = 0
+        self._fusion_inflight.append(count)
+        self.fusion_batch.emit(self._history_tail(count))
+    
+    def on_records_received(self, records):
+        """
+        处理环形缓冲区读出的一批样本记录（按列整块写入，不逐样本构造字典）
+        
+        Args:
+            records: SENSOR_RECORD_DTYPE结构化数组，按时间顺序排列
+        """
+        count = len(records)
+        if count == 0:
+            return
+        if count > HISTORY_SIZE:
+            records = records[-HISTORY_SIZE:]
+            count = HISTORY_SIZE
+        
+        # 按列写入历史缓冲区（角度缺失或无效时为NaN）
+        block = np.empty((count, len(HISTORY_COLUMNS)), dtype=np.float32)
+        for col, name in enumerate(HISTORY_COLUMNS[:7]):
+            block[:, col] = records[name]
+        block[:, 7] = np.where(records['hasAngle'] & records['angleValid'],
+                               records['angle'], np.nan)
+        index = np.arange(self._history_head, self._history_head + count) & (HISTORY_SIZE - 1)
+        self.sensor_history[index] = block
+        self._history_head += count
+        
+        # 只需记录最后一个样本，供_flush_labels刷新标签
+        self._sensor_frame.update_from_record(records[-1])
+        self._latest_sample = self._sensor_frame
+        
+        # 姿态解算由_submit_fusion_batch成批交给融合线程
+        self._fusion_backlog += count
+        
+        # 攒够plot_batch个样本后批量推送到曲线图
+        self._plot_pending += count
+        if self._plot_pending >= self.plot_batch:
+            self._push_plot_batch()
+    
+    def _history_tail(self, count):
+        """
+        取出历史缓冲区中最近count个样本
+        
+        Args:
+            count: 样本数（不超过HISTORY_SIZE）
             
-            # 获取四元数
-            quaternion = self.attitude_calculator.get_quaternion()
-            if should_update_text:
-                self.uncertainty_label.setText('不确定性: --')
+        Returns:
+            (count, len(HISTORY_COLUMNS))数组，按时间顺序排列
+        """
+        index = np.arange(self._history_head - count, self._history_head) & (HISTORY_SIZE - 1)
+        return self.sensor_history[index]
+    
+    def _push_plot_batch(self):
+        """将尚未推送的传感器样本批量追加到曲线图"""
+        tail = self._history_tail(min(self._plot_pending, HISTORY_SIZE))
+        self._plot_pending = 0
+        
+        self._push_accel(tail[:, COL_ACCEL])
+        self._push_gyro(tail[:, COL_GYRO])
+        
+        # MT6701角度曲线图只绘制有效角度
+        if self._push_encoder is not _noop:
+            angles = tail[:, COL_ANGLE]
+            angles = angles[~np.isnan(angles[:, 0])]
+            if len(angles):
+                self._push_encoder(angles)
+    
+    def _apply_attitude(self, roll, pitch, yaw, quaternion, uncertainty):
+        """
+        接收融合线程的姿态结果并更新显示
         
-        # 更新姿态角显示（节流）
-        if should_update_text:
-            self.roll_label.setText(f"{roll:.2f}°")
-            self.pitch_label.setText(f"{pitch:.2f}°")
-            self.yaw_label.setText(f"{yaw:.2f}°")
+        Args:
+            roll, pitch, yaw: 姿态角(度)
+            quaternion: (w, x, y, z)四元数
+            uncertainty: EKF估计不确定性(度)，Madgwick算法时为None
+        """
+        # 排队信号按提交顺序返回，队首即本结果对应批次的样本数
+        count = self._fusion_inflight.popleft()
         
-        # 更新3D模型（传入四元数以获得更好的旋转效果）
-        self.gl_widget.update_attitude(roll, pitch, yaw, quaternion=quaternion)
+        # 记录最新姿态，标签由_flush_labels统一刷新
+        self._latest_attitude = (roll, pitch, yaw, uncertainty)
         
-        # 更新实时曲线图
-        if self.accel_plot is not None:
-            self.accel_plot.add_data([data['accelX'], data['accelY'], data['accelZ']])
+        # 更新3D模型（传入四元数以获得更好的旋转效果）
+        self._update_attitude(roll, pitch, yaw, quaternion=quaternion)
         
-        if self.gyro_plot is not None:
-            self.gyro_plot.add_data([data['gyroX'], data['gyroY'], data['gyroZ']])
+        # 姿态角曲线同样按plot_batch批量推送；每批只返回最终姿态，按样本数重复，
+        # 保持每样本一个点，与加速度/角速度曲线的时间轴对齐
+        self._attitude_points.extend([(roll, pitch, yaw)] * count)
+        if len(self._attitude_points) >= self.plot_batch:
+            self._push_attitude(self._attitude_points)
+            self._attitude_points = []
         
-        if self.attitude_plot is not None:
-            self.attitude_plot.add_data([roll, pitch, yaw])
+        # 在途批次已满时积压的样本在此补交，数据流停止后也不会滞留
+        self._submit_fusion_batch()
+    
+    def _plot_tick(self):
+        """共享定时器回调：刷新所有可见的曲线图"""
+        for dock, plot in ((self.accel_dock, self.accel_plot),
+                           (self.gyro_dock, self.gyro_plot),
+                           (self.attitude_dock, self.attitude_plot),
+                           (self.encoder_dock, self.encoder_plot)):
+            if dock is not None and dock.isVisible():
+                plot.flush()
+    
+    def _set(self, label, text):
+        """
+        设置标签文本，文本与上次相同时跳过（静止时避免重复setText和重绘）
         
-        # 更新MT6701角度曲线图
-        if self.encoder_plot is not None and mag_valid:
-            self.encoder_plot.add_data([mag_angle])
+        Args:
+            label: QLabel
+            text: 新文本
+        """
+        if self._label_cache.get(label) != text:
+            label.setText(text)
+            self._label_cache[label] = text
+    
+    def _flush_labels(self):
+        """批量刷新文本标签（10Hz定时器调用，只处理上次刷新后到达的新数据）"""
+        data = self._latest_sample
+        if data is not None:
+            self._latest_sample = None
+            
+            self._set(self.accel_x_label, _ACCEL_FMT(data.accelX))
+            self._set(self.accel_y_label, _ACCEL_FMT(data.accelY))
+            self._set(self.accel_z_label, _ACCEL_FMT(data.accelZ))
+            
+            self._set(self.gyro_x_label, _GYRO_FMT(data.gyroX))
+            self._set(self.gyro_y_label, _GYRO_FMT(data.gyroY))
+            self._set(self.gyro_z_label, _GYRO_FMT(data.gyroZ))
+            
+            self._set(self.temp_label, _TEMP_FMT(data.temperature))
+            
+            # MT6701磁编码器数据显示（只查一次字典）
+            angle = data.angle
+            if angle is None:
+                # 没有MT6701数据（向后兼容旧版固件）
+                self._set(self.encoder_angle_label, '--')
+                self._set(self.encoder_raw_label, _RAW_EMPTY)
+                encoder_state = 'na'
+            elif data.angleValid:
+                self._set(self.encoder_angle_label, _DEG_FMT(angle))
+                self._set(self.encoder_raw_label, str(data.angleRaw) + _RAW_SUFFIX)
+                encoder_state = 'ok'
+            else:
+                # 数据存在但无效
+                self._set(self.encoder_angle_label, 'N/A')
+                self._set(self.encoder_raw_label, _RAW_EMPTY)
+                encoder_state = 'bad'
+            
+            # 编码器状态文本和样式表只在状态切换时更新
+            if encoder_state != self._last_encoder_state:
+                self._last_encoder_state = encoder_state
+                text, qss = _ENCODER_STATUS[encoder_state]
+                self.encoder_status_label.setText(text)
+                self.encoder_status_label.setStyleSheet(qss)
+        
+        attitude = self._latest_attitude
+        if attitude is not None:
+            self._latest_attitude = None
+            roll, pitch, yaw, uncertainty = attitude
+            
+            # 控制面板收起（标签不可见）时跳过不确定性格式化
+            if self.uncertainty_label.isVisible():
+                if uncertainty is not None:
+                    self._set(self.uncertainty_label, _UNCERTAINTY_FMT(*uncertainty))
+                else:
+                    self._set(self.uncertainty_label, '不确定性: --')
+            
+            self._set(self.roll_label, _DEG_FMT(roll))
+            self._set(self.pitch_label, _DEG_FMT(pitch))
+            self._set(self.yaw_label, _DEG_FMT(yaw))
     
     def on_connection_status(self, connected, message):
         """处理连接状态变化"""
         if connected:
             self.status_label.setText(f'🟢 {message}')
-            self.status_label.setStyleSheet("""
-                QLabel {
-                    background-color: #2d5016;
-                    color: #7ed321;
-                    padding: 10px;
-                    border-radius: 5px;
-                    font-weight: bold;
-                }
-            """)
         else:
             self.status_label.setText(f'🔴 {message}')
-            self.status_label.setStyleSheet("""
-                QLabel {
-                    background-color: #5a1616;
-                    color: #ff6b6b;
-                    padding: 10px;
-                    border-radius: 5px;
-                    font-weight: bold;
-                }
-            """)
+        
+        # 样式表只在连接状态切换时重新设置
+        if connected != self._last_conn_state:
+            self._last_conn_state = connected
+            self.status_label.setStyleSheet(
+                _STATUS_CONNECTED_QSS if connected else _STATUS_DISCONNECTED_QSS)
     
     def on_model_changed(self, model_name):
         """模型类型改变"""
@@ -885,22 +1047,19 @@ class MainWindow(QMainWindow):
     
     def reset_attitude(self):
         """重置姿态"""
-        if self.use_ekf:
-            self.ekf_estimator.reset()
-        else:
-            self.attitude_calculator.reset()
+        self.fusion_reset.emit()
         self.gl_widget.update_attitude(0, 0, 0)
     
     def on_algorithm_changed(self, index):
         """算法选择改变"""
         if index == 0:  # EKF
             self.use_ekf = True
-            self.ekf_estimator.reset()
+            self.fusion_algorithm.emit(True)
             self.mag_trust_slider.setEnabled(True)
             print("🎯 切换到EKF算法（融合多传感器）")
         else:  # Madgwick
             self.use_ekf = False
-            self.attitude_calculator.reset()
+            self.fusion_algorithm.emit(False)
             self.mag_trust_slider.setEnabled(False)
             print("🎯 切换到Madgwick算法")
     
@@ -910,9 +1069,14 @@ class MainWindow(QMainWindow):
         self.mag_trust_value_label.setText(f"{value}%")
         
         if self.use_ekf:
-            self.ekf_estimator.set_mag_trust(trust_factor)
+            self.fusion_mag_trust.emit(trust_factor)
             print(f"⚙️ 磁力计信任度调整为 {value}%")
     
+    def on_plot_batch_changed(self, value):
+        """曲线图批量推送样本数调整"""
+        self.plot_batch = value
+        self.plot_batch_value_label.setText(str(value))
+    
     def import_model(self):
         """导入自定义3D模型"""
         # 打开文件选择对话框
@@ -950,7 +1114,7 @@ class MainWindow(QMainWindow):
                     "无法加载该3D模型文件。\n\n"
                     "请确保文件格式正确，支持的格式：\n"
                     "- OBJ (.obj)\n"
-                    "- STL (.stl, ASCII格式)"
+                    "- STL (.stl, ASCII或二进制格式)"
                 )
     
     def reset_to_default_model(self):
@@ -969,209 +1133,80 @@ class MainWindow(QMainWindow):
     
     def toggle_accel_plot(self, checked):
         """切换加速度计曲线图显示"""
-        if checked:
-            if self.accel_dock is None:
-                # 计算合适的窗口高度
-                plot_height = self._calculate_plot_height()
-                
-                # 创建停靠窗口
-                self.accel_dock = QDockWidget("加速度计曲线", self)
-                self.accel_dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea | 
-                                               Qt.TopDockWidgetArea | Qt.BottomDockWidgetArea)
-                
-                # 创建曲线图
-                self.accel_plot = AccelerometerPlot()
-                self.accel_dock.setWidget(self.accel_plot)
-                
-                # 设置样式
-                self.accel_dock.setStyleSheet("""
-                    QDockWidget {
-                        color: #e0e0e0;
-                        font-weight: bold;
-                    }
-                    QDockWidget::title {
-                        background-color: #2a2a2a;
-                        padding: 5px;
-                    }
-                """)
-                
-                # 默认停靠在左侧
-                self.addDockWidget(Qt.LeftDockWidgetArea, self.accel_dock)
-                
-                # 设置合适的尺寸
-                self.accel_dock.setMinimumWidth(300)
-                self.accel_dock.setMaximumWidth(500)
-                self.accel_dock.setMinimumHeight(plot_height)
-                self.accel_dock.setMaximumHeight(plot_height)
-                
-                # 连接关闭信号
-                self.accel_dock.visibilityChanged.connect(
-                    lambda visible: self.accel_plot_action.setChecked(visible)
-                )
-            else:
-                self.accel_dock.show()
-        else:
-            if self.accel_dock:
-                self.accel_dock.hide()
+        self._toggle_plot('accel', checked)
     
     def toggle_gyro_plot(self, checked):
         """切换陀螺仪曲线图显示"""
-        if checked:
-            if self.gyro_dock is None:
-                # 计算合适的窗口高度
-                plot_height = self._calculate_plot_height()
-                
-                # 创建停靠窗口
-                self.gyro_dock = QDockWidget("陀螺仪曲线", self)
-                self.gyro_dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea | 
-                                              Qt.TopDockWidgetArea | Qt.BottomDockWidgetArea)
-                
-                # 创建曲线图
-                self.gyro_plot = GyroscopePlot()
-                self.gyro_dock.setWidget(self.gyro_plot)
-                
-                # 设置样式
-                self.gyro_dock.setStyleSheet("""
-                    QDockWidget {
-                        color: #e0e0e0;
-                        font-weight: bold;
-                    }
-                    QDockWidget::title {
-                        background-color: #2a2a2a;
-                        padding: 5px;
-                    }
-                """)
-                
-                # 默认停靠在左侧
-                self.addDockWidget(Qt.LeftDockWidgetArea, self.gyro_dock)
-                
-                # 如果加速度计窗口存在，则堆叠在下方
-                if self.accel_dock and self.accel_dock.isVisible():
-                    self.splitDockWidget(self.accel_dock, self.gyro_dock, Qt.Vertical)
-                
-                # 设置合适的尺寸
-                self.gyro_dock.setMinimumWidth(300)
-                self.gyro_dock.setMaximumWidth(500)
-                self.gyro_dock.setMinimumHeight(plot_height)
-                self.gyro_dock.setMaximumHeight(plot_height)
-                
-                # 连接关闭信号
-                self.gyro_dock.visibilityChanged.connect(
-                    lambda visible: self.gyro_plot_action.setChecked(visible)
-                )
-            else:
-                self.gyro_dock.show()
-        else:
-            if self.gyro_dock:
-                self.gyro_dock.hide()
+        self._toggle_plot('gyro', checked)
     
     def toggle_attitude_plot(self, checked):
         """切换姿态角曲线图显示"""
-        if checked:
-            if self.attitude_dock is None:
-                # 计算合适的窗口高度
-                plot_height = self._calculate_plot_height()
-                
-                # 创建停靠窗口
-                self.attitude_dock = QDockWidget("姿态角曲线", self)
-                self.attitude_dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea | 
-                                                  Qt.TopDockWidgetArea | Qt.BottomDockWidgetArea)
-                
-                # 创建曲线图
-                self.attitude_plot = AttitudePlot()
-                self.attitude_dock.setWidget(self.attitude_plot)
-                
-                # 设置样式
-                self.attitude_dock.setStyleSheet("""
-                    QDockWidget {
-                        color: #e0e0e0;
-                        font-weight: bold;
-                    }
-                    QDockWidget::title {
-                        background-color: #2a2a2a;
-                        padding: 5px;
-                    }
-                """)
-                
-                # 默认停靠在左侧
-                self.addDockWidget(Qt.LeftDockWidgetArea, self.attitude_dock)
-                
-                # 如果陀螺仪窗口存在，则堆叠在下方
-                if self.gyro_dock and self.gyro_dock.isVisible():
-                    self.splitDockWidget(self.gyro_dock, self.attitude_dock, Qt.Vertical)
-                elif self.accel_dock and self.accel_dock.isVisible():
-                    self.splitDockWidget(self.accel_dock, self.attitude_dock, Qt.Vertical)
-                
-                # 设置合适的尺寸
-                self.attitude_dock.setMinimumWidth(300)
-                self.attitude_dock.setMaximumWidth(500)
-                self.attitude_dock.setMinimumHeight(plot_height)
-                self.attitude_dock.setMaximumHeight(plot_height)
-                
-                # 连接关闭信号
-                self.attitude_dock.visibilityChanged.connect(
-                    lambda visible: self.attitude_plot_action.setChecked(visible)
-                )
-            else:
-                self.attitude_dock.show()
-        else:
-            if self.attitude_dock:
-                self.attitude_dock.hide()
+        self._toggle_plot('attitude', checked)
     
     def toggle_encoder_plot(self, checked):
         """切换MT6701角度曲线图显示"""
+        self._toggle_plot('encoder', checked)
+    
+    def _toggle_plot(self, kind, checked):
+        """
+        切换曲线图停靠窗口的显示（首次显示时创建）
+        
+        对应的属性为self.<kind>_dock、self.<kind>_plot、self.<kind>_plot_action
+        和self._push_<kind>。
+        
+        Args:
+            kind: PLOT_SPECS中的曲线图类型
+            checked: 是否显示
+        """
+        dock = getattr(self, f'{kind}_dock')
         if checked:
-            if self.encoder_dock is None:
+            if dock is None:
+                class_name, title = PLOT_SPECS[kind]
+                import realtime_plot  # 延迟导入
+                
                 # 计算合适的窗口高度
                 plot_height = self._calculate_plot_height()
                 
                 # 创建停靠窗口
-                self.encoder_dock = QDockWidget("MT6701角度曲线", self)
-                self.encoder_dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea | 
-                                                  Qt.TopDockWidgetArea | Qt.BottomDockWidgetArea)
+                dock = QDockWidget(title, self)
+                dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea | 
+                                     Qt.TopDockWidgetArea | Qt.BottomDockWidgetArea)
+                setattr(self, f'{kind}_dock', dock)
                 
                 # 创建曲线图
-                self.encoder_plot = EncoderAnglePlot()
-                self.encoder_dock.setWidget(self.encoder_plot)
-                
-                # 设置样式
-                self.encoder_dock.setStyleSheet("""
-                    QDockWidget {
-                        color: #e0e0e0;
-                        font-weight: bold;
-                    }
-                    QDockWidget::title {
-                        background-color: #2a2a2a;
-                        padding: 5px;
-                    }
-                """)
+                plot = getattr(realtime_plot, class_name)()
+                dock.setWidget(plot)
+                setattr(self, f'{kind}_plot', plot)
                 
                 # 默认停靠在左侧
-                self.addDockWidget(Qt.LeftDockWidgetArea, self.encoder_dock)
+                self.addDockWidget(Qt.LeftDockWidgetArea, dock)
                 
-                # 根据已有窗口进行堆叠
-                if self.attitude_dock and self.attitude_dock.isVisible():
-                    self.splitDockWidget(self.attitude_dock, self.encoder_dock, Qt.Vertical)
-                elif self.gyro_dock and self.gyro_dock.isVisible():
-                    self.splitDockWidget(self.gyro_dock, self.encoder_dock, Qt.Vertical)
-                elif self.accel_dock and self.accel_dock.isVisible():
-                    self.splitDockWidget(self.accel_dock, self.encoder_dock, Qt.Vertical)
+                # 堆叠在排在前面的最后一个可见曲线图下方
+                kinds = list(PLOT_SPECS)
+                for previous in reversed(kinds[:kinds.index(kind)]):
+                    previous_dock = getattr(self, f'{previous}_dock')
+                    if previous_dock and previous_dock.isVisible():
+                        self.splitDockWidget(previous_dock, dock, Qt.Vertical)
+                        break
                 
                 # 设置合适的尺寸
-                self.encoder_dock.setMinimumWidth(300)
-                self.encoder_dock.setMaximumWidth(500)
-                self.encoder_dock.setMinimumHeight(plot_height)
-                self.encoder_dock.setMaximumHeight(plot_height)
+                dock.setMinimumWidth(300)
+                dock.setMaximumWidth(500)
+                dock.setMinimumHeight(plot_height)
+                dock.setMaximumHeight(plot_height)
                 
                 # 连接关闭信号
-                self.encoder_dock.visibilityChanged.connect(
-                    lambda visible: self.encoder_plot_action.setChecked(visible)
-                )
+                dock.visibilityChanged.connect(getattr(self, f'{kind}_plot_action').setChecked)
             else:
-                self.encoder_dock.show()
+                dock.show()
+                getattr(self, f'{kind}_plot').force_redraw()
         else:
-            if self.encoder_dock:
-                self.encoder_dock.hide()
+            if dock:
+                dock.hide()
+        
+        # 隐藏时不再向曲线图推送数据
+        setattr(self, f'_push_{kind}',
+                getattr(self, f'{kind}_plot').add_data_batch if checked else _noop)
     
     def show_about(self):
         """显示关于对话框"""
@@ -1265,11 +1300,11 @@ class MainWindow(QMainWindow):
             "<p><b>特点:</b></p>"
             "<ul>"
             "<li>3D打印标准格式</li>"
-            "<li>支持ASCII格式（注意：不支持二进制格式）</li>"
+            "<li>支持ASCII和二进制格式（自动识别）</li>"
             "</ul>"
             "<p><b>注意事项:</b></p>"
             "<ul>"
-            "<li>导出时选择<b>ASCII格式</b></li>"
+            "<li>大模型推荐导出为<b>二进制格式</b>，加载更快</li>"
             "<li>模型会自动缩放到合适大小</li>"
             "<li>复杂模型可能加载较慢</li>"
             "</ul>"
@@ -1285,7 +1320,11 @@ class MainWindow(QMainWindow):
         
     def closeEvent(self, event):
         """窗口关闭事件"""
+        self.label_timer.stop()
+        self.plot_timer.stop()
         if self.data_fetcher and self.data_fetcher.running:
             self.data_fetcher.stop()
+        self._fusion_thread.quit()
+        self._fusion_thread.wait()
         event.accept()
 
@@ -1,48 +1,33 @@
 """
 实时曲线图组件 - 性能优化版
 用于显示传感器数据和姿态角的实时变化
-优化：使用blit加速绘制，减少不必要的重绘
+优化：使用PyQtGraph直接通过QPainter绘制曲线，无需matplotlib的光栅化和blit
 """
-import os
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
 from PyQt5.QtCore import Qt, QTimer
-import matplotlib
-matplotlib.use('Qt5Agg')
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-from matplotlib.font_manager import FontProperties, fontManager
+from functools import lru_cache
+import pyqtgraph as pg
 import numpy as np
-from collections import deque
-import time
 
-# 配置中文字体（使用项目本地字体文件）
-def setup_chinese_font():
-    """设置matplotlib支持中文显示 - 使用项目本地字体"""
-    # 获取字体文件路径
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    assets_dir = os.path.join(os.path.dirname(current_dir), 'assets')
-    font_path = os.path.join(assets_dir, 'STHeiti Light.ttc')
-    
-    if os.path.exists(font_path):
-        # 添加字体到matplotlib
-        fontManager.addfont(font_path)
-        
-        # 设置为默认字体
-        plt.rcParams['font.sans-serif'] = ['STHeiti Light', 'STHeiti', 'PingFang SC']
-        plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
-        
-        print(f"✅ 已加载字体: {font_path}")
-        return font_path
-    else:
-        # 备用方案：使用系统字体
-        print(f"⚠️ 未找到字体文件: {font_path}，使用系统字体")
-        plt.rcParams['font.sans-serif'] = ['PingFang SC', 'STHeiti', 'Arial Unicode MS']
-        plt.rcParams['axes.unicode_minus'] = False
-        return None
+# 全局绘图选项：关闭抗锯齿，深色背景
+pg.setConfigOptions(antialias=False, background='#2a2a2a', foreground='#888')
+
+# 所有曲线图共享的样式对象（模块导入时创建一次）
+_TITLE_STYLE = {'color': '#e0e0e0', 'size': '10pt', 'bold': True}
+_AXIS_LABEL_STYLE = {'color': '#888'}
+_LEGEND_BRUSH = pg.mkBrush(42, 42, 42, 80)
+
 
-# 初始化字体并保存路径
-FONT_PATH = setup_chinese_font()
+@lru_cache(maxsize=None)
+def _curve_pen(color):
+    """同色曲线共享一个QPen"""
+    return pg.mkPen(color, width=1)
+
+
+@lru_cache(maxsize=None)
+def _reference_pen(alpha):
+    """同一不透明度的参考线共享一个虚线QPen"""
+    return pg.mkPen(color=(68, 68, 68, int(alpha * 255)), width=1, style=Qt.DashLine)
 
 
 class RealtimePlotWidget(QWidget):
@@ -72,17 +57,19 @@ class RealtimePlotWidget(QWidget):
         else:
             self.colors = colors
         
-        # 数据缓冲区
-        self.data_buffers = [deque(maxlen=max_points) for _ in y_labels]
-        self.time_buffer = deque(maxlen=max_points)
-        self.time_counter = 0
+        # 数据缓冲区：预分配的双写环形缓冲区，每个样本同时写入位置head和head+max_points，
+        # 因此最近count个样本总是连续的[start:start+count]切片，可直接交给曲线
+        self.data_buffers = np.zeros((len(y_labels), 2 * max_points), dtype=np.float32)
+        self.head = 0   # 下一个写入位置（0 ~ max_points-1）
+        self.count = 0  # 有效样本数（不超过max_points）
+        
+        # 相对时间轴（秒，最新样本固定在0处）：X轴范围固定不变，
+        # 每帧只取其末尾count个点，避免滚动X轴导致的刻度重新布局
+        self.time_axis = np.arange(-(max_points - 1), 1, dtype=np.float32) * 0.1  # 假设100ms采样
         
-        # 性能优化
-        self.update_timer = None
+        # 性能优化：add_data只追加数据并标记待更新，由外部定时器统一调用flush()重绘
         self.pending_update = False
-        self.last_update_time = 0
-        self.min_update_interval = 0.05  # 最小更新间隔50ms（20fps）
-        self.background = None  # 用于blit优化
+        self._ylim = None  # 自动Y轴范围时上次设置的范围
         
         self.init_ui()
         
@@ -92,54 +79,40 @@ class RealtimePlotWidget(QWidget):
         layout.setContentsMargins(5, 5, 5, 5)
         self.setLayout(layout)
         
-        # 创建matplotlib图表
-        self.figure = Figure(figsize=(4, 3), facecolor='#1a1a1a')
-        self.canvas = FigureCanvas(self.figure)
-        self.ax = self.figure.add_subplot(111, facecolor='#2a2a2a')
+        # 创建PyQtGraph图表（可用时使用OpenGL绘制曲线）
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.useOpenGL(True)
+        self.plot_widget.setAntialiasing(False)
+        self.plot_item = self.plot_widget.getPlotItem()
         
-        # 初始化曲线
-        self.lines = []
-        for i, (label, color) in enumerate(zip(self.y_labels, self.colors)):
-            line, = self.ax.plot([], [], color=color, linewidth=1.2, label=label, alpha=0.9)
-            self.lines.append(line)
+        # 只绘制可见范围内的点，点数超过像素宽度时按峰值降采样
+        self.plot_item.setDownsampling(auto=True, mode='peak')
+        self.plot_item.setClipToView(True)
         
-        # 设置样式（使用配置好的中文字体）
-        self.ax.set_title(self.title, color='#e0e0e0', fontsize=10, fontweight='bold', pad=8)
-        self.ax.set_xlabel('时间 (s)', color='#888', fontsize=8)
-        self.ax.set_ylabel('数值', color='#888', fontsize=8)
-        
-        # 设置坐标轴颜色
-        self.ax.spines['bottom'].set_color('#3a3a3a')
-        self.ax.spines['top'].set_color('#3a3a3a')
-        self.ax.spines['left'].set_color('#3a3a3a')
-        self.ax.spines['right'].set_color('#3a3a3a')
-        self.ax.tick_params(colors='#888', labelsize=7)
-        
-        # 网格
-        self.ax.grid(True, alpha=0.2, color='#555')
-        
-        # 图例（使用配置好的中文字体）
-        # 创建字体属性对象
-        if FONT_PATH and os.path.exists(FONT_PATH):
-            font_prop = FontProperties(fname=FONT_PATH, size=7)
-        else:
-            font_prop = FontProperties(size=7)
+        # 设置样式
+        self.plot_item.setTitle(self.title, **_TITLE_STYLE)
+        self.plot_item.setLabel('bottom', '时间 (s，0为最新)', **_AXIS_LABEL_STYLE)
+        self.plot_item.setLabel('left', '数值', **_AXIS_LABEL_STYLE)
+        self.plot_item.showGrid(x=True, y=True, alpha=0.2)
+        self.plot_item.addLegend(offset=(-10, 10), labelTextColor='#e0e0e0',
+                                 brush=_LEGEND_BRUSH)
         
-        legend = self.ax.legend(loc='upper right', framealpha=0.3, 
-                               facecolor='#2a2a2a', edgecolor='#3a3a3a',
-                               prop=font_prop)
-        # 设置图例文字颜色
-        for text in legend.get_texts():
-            text.set_color('#e0e0e0')
+        # 关闭自动缩放：固定Y轴范围直接设置，否则由update_plot按数据计算
+        if self.y_range is not None:
+            self.plot_item.setYRange(self.y_range[0], self.y_range[1], padding=0)
+        self.plot_item.enableAutoRange(enable=False)
         
-        # 紧凑布局
-        self.figure.tight_layout()
+        # X轴固定为整个缓冲区的时间跨度，之后不再改变
+        self.plot_item.setXRange(float(self.time_axis[0]), 0.5, padding=0)
+        self.plot_item.setMouseEnabled(x=False, y=False)
         
-        layout.addWidget(self.canvas)
+        # 初始化曲线
+        self.lines = []
+        for label, color in zip(self.y_labels, self.colors):
+            line = self.plot_widget.plot(pen=_curve_pen(color), name=label)
+            self.lines.append(line)
         
-        # 性能优化：初始化blit背景
-        self.canvas.draw()
-        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        layout.addWidget(self.plot_widget)
         
         # 设置背景色
         self.setStyleSheet("""
@@ -148,106 +121,131 @@ class RealtimePlotWidget(QWidget):
             }
         """)
     
+    def set_y_label(self, text):
+        """
+        设置Y轴标签
+        
+        Args:
+            text: 标签文本
+        """
+        self.plot_item.setLabel('left', text, **_AXIS_LABEL_STYLE)
+    
+    def add_reference_line(self, y, alpha=0.5):
+        """
+        添加水平参考线
+        
+        Args:
+            y: 参考线位置
+            alpha: 不透明度(0-1)
+        """
+        self.plot_item.addItem(pg.InfiniteLine(pos=y, angle=0, pen=_reference_pen(alpha)))
+    
     def add_data(self, values):
         """
         添加新数据点（优化版：控制更新频率）
         
         Args:
-            values: 数据值列表，长度应与y_labels相同
+            values: 数据值序列（列表或numpy数组视图），长度应与y_labels相同
         """
         if len(values) != len(self.y_labels):
             return
         
-        # 添加时间点
-        self.time_buffer.append(self.time_counter * 0.1)  # 假设100ms采样
-        self.time_counter += 1
+        # 双写：head和head+max_points
+        head = self.head
+        self.data_buffers[:, head] = values
+        self.data_buffers[:, head + self.max_points] = values
+        
+        self.head = (head + 1) % self.max_points
+        self.count = min(self.count + 1, self.max_points)
+        
+        self._schedule_update()
+    
+    def add_data_batch(self, values):
+        """
+        批量添加数据点（多个样本只触发一次重绘判断）
+        
+        Args:
+            values: 形状为(K, len(y_labels))的数组，每行一个样本
+        """
+        values = np.asarray(values, dtype=np.float32)
+        if values.ndim != 2 or values.shape[1] != len(self.y_labels) or len(values) == 0:
+            return
+        
+        # 超过容量时只保留最近max_points个样本
+        values = values[-self.max_points:]
+        
+        # 整块切片写入[head:head+K]（不超过2*max_points），再把越过max_points的部分
+        # 和未越过的部分分别复制到对应镜像位置，绕回只处理一次
+        count = len(values)
+        head = self.head
+        end = head + count
+        size = self.max_points
+        buffers = self.data_buffers
+        buffers[:, head:end] = values.T
+        split = min(end, size)
+        buffers[:, head + size:split + size] = buffers[:, head:split]
+        if end > size:
+            buffers[:, :end - size] = buffers[:, size:end]
         
-        # 添加数据
-        for i, value in enumerate(values):
-            self.data_buffers[i].append(value)
+        self.head = end % size
+        self.count = min(self.count + count, size)
+        
+        self._schedule_update()
+    
+    def _window(self):
+        """
+        最近count个样本的连续视图（无复制）
         
-        # 性能优化：控制更新频率，避免过于频繁的重绘
-        current_time = time.time()
-        if current_time - self.last_update_time >= self.min_update_interval:
+        Returns:
+            (time_array, data_arrays): 时间数组和(len(y_labels), count)数据数组
+        """
+        start = (self.head - self.count) % self.max_points
+        end = start + self.count
+        return self.time_axis[self.max_points - self.count:], self.data_buffers[:, start:end]
+    
+    def _schedule_update(self):
+        """标记有待更新（实际重绘由flush()完成）"""
+        self.pending_update = True
+    
+    def flush(self):
+        """有新数据且控件可见时重绘（由共享定时器周期调用；隐藏时只保留数据）"""
+        if self.pending_update and self.isVisible():
             self.update_plot()
-            self.last_update_time = current_time
-        else:
-            # 标记有待更新，但不立即执行
-            self.pending_update = True
+    
+    def force_redraw(self):
+        """立即重绘（重新显示时刷新隐藏期间过时的内容）"""
+        self.update_plot()
     
     def update_plot(self):
-        """更新图表显示（优化版：使用blit加速）"""
-        if len(self.time_buffer) == 0:
+        """更新图表显示（setData直接替换曲线数据，无需blit记录背景）"""
+        if self.count == 0:
             return
         
-        try:
-            # 更新每条曲线数据
-            time_array = np.array(self.time_buffer)
-            for i, line in enumerate(self.lines):
-                data_array = np.array(self.data_buffers[i])
-                line.set_data(time_array, data_array)
-            
-            # 自动调整坐标轴范围
-            x_min = max(0, time_array[-1] - 10)
-            x_max = time_array[-1] + 0.5
-            
-            # 只在范围变化时重新绘制背景
-            current_xlim = self.ax.get_xlim()
-            xlim_changed = abs(current_xlim[0] - x_min) > 0.1 or abs(current_xlim[1] - x_max) > 0.1
-            
-            if xlim_changed:
-                self.ax.set_xlim(x_min, x_max)
-            
-            if self.y_range is not None:
-                if self.ax.get_ylim() != self.y_range:
-                    self.ax.set_ylim(self.y_range[0], self.y_range[1])
-                    xlim_changed = True
-            else:
-                # 自动计算Y轴范围
-                all_data = []
-                for buffer in self.data_buffers:
-                    all_data.extend(buffer)
-                
-                if all_data:
-                    y_min = min(all_data)
-                    y_max = max(all_data)
-                    y_margin = (y_max - y_min) * 0.1 if y_max != y_min else 1.0
-                    new_ylim = (y_min - y_margin, y_max + y_margin)
-                    current_ylim = self.ax.get_ylim()
-                    if abs(current_ylim[0] - new_ylim[0]) > 0.1 or abs(current_ylim[1] - new_ylim[1]) > 0.1:
-                        self.ax.set_ylim(new_ylim[0], new_ylim[1])
-                        xlim_changed = True
-            
-            # 性能优化：使用blit只重绘变化的部分
-            if xlim_changed or self.background is None:
-                # 轴范围变化，需要完全重绘
-                self.canvas.draw()
-                self.background = self.canvas.copy_from_bbox(self.ax.bbox)
-            else:
-                # 使用blit快速更新
-                if self.background is not None:
-                    self.canvas.restore_region(self.background)
-                    for line in self.lines:
-                        self.ax.draw_artist(line)
-                    self.canvas.blit(self.ax.bbox)
-                else:
-                    self.canvas.draw_idle()
-                    
-            self.pending_update = False
-            
-        except Exception as e:
-            # 发生错误时回退到普通绘制
-            self.canvas.draw_idle()
-            self.background = None
+        # 更新每条曲线数据（直接传入环形缓冲区的连续视图）
+        time_array, data_arrays = self._window()
+        for line, data_array in zip(self.lines, data_arrays):
+            line.setData(time_array, data_array)
+        
+        # 未指定Y轴范围时按数据自动调整（numpy整体归约，范围变化明显时才设置）
+        if self.y_range is None:
+            y_min = float(data_arrays.min())
+            y_max = float(data_arrays.max())
+            y_margin = (y_max - y_min) * 0.1 if y_max != y_min else 1.0
+            new_ylim = (y_min - y_margin, y_max + y_margin)
+            if (self._ylim is None or abs(self._ylim[0] - new_ylim[0]) > 0.1
+                    or abs(self._ylim[1] - new_ylim[1]) > 0.1):
+                self.plot_item.setYRange(new_ylim[0], new_ylim[1], padding=0)
+                self._ylim = new_ylim
+        
+        self.pending_update = False
     
     def clear(self):
         """清空数据"""
-        self.time_buffer.clear()
-        for buffer in self.data_buffers:
-            buffer.clear()
-        self.time_counter = 0
-        self.background = None  # 重置背景
-        self.update_plot()
+        self.head = 0
+        self.count = 0
+        self._ylim = None
+        for line in self.lines:
+            line.setData([], [])
 
 
 class AccelerometerPlot(RealtimePlotWidget):
@@ -261,7 +259,7 @@ class AccelerometerPlot(RealtimePlotWidget):
             max_points=100,
             y_range=(-2, 2)  # ±2g
         )
-        self.ax.set_ylabel('加速度 (g)', color='#888', fontsize=8)
+        self.set_y_label('加速度 (g)')
 
 
 class GyroscopePlot(RealtimePlotWidget):
@@ -275,7 +273,7 @@ class GyroscopePlot(RealtimePlotWidget):
             max_points=100,
             y_range=(-200, 200)  # ±200°/s
         )
-        self.ax.set_ylabel('角速度 (°/s)', color='#888', fontsize=8)
+        self.set_y_label('角速度 (°/s)')
 
 
 class AttitudePlot(RealtimePlotWidget):
@@ -289,7 +287,7 @@ class AttitudePlot(RealtimePlotWidget):
             max_points=100,
             y_range=(-180, 180)  # ±180°
         )
-        self.ax.set_ylabel('角度 (°)', color='#888', fontsize=8)
+        self.set_y_label('角度 (°)')
 
 
 class EncoderAnglePlot(RealtimePlotWidget):
@@ -303,22 +301,21 @@ class EncoderAnglePlot(RealtimePlotWidget):
             max_points=150,
             y_range=(0, 360)  # 0-360°
         )
-        self.ax.set_ylabel('角度 (°)', color='#888', fontsize=8)
+        self.set_y_label('角度 (°)')
         
         # 添加水平参考线
-        self.ax.axhline(y=0, color='#444', linestyle='--', linewidth=0.5, alpha=0.5)
-        self.ax.axhline(y=90, color='#444', linestyle='--', linewidth=0.5, alpha=0.3)
-        self.ax.axhline(y=180, color='#444', linestyle='--', linewidth=0.5, alpha=0.5)
-        self.ax.axhline(y=270, color='#444', linestyle='--', linewidth=0.5, alpha=0.3)
-        self.ax.axhline(y=360, color='#444', linestyle='--', linewidth=0.5, alpha=0.5)
+        self.add_reference_line(0, alpha=0.5)
+        self.add_reference_line(90, alpha=0.3)
+        self.add_reference_line(180, alpha=0.5)
+        self.add_reference_line(270, alpha=0.3)
+        self.add_reference_line(360, alpha=0.5)
 
 
 # 测试代码
 if __name__ == '__main__':
     import sys
-    from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
+    from PyQt5.QtWidgets import QApplication, QMainWindow
     import random
-    from PyQt5.QtCore import QTimer
     
     app = QApplication(sys.argv)
     
@@ -352,11 +349,20 @@ if __name__ == '__main__':
         gyro_plot.add_data(gyro_data)
         attitude_plot.add_data(attitude_data)
     
+    def flush_plots():
+        for plot in (accel_plot, gyro_plot, attitude_plot):
+            plot.flush()
+    
     # 定时器更新
     timer = QTimer()
     timer.timeout.connect(update_data)
     timer.start(100)  # 100ms
     
+    # 共享重绘定时器（20fps）
+    plot_timer = QTimer()
+    plot_timer.timeout.connect(flush_plots)
+    plot_timer.start(50)
+    
     window.show()
     sys.exit(app.exec_())
 
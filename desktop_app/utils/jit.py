@@ -0,0 +1,26 @@
+"""
+可选JIT加速支持
+安装numba时使用njit编译数值内核，未安装时退化为普通Python函数
+
+用法：
+    from jit import njit
+
+    @njit(cache=True)
+    def kernel(...):
+        ...
+"""
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """numba不可用时的替代装饰器，同时支持 @njit 和 @njit(...) 两种写法"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
@@ -11,6 +11,705 @@
 import numpy as np
 import math
 
+from jit import njit, NUMBA_AVAILABLE
+from quaternion import quaternion_to_euler
+
+# 角度/弧度换算系数（乘法代替math.degrees/math.radians函数调用）
+_DEG2RAD = math.pi / 180.0
+_RAD2DEG = 180.0 / math.pi
+
+# 运动检测的加速度大小以整数毫g存储（自适应噪声只需约1%精度），
+# 滑动和/平方和为精确整数运算，不存在浮点舍入累积
+_ACCEL_HISTORY_SCALE = 1000.0
+
+
+# ============================================================================
+# EKF数值内核（可用numba时编译为本地代码）
+# 状态、协方差及临时矩阵均由调用方预先分配并原地修改，单步更新不产生内存分配。
+# 加速度计/磁力计的测量矩阵H只选取状态分量，增益与协方差更新按闭式展开，
+# 等价于 K = P·Hᵀ·(H·P·Hᵀ + R)⁻¹ 及Joseph形式的协方差更新，但无需通用矩阵求逆。
+# ============================================================================
+
+@njit(cache=True, fastmath=True)
+def _normalize_angle(angle):
+    """
+    将角度归一化到 [-pi, pi)
+    
+    用floor一次求出整圈数，无循环分支（numba不支持math.remainder/fmod）
+    """
+    return angle - math.tau * math.floor((angle + math.pi) / math.tau)
+
+
+@njit(cache=True, fastmath=True)
+def _state_jacobian(gx, gy, gz, dt, sin_roll, cos_roll, sin_pitch,
+                    tan_pitch, inv_cos_pitch, F):
+    """
+    计算状态转移雅可比矩阵F（原地写入）
+    
+    三角函数值由预测步骤传入，不再重复计算
+    
+    Args:
+        gx, gy, gz: 去零偏后的角速度（弧度/秒）
+        dt: 时间间隔（秒）
+        sin_roll, cos_roll, sin_pitch, tan_pitch: 当前姿态的三角函数值
+        inv_cos_pitch: 1/cos(pitch)（已做防除零限幅）
+        F: 6x6输出矩阵（单位阵初始化，结构固定的元素不再重复写入）
+    """
+    inv_cos_pitch2 = inv_cos_pitch * inv_cos_pitch
+    
+    # 所有非零项都含dt因子：先把dt并入角速度和姿态三角函数，
+    # 再提取公共子表达式，每步只做一次乘dt
+    gy_dt = gy * dt
+    gz_dt = gz * dt
+    sin_roll_dt = sin_roll * dt
+    cos_roll_dt = cos_roll * dt
+    a = sin_roll * gy_dt + cos_roll * gz_dt
+    b = cos_roll * gy_dt - sin_roll * gz_dt
+    
+    # 只写入随姿态变化的元素，其余元素保持单位阵（F须以单位阵初始化）
+    # droll/droll, droll/dpitch
+    F[0, 0] = 1.0 + tan_pitch * b
+    F[0, 1] = inv_cos_pitch2 * a
+    
+    # dpitch/droll
+    F[1, 0] = -a
+    
+    # dyaw/droll, dyaw/dpitch
+    F[2, 0] = inv_cos_pitch * b
+    F[2, 1] = sin_pitch * inv_cos_pitch2 * a
+    
+    # 零偏影响
+    F[0, 3] = -dt
+    F[0, 4] = -sin_roll_dt * tan_pitch
+    F[0, 5] = -cos_roll_dt * tan_pitch
+    
+    F[1, 4] = -cos_roll_dt
+    F[1, 5] = sin_roll_dt
+    
+    F[2, 4] = -sin_roll_dt * inv_cos_pitch
+    F[2, 5] = -cos_roll_dt * inv_cos_pitch
+
+
+@njit(cache=True, fastmath=True)
+def _ekf_predict(state, P, Q, F, work, gyro_x, gyro_y, gyro_z, dt):
+    """
+    预测步骤内核：陀螺仪积分 + 协方差传播 P = F·P·Fᵀ + Q
+    
+    Args:
+        state, P, Q: 状态向量(6)、协方差(6x6)、过程噪声(6x6)
+        F, work: 6x6临时矩阵
+        gyro_x, gyro_y, gyro_z: 陀螺仪角速度（度/秒）
+        dt: 时间间隔（秒）
+    """
+    # 去除零偏（转换为弧度/秒）
+    gx = gyro_x * _DEG2RAD - state[3]
+    gy = gyro_y * _DEG2RAD - state[4]
+    gz = gyro_z * _DEG2RAD - state[5]
+    
+    # 欧拉角微分方程
+    sin_roll = math.sin(state[0])
+    cos_roll = math.cos(state[0])
+    sin_pitch = math.sin(state[1])
+    cos_pitch = math.cos(state[1])
+    tan_pitch = math.tan(state[1])
+    
+    # 防止除零
+    if abs(cos_pitch) < 0.01:
+        cos_pitch = 0.01 if cos_pitch >= 0 else -0.01
+    inv_cos_pitch = 1.0 / cos_pitch
+    
+    droll = gx + sin_roll * tan_pitch * gy + cos_roll * tan_pitch * gz
+    dpitch = cos_roll * gy - sin_roll * gz
+    dyaw = inv_cos_pitch * (sin_roll * gy + cos_roll * gz)
+    
+    # 雅可比矩阵在积分前的姿态处计算（标准EKF做法），复用上面的三角函数值
+    _state_jacobian(gx, gy, gz, dt, sin_roll, cos_roll, sin_pitch,
+                    tan_pitch, inv_cos_pitch, F)
+    
+    # 更新状态（欧拉积分），零偏保持不变
+    state[0] = _normalize_angle(state[0] + droll * dt)
+    state[1] = _normalize_angle(state[1] + dpitch * dt)
+    state[2] = _normalize_angle(state[2] + dyaw * dt)
+    
+    # F只有前3行（姿态行）不同于单位阵
+    _propagate_covariance(P, Q, F, work, 3)
+
+
+@njit(cache=True, fastmath=True)
+def _propagate_covariance(P, Q, F, work, rows):
+    """
+    协方差传播 P = F·P·Fᵀ + Q（原地）
+    
+    F中只有前rows行（姿态行）不同于单位阵，零偏行为单位行，
+    利用该结构约减半乘加次数。
+    
+    Args:
+        P, Q, F: n×n协方差、过程噪声、状态转移雅可比
+        work: n×n临时矩阵
+        rows: F中非单位行的数量
+    """
+    n = P.shape[0]
+    # work = F·P：单位行对应的行就是P本身
+    for i in range(rows):
+        for j in range(n):
+            acc = 0.0
+            for k in range(n):
+                acc += F[i, k] * P[k, j]
+            work[i, j] = acc
+    for i in range(rows, n):
+        for j in range(n):
+            work[i, j] = P[i, j]
+    # P = work·Fᵀ + Q：Fᵀ中单位行对应的列是单位列，只有前rows列需要求和
+    for i in range(n):
+        for j in range(rows):
+            acc = Q[i, j]
+            for k in range(n):
+                acc += work[i, k] * F[j, k]
+            P[i, j] = acc
+        for j in range(rows, n):
+            P[i, j] = work[i, j] + Q[i, j]
+
+
+@njit(cache=True, fastmath=True)
+def _symmetrize(P):
+    """将协方差矩阵原地对称化，消除舍入造成的不对称"""
+    n = P.shape[0]
+    for i in range(n):
+        for j in range(i + 1, n):
+            avg = 0.5 * (P[i, j] + P[j, i])
+            P[i, j] = avg
+            P[j, i] = avg
+
+
+@njit(cache=True, fastmath=True)
+def _accel_trust(norm):
+    """
+    根据加速度模长计算加速度计信任度
+    
+    当加速度接近1g时更可信（静止或匀速运动）。模长误差≤0.25g时完全信任，
+    0.25~0.6g之间线性下降，超过0.6g时取下限0.3；用min/max代替分支，
+    对振动引起的随机误差没有分支预测失败。
+    
+    Args:
+        norm: 加速度模长（g）
+    """
+    return max(0.3, min(1.0, 1.5 - 2.0 * abs(norm - 1.0)))
+
+
+@njit(cache=True, fastmath=True)
+def _ekf_update_accel(state, P, work, r_accel, accel_x, accel_y, accel_z, trust):
+    """
+    加速度计更新内核：校正Roll和Pitch
+    
+    Args:
+        state, P: 状态向量(6)、协方差(6x6)
+        work: 6x6临时矩阵
+        r_accel: 加速度计测量噪声方差
+        accel_x, accel_y, accel_z: 加速度（g）
+        trust: 当前加速度计信任度
+        
+    Returns:
+        更新后的加速度计信任度
+    """
+    # 归一化加速度
+    norm = math.sqrt(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)
+    if norm < 0.1:  # 加速度太小，不可信
+        return trust
+    
+    ax = accel_x / norm
+    ay = accel_y / norm
+    az = accel_z / norm
+    
+    trust = _accel_trust(norm)
+    
+    # 测量残差（加速度计不能测量Yaw，H只选取roll和pitch）
+    y0 = _normalize_angle(math.atan2(ay, az) - state[0])
+    y1 = _normalize_angle(math.atan2(-ax, math.sqrt(ay * ay + az * az)) - state[1])
+    
+    # 新息协方差 S = H·P·Hᵀ + R（2x2）及其逆
+    r = r_accel / max(0.1, trust)
+    s00 = P[0, 0] + r
+    s01 = P[0, 1]
+    s10 = P[1, 0]
+    s11 = P[1, 1] + r
+    inv_det = 1.0 / (s00 * s11 - s01 * s10)
+    i00 = s11 * inv_det
+    i01 = -s01 * inv_det
+    i10 = -s10 * inv_det
+    i11 = s00 * inv_det
+    
+    # 卡尔曼增益 K = P·Hᵀ·S⁻¹ 存入work第0、1列；H·P（P的第0、1行）存入第2、3列
+    for i in range(6):
+        work[i, 0] = P[i, 0] * i00 + P[i, 1] * i10
+        work[i, 1] = P[i, 0] * i01 + P[i, 1] * i11
+        work[i, 2] = P[0, i]
+        work[i, 3] = P[1, i]
+    
+    # 更新状态
+    for i in range(6):
+        state[i] += work[i, 0] * y0 + work[i, 1] * y1
+    state[0] = _normalize_angle(state[0])
+    state[1] = _normalize_angle(state[1])
+    state[2] = _normalize_angle(state[2])
+    
+    # Joseph形式 P = (I − K·H)·P·(I − K·H)ᵀ + K·R·Kᵀ，有限精度下保持对称正定
+    # 先 M = (I − K·H)·P = P − K·(H·P)
+    for i in range(6):
+        for j in range(6):
+            P[i, j] -= work[i, 0] * work[j, 2] + work[i, 1] * work[j, 3]
+    # 再 P = M·(I − K·H)ᵀ + r·K·Kᵀ（I − K·H只有第0、1列不同于单位阵，M的这两列暂存到work第4、5列）
+    for i in range(6):
+        work[i, 4] = P[i, 0]
+        work[i, 5] = P[i, 1]
+    for i in range(6):
+        for j in range(6):
+            P[i, j] += ((r * work[i, 0] - work[i, 4]) * work[j, 0] +
+                        (r * work[i, 1] - work[i, 5]) * work[j, 1])
+    _symmetrize(P)
+    
+    return trust
+
+
+@njit(cache=True, fastmath=True)
+def _ekf_update_mag(state, P, work, r_mag, mag_angle, trust):
+    """
+    磁力计更新内核：校正Yaw（标量测量）
+    
+    Args:
+        state, P: 状态向量(6)、协方差(6x6)
+        work: 6x6临时矩阵
+        r_mag: 磁力计测量噪声方差
+        mag_angle: 磁力计角度（度，0-360）
+        trust: 磁力计信任度
+    """
+    y = _normalize_angle(_normalize_angle(mag_angle * _DEG2RAD) - state[2])
+    
+    # S = P[2,2] + R，K = P[:,2] / S
+    r = r_mag / max(0.1, trust)
+    inv_s = 1.0 / (P[2, 2] + r)
+    for i in range(6):
+        work[i, 0] = P[i, 2] * inv_s
+        work[i, 1] = P[2, i]
+    
+    for i in range(6):
+        state[i] += work[i, 0] * y
+    state[0] = _normalize_angle(state[0])
+    state[1] = _normalize_angle(state[1])
+    state[2] = _normalize_angle(state[2])
+    
+    # Joseph形式：M = P − K·(H·P)，再 P = M·(I − K·H)ᵀ + r·K·Kᵀ
+    for i in range(6):
+        for j in range(6):
+            P[i, j] -= work[i, 0] * work[j, 1]
+    for i in range(6):
+        work[i, 2] = P[i, 2]
+    for i in range(6):
+        for j in range(6):
+            P[i, j] += (r * work[i, 0] - work[i, 2]) * work[j, 0]
+    _symmetrize(P)
+
+
+@njit(cache=True, fastmath=True)
+def _ekf_step(state, P, Q, F, work, r_accel, r_mag,
+              accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+              mag_angle, mag_valid, dt, accel_trust, mag_trust):
+    """
+    完整的单步EKF更新（预测 + 加速度计 + 可选磁力计），一次调用完成
+    
+    Returns:
+        更新后的加速度计信任度
+    """
+    _ekf_predict(state, P, Q, F, work, gyro_x, gyro_y, gyro_z, dt)
+    accel_trust = _ekf_update_accel(state, P, work, r_accel,
+                                    accel_x, accel_y, accel_z, accel_trust)
+    if mag_valid:
+        _ekf_update_mag(state, P, work, r_mag, mag_angle, mag_trust)
+    return accel_trust
+
+
+@njit(cache=True, fastmath=True)
+def _ekf_run_batch(state, P, Q, F, work, r_accel, r_mag,
+                   accels, gyros, mags, valids, dts, noise_levels,
+                   accel_trust, mag_trust):
+    """
+    批量EKF内核：整批样本在一次编译调用内顺序完成
+    
+    Args:
+        accels, gyros: (K, 3)加速度（g）与角速度（度/秒）
+        mags, valids: (K,)磁力计角度（度）及其有效标志
+        dts: (K,)每个样本的时间间隔（秒）
+        noise_levels: (K,)每个样本之后的过程噪声级别，<=0表示保持不变
+        
+    Returns:
+        更新后的加速度计信任度
+    """
+    for k in range(accels.shape[0]):
+        accel_trust = _ekf_step(state, P, Q, F, work, r_accel, r_mag,
+                                accels[k, 0], accels[k, 1], accels[k, 2],
+                                gyros[k, 0], gyros[k, 1], gyros[k, 2],
+                                mags[k], valids[k], dts[k],
+                                accel_trust, mag_trust)
+        level = noise_levels[k]
+        if level > 0.0:
+            for i in range(3):
+                Q[i, i] = level
+                Q[i + 3, i + 3] = level * 0.001
+    return accel_trust
+
+
+@njit(cache=True, fastmath=True)
+def _state_quaternion(state):
+    """
+    由状态向量中的姿态角（弧度）直接计算四元数，省去度/弧度往返转换
+    
+    Returns:
+        (w, x, y, z): 四元数
+    """
+    cr = math.cos(state[0] * 0.5)
+    sr = math.sin(state[0] * 0.5)
+    cp = math.cos(state[1] * 0.5)
+    sp = math.sin(state[1] * 0.5)
+    cy = math.cos(state[2] * 0.5)
+    sy = math.sin(state[2] * 0.5)
+    
+    return (cr * cp * cy + sr * sp * sy,
+            sr * cp * cy - cr * sp * sy,
+            cr * sp * cy + sr * cp * sy,
+            cr * cp * sy - sr * sp * cy)
+
+
+# ============================================================================
+# 四元数状态EKF内核
+# 状态向量 [qw, qx, qy, qz, bias_x, bias_y, bias_z]。预测方程与加速度计观测
+# 都是四元数的多项式，不含tan(pitch)、1/cos(pitch)，俯仰角接近±90°时无奇异点。
+# ============================================================================
+
+@njit(cache=True, fastmath=True)
+def _qekf_normalize(state):
+    """将状态向量中的四元数部分原地归一化"""
+    norm = math.sqrt(state[0] * state[0] + state[1] * state[1] +
+                     state[2] * state[2] + state[3] * state[3])
+    if norm > 0.0:
+        inv_norm = 1.0 / norm
+        for i in range(4):
+            state[i] *= inv_norm
+
+
+@njit(cache=True, fastmath=True)
+def _qekf_predict(state, P, Q, F, work, gyro_x, gyro_y, gyro_z, dt):
+    """
+    四元数预测内核：q ← q + ½·dt·q⊗(0, ω) + 协方差传播
+    
+    Args:
+        state, P, Q: 状态向量(7)、协方差(7x7)、过程噪声(7x7)
+        F, work: 7x7临时矩阵（F以单位阵初始化）
+        gyro_x, gyro_y, gyro_z: 陀螺仪角速度（度/秒）
+        dt: 时间间隔（秒）
+    """
+    # 去除零偏（转换为弧度/秒），并入½·dt
+    half_dt = 0.5 * dt
+    hx = (gyro_x * _DEG2RAD - state[4]) * half_dt
+    hy = (gyro_y * _DEG2RAD - state[5]) * half_dt
+    hz = (gyro_z * _DEG2RAD - state[6]) * half_dt
+    qw = state[0]
+    qx = state[1]
+    qy = state[2]
+    qz = state[3]
+    
+    # 雅可比：∂q/∂q = I + ½·dt·Ω(ω)
+    F[0, 1] = -hx
+    F[0, 2] = -hy
+    F[0, 3] = -hz
+    F[1, 0] = hx
+    F[1, 2] = hz
+    F[1, 3] = -hy
+    F[2, 0] = hy
+    F[2, 1] = -hz
+    F[2, 3] = hx
+    F[3, 0] = hz
+    F[3, 1] = hy
+    F[3, 2] = -hx
+    
+    # ∂q/∂bias = −½·dt·Ξ(q)
+    F[0, 4] = half_dt * qx
+    F[0, 5] = half_dt * qy
+    F[0, 6] = half_dt * qz
+    F[1, 4] = -half_dt * qw
+    F[1, 5] = half_dt * qz
+    F[1, 6] = -half_dt * qy
+    F[2, 4] = -half_dt * qz
+    F[2, 5] = -half_dt * qw
+    F[2, 6] = half_dt * qx
+    F[3, 4] = half_dt * qy
+    F[3, 5] = -half_dt * qx
+    F[3, 6] = -half_dt * qw
+    
+    # 四元数积分（只有乘加），零偏保持不变
+    state[0] = qw - hx * qx - hy * qy - hz * qz
+    state[1] = qx + hx * qw + hz * qy - hy * qz
+    state[2] = qy + hy * qw - hz * qx + hx * qz
+    state[3] = qz + hz * qw + hy * qx - hx * qy
+    _qekf_normalize(state)
+    
+    # F只有前4行（四元数行）不同于单位阵
+    _propagate_covariance(P, Q, F, work, 4)
+
+
+@njit(cache=True, fastmath=True)
+def _qekf_gain_and_correct(state, P, work, aux, r, rows, y0, y1, y2):
+    """
+    计算卡尔曼增益并完成状态与协方差校正（测量维数1~3）
+    
+    Args:
+        state, P: 状态向量(7)、协方差(7x7)
+        work: 7x7临时矩阵
+        aux: 临时矩阵，aux[0:rows, 0:4]为观测雅可比H（仅四元数列非零）
+        r: 测量噪声方差（各分量相同，R = r·I）
+        rows: 测量维数
+        y0, y1, y2: 测量残差（多余分量忽略）
+    """
+    n = P.shape[0]
+    
+    # P·Hᵀ 存入work[:, 0:rows]
+    for i in range(n):
+        for m in range(rows):
+            acc = 0.0
+            for k in range(4):
+                acc += P[i, k] * aux[m, k]
+            work[i, m] = acc
+    
+    # S = H·P·Hᵀ + R，闭式求逆后存入aux[3:6, 0:3]
+    for m in range(rows):
+        for l in range(rows):
+            acc = r if m == l else 0.0
+            for k in range(4):
+                acc += aux[m, k] * work[k, l]
+            aux[3 + m, 4 + l] = acc
+    if rows == 1:
+        aux[3, 0] = 1.0 / aux[3, 4]
+    else:
+        s00 = aux[3, 4]
+        s01 = aux[3, 5]
+        s02 = aux[3, 6]
+        s10 = aux[4, 4]
+        s11 = aux[4, 5]
+        s12 = aux[4, 6]
+        s20 = aux[5, 4]
+        s21 = aux[5, 5]
+        s22 = aux[5, 6]
+        c00 = s11 * s22 - s12 * s21
+        c01 = s02 * s21 - s01 * s22
+        c02 = s01 * s12 - s02 * s11
+        inv_det = 1.0 / (s00 * c00 + s10 * c01 + s20 * c02)
+        aux[3, 0] = c00 * inv_det
+        aux[3, 1] = c01 * inv_det
+        aux[3, 2] = c02 * inv_det
+        aux[4, 0] = (s12 * s20 - s10 * s22) * inv_det
+        aux[4, 1] = (s00 * s22 - s02 * s20) * inv_det
+        aux[4, 2] = (s02 * s10 - s00 * s12) * inv_det
+        aux[5, 0] = (s10 * s21 - s11 * s20) * inv_det
+        aux[5, 1] = (s01 * s20 - s00 * s21) * inv_det
+        aux[5, 2] = (s00 * s11 - s01 * s10) * inv_det
+    
+    # K = P·Hᵀ·S⁻¹ 存入work[:, 3:3+rows]，同时更新状态
+    for i in range(n):
+        dx = 0.0
+        for l in range(rows):
+            acc = 0.0
+            for m in range(rows):
+                acc += work[i, m] * aux[3 + m, l]
+            work[i, 3 + l] = acc
+            if l == 0:
+                dx += acc * y0
+            elif l == 1:
+                dx += acc * y1
+            else:
+                dx += acc * y2
+        state[i] += dx
+    _qekf_normalize(state)
+    
+    # Joseph形式：M = P − K·(P·Hᵀ)ᵀ
+    for i in range(n):
+        for j in range(n):
+            acc = 0.0
+            for m in range(rows):
+                acc += work[i, 3 + m] * work[j, m]
+            P[i, j] -= acc
+    # M·Hᵀ 覆盖work[:, 0:rows]（P·Hᵀ已不再需要）
+    for i in range(n):
+        for m in range(rows):
+            acc = 0.0
+            for k in range(4):
+                acc += P[i, k] * aux[m, k]
+            work[i, m] = acc
+    # P = M·(I − K·H)ᵀ + r·K·Kᵀ = M + (r·K − M·Hᵀ)·Kᵀ
+    for i in range(n):
+        for j in range(n):
+            acc = 0.0
+            for m in range(rows):
+                acc += (r * work[i, 3 + m] - work[i, m]) * work[j, 3 + m]
+            P[i, j] += acc
+    _symmetrize(P)
+
+
+@njit(cache=True, fastmath=True)
+def _qekf_update_accel(state, P, work, aux, r_accel, accel_x, accel_y, accel_z, trust):
+    """
+    加速度计更新内核：观测重力方向 h(q) = R(q)ᵀ·[0, 0, 1]（q的二次多项式）
+    
+    Args:
+        state, P: 状态向量(7)、协方差(7x7)
+        work, aux: 7x7临时矩阵
+        r_accel: 加速度计测量噪声方差
+        accel_x, accel_y, accel_z: 加速度（g）
+        trust: 当前加速度计信任度
+        
+    Returns:
+        更新后的加速度计信任度
+    """
+    norm = math.sqrt(accel_x * accel_x + accel_y * accel_y + accel_z * accel_z)
+    if norm < 0.1:  # 加速度太小，不可信
+        return trust
+    trust = _accel_trust(norm)
+    inv_norm = 1.0 / norm
+    
+    qw = state[0]
+    qx = state[1]
+    qy = state[2]
+    qz = state[3]
+    
+    # 测量残差
+    y0 = accel_x * inv_norm - 2.0 * (qx * qz - qw * qy)
+    y1 = accel_y * inv_norm - 2.0 * (qw * qx + qy * qz)
+    y2 = accel_z * inv_norm - (qw * qw - qx * qx - qy * qy + qz * qz)
+    
+    # 观测雅可比H（3x4，零偏列为零）存入aux[0:3, 0:4]
+    aux[0, 0] = -2.0 * qy
+    aux[0, 1] = 2.0 * qz
+    aux[0, 2] = -2.0 * qw
+    aux[0, 3] = 2.0 * qx
+    aux[1, 0] = 2.0 * qx
+    aux[1, 1] = 2.0 * qw
+    aux[1, 2] = 2.0 * qz
+    aux[1, 3] = 2.0 * qy
+    aux[2, 0] = 2.0 * qw
+    aux[2, 1] = -2.0 * qx
+    aux[2, 2] = -2.0 * qy
+    aux[2, 3] = 2.0 * qz
+    
+    _qekf_gain_and_correct(state, P, work, aux, r_accel / max(0.1, trust), 3, y0, y1, y2)
+    return trust
+
+
+@njit(cache=True, fastmath=True)
+def _qekf_update_mag(state, P, work, aux, r_mag, mag_angle, trust):
+    """
+    磁力计更新内核：观测由四元数计算的Yaw角（标量测量）
+    
+    Args:
+        state, P: 状态向量(7)、协方差(7x7)
+        work, aux: 7x7临时矩阵
+        r_mag: 磁力计测量噪声方差
+        mag_angle: 磁力计角度（度，0-360）
+        trust: 磁力计信任度
+    """
+    qw = state[0]
+    qx = state[1]
+    qy = state[2]
+    qz = state[3]
+    
+    # yaw = atan2(num, den)
+    num = 2.0 * (qw * qz + qx * qy)
+    den = 1.0 - 2.0 * (qy * qy + qz * qz)
+    mag2 = num * num + den * den
+    if mag2 < 1e-6:  # 俯仰角±90°时Yaw不可观测
+        return
+    inv_mag2 = 1.0 / mag2
+    
+    y = _normalize_angle(_normalize_angle(mag_angle * _DEG2RAD) - math.atan2(num, den))
+    
+    # ∂yaw/∂q = (den·∂num − num·∂den) / (num² + den²)
+    aux[0, 0] = 2.0 * qz * den * inv_mag2
+    aux[0, 1] = 2.0 * qy * den * inv_mag2
+    aux[0, 2] = (2.0 * qx * den + 4.0 * qy * num) * inv_mag2
+    aux[0, 3] = (2.0 * qw * den + 4.0 * qz * num) * inv_mag2
+    
+    _qekf_gain_and_correct(state, P, work, aux, r_mag / max(0.1, trust), 1, y, 0.0, 0.0)
+
+
+@njit(cache=True, fastmath=True)
+def _qekf_step(state, P, Q, F, work, aux, r_accel, r_mag,
+               accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+               mag_angle, mag_valid, dt, accel_trust, mag_trust):
+    """
+    四元数EKF单步更新（预测 + 加速度计 + 可选磁力计）
+    
+    Returns:
+        更新后的加速度计信任度
+    """
+    _qekf_predict(state, P, Q, F, work, gyro_x, gyro_y, gyro_z, dt)
+    accel_trust = _qekf_update_accel(state, P, work, aux, r_accel,
+                                     accel_x, accel_y, accel_z, accel_trust)
+    if mag_valid:
+        _qekf_update_mag(state, P, work, aux, r_mag, mag_angle, mag_trust)
+    return accel_trust
+
+
+@njit(cache=True, fastmath=True)
+def _qekf_run_batch(state, P, Q, F, work, aux, r_accel, r_mag,
+                    accels, gyros, mags, valids, dts, noise_levels,
+                    accel_trust, mag_trust):
+    """
+    四元数EKF批量内核（参数含义同_ekf_run_batch）
+    
+    Returns:
+        更新后的加速度计信任度
+    """
+    for k in range(accels.shape[0]):
+        accel_trust = _qekf_step(state, P, Q, F, work, aux, r_accel, r_mag,
+                                 accels[k, 0], accels[k, 1], accels[k, 2],
+                                 gyros[k, 0], gyros[k, 1], gyros[k, 2],
+                                 mags[k], valids[k], dts[k],
+                                 accel_trust, mag_trust)
+        level = noise_levels[k]
+        if level > 0.0:
+            for i in range(4):
+                Q[i, i] = level * 0.25
+            for i in range(4, 7):
+                Q[i, i] = level * 0.001
+    return accel_trust
+
+
+@njit(cache=True, fastmath=True)
+def _quad_form4(P, c0, c1, c2, c3):
+    """返回 cᵀ·P[0:4, 0:4]·c"""
+    return (c0 * (c0 * P[0, 0] + c1 * P[0, 1] + c2 * P[0, 2] + c3 * P[0, 3]) +
+            c1 * (c0 * P[1, 0] + c1 * P[1, 1] + c2 * P[1, 2] + c3 * P[1, 3]) +
+            c2 * (c0 * P[2, 0] + c1 * P[2, 1] + c2 * P[2, 2] + c3 * P[2, 3]) +
+            c3 * (c0 * P[3, 0] + c1 * P[3, 1] + c2 * P[3, 2] + c3 * P[3, 3]))
+
+
+@njit(cache=True, fastmath=True)
+def _qekf_attitude_std(state, P):
+    """
+    由四元数协方差估计绕三个机体轴的姿态角标准差（小角度近似 δθ = 2·Ξ(q)ᵀ·δq）
+    
+    Returns:
+        (std_x, std_y, std_z): 标准差（弧度）
+    """
+    qw = state[0]
+    qx = state[1]
+    qy = state[2]
+    qz = state[3]
+    
+    # Ξ(q)的三列
+    var_x = _quad_form4(P, -qx, qw, qz, -qy)
+    var_y = _quad_form4(P, -qy, -qz, qw, qx)
+    var_z = _quad_form4(P, -qz, qy, -qx, qw)
+    return (2.0 * math.sqrt(max(var_x, 0.0)),
+            2.0 * math.sqrt(max(var_y, 0.0)),
+            2.0 * math.sqrt(max(var_z, 0.0)))
+
 
 class ExtendedKalmanFilter:
     """
@@ -21,7 +720,8 @@ class ExtendedKalmanFilter:
     - gyro_bias_*: 陀螺仪零偏（弧度/秒）
     """
     
-    def __init__(self, process_noise=0.01, accel_noise=0.1, gyro_noise=0.01, mag_noise=0.05):
+    def __init__(self, process_noise=0.01, accel_noise=0.1, gyro_noise=0.01, mag_noise=0.05,
+                 dtype=np.float64):
         """
         初始化EKF滤波器
         
@@ -30,21 +730,27 @@ class ExtendedKalmanFilter:
             accel_noise: 加速度计测量噪声标准差
             gyro_noise: 陀螺仪测量噪声标准差
             mag_noise: 磁力计（角度传感器）测量噪声标准差
+            dtype: 状态与协方差的数据类型，嵌入式/低带宽场景可用np.float32
+                   （传感器只有16位精度，float32足够；内核内部标量运算仍为双精度）
         """
+        self.dtype = np.dtype(dtype)
+        
         # 状态向量 [roll, pitch, yaw, bias_x, bias_y, bias_z]
-        self.state = np.zeros(6, dtype=np.float64)
+        self.state = np.zeros(6, dtype=self.dtype)
         
         # 状态协方差矩阵
-        self.P = np.eye(6, dtype=np.float64) * 1.0
+        self.P = np.eye(6, dtype=self.dtype) * 1.0
         
         # 过程噪声协方差
-        self.Q = np.eye(6, dtype=np.float64)
+        self.Q = np.eye(6, dtype=self.dtype)
         self.Q[0:3, 0:3] *= process_noise  # 姿态角过程噪声
         self.Q[3:6, 3:6] *= process_noise * 0.001  # 零偏变化很慢
+        # Q始终为对角阵，保存对角线的可写视图供原地调整
+        self._Q_diag = np.einsum('ii->i', self.Q)
         
         # 测量噪声协方差
-        self.R_accel = np.eye(3, dtype=np.float64) * (accel_noise ** 2)
-        self.R_mag = np.eye(1, dtype=np.float64) * (mag_noise ** 2)
+        self.R_accel = np.eye(3, dtype=self.dtype) * (accel_noise ** 2)
+        self.R_mag = np.eye(1, dtype=self.dtype) * (mag_noise ** 2)
         
         # 陀螺仪噪声
         self.gyro_noise = gyro_noise
@@ -53,9 +759,23 @@ class ExtendedKalmanFilter:
         self.accel_trust_factor = 1.0  # 加速度计信任度 (0-1)
         self.mag_trust_factor = 1.0    # 磁力计信任度 (0-1)
         
+        # 内核使用的预分配临时矩阵
+        self._F = np.eye(6, dtype=self.dtype)
+        self._work = np.zeros((6, 6), dtype=self.dtype)
+        
         # 统计信息
         self.update_count = 0
         
+        # 预热JIT内核（首次调用触发编译或加载缓存），避免第一个样本卡顿
+        if NUMBA_AVAILABLE:
+            _ekf_step(self.state.copy(), self.P.copy(), self.Q, self._F, self._work,
+                      1.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0,
+                      0.0, True, 0.1, 1.0, 1.0)
+            empty = np.zeros(0, dtype=np.float64)
+            _ekf_run_batch(self.state.copy(), self.P.copy(), self.Q.copy(), self._F, self._work,
+                           1.0, 1.0, np.zeros((0, 3)), np.zeros((0, 3)), empty,
+                           np.zeros(0, dtype=np.bool_), empty, empty, 1.0, 1.0)
+        
     def predict(self, gyro_x, gyro_y, gyro_z, dt):
         """
         预测步骤：使用陀螺仪数据预测下一时刻的姿态
@@ -64,58 +784,8 @@ class ExtendedKalmanFilter:
             gyro_x, gyro_y, gyro_z: 陀螺仪角速度（度/秒）
             dt: 时间间隔（秒）
         """
-        # 转换为弧度/秒
-        gx = math.radians(gyro_x)
-        gy = math.radians(gyro_y)
-        gz = math.radians(gyro_z)
-        
-        # 提取当前状态
-        roll = self.state[0]
-        pitch = self.state[1]
-        yaw = self.state[2]
-        bias_x = self.state[3]
-        bias_y = self.state[4]
-        bias_z = self.state[5]
-        
-        # 去除零偏
-        gx_corrected = gx - bias_x
-        gy_corrected = gy - bias_y
-        gz_corrected = gz - bias_z
-        
-        # 欧拉角微分方程（考虑万向节锁的影响）
-        # droll/dt, dpitch/dt, dyaw/dt
-        sin_roll = math.sin(roll)
-        cos_roll = math.cos(roll)
-        sin_pitch = math.sin(pitch)
-        cos_pitch = math.cos(pitch)
-        tan_pitch = math.tan(pitch)
-        
-        # 防止除零
-        if abs(cos_pitch) < 0.01:
-            cos_pitch = 0.01 if cos_pitch >= 0 else -0.01
-        
-        # 姿态角更新
-        droll = gx_corrected + sin_roll * tan_pitch * gy_corrected + cos_roll * tan_pitch * gz_corrected
-        dpitch = cos_roll * gy_corrected - sin_roll * gz_corrected
-        dyaw = (sin_roll / cos_pitch) * gy_corrected + (cos_roll / cos_pitch) * gz_corrected
-        
-        # 更新状态（欧拉积分）
-        self.state[0] += droll * dt
-        self.state[1] += dpitch * dt
-        self.state[2] += dyaw * dt
-        # 零偏保持不变（在预测阶段）
-        
-        # 归一化角度到 [-pi, pi]
-        self.state[0] = self._normalize_angle(self.state[0])
-        self.state[1] = self._normalize_angle(self.state[1])
-        self.state[2] = self._normalize_angle(self.state[2])
-        
-        # 计算状态转移雅可比矩阵 F
-        F = self._compute_state_jacobian(gx_corrected, gy_corrected, gz_corrected, dt)
-        
-        # 更新协方差矩阵
-        # P = F * P * F^T + Q
-        self.P = F @ self.P @ F.T + self.Q
+        _ekf_predict(self.state, self.P, self.Q, self._F, self._work,
+                     gyro_x, gyro_y, gyro_z, dt)
         
     def update_accel(self, accel_x, accel_y, accel_z):
         """
@@ -124,68 +794,9 @@ class ExtendedKalmanFilter:
         Args:
             accel_x, accel_y, accel_z: 加速度计读数（g）
         """
-        # 归一化加速度
-        norm = math.sqrt(accel_x**2 + accel_y**2 + accel_z**2)
-        if norm < 0.1:  # 加速度太小，不可信
-            return
-        
-        ax = accel_x / norm
-        ay = accel_y / norm
-        az = accel_z / norm
-        
-        # 动态调整加速度计信任度（根据加速度大小）
-        # 当加速度接近1g时，更可信（静止或匀速运动）
-        accel_magnitude_error = abs(norm - 1.0)
-        if accel_magnitude_error > 0.5:  # 加速度变化大，不太可信
-            self.accel_trust_factor = 0.3
-        elif accel_magnitude_error > 0.2:
-            self.accel_trust_factor = 0.7
-        else:
-            self.accel_trust_factor = 1.0
-        
-        # 从加速度计计算Roll和Pitch
-        # Roll: atan2(ay, az)
-        # Pitch: atan2(-ax, sqrt(ay^2 + az^2))
-        measured_roll = math.atan2(ay, az)
-        measured_pitch = math.atan2(-ax, math.sqrt(ay**2 + az**2))
-        
-        # 测量向量 z = [measured_roll, measured_pitch]
-        # 注意：加速度计不能测量Yaw
-        z = np.array([measured_roll, measured_pitch, 0.0], dtype=np.float64)
-        
-        # 预测的测量 h(x) = [roll, pitch, 0]
-        h = np.array([self.state[0], self.state[1], 0.0], dtype=np.float64)
-        
-        # 测量残差 y = z - h(x)
-        y = z - h
-        y[0] = self._normalize_angle(y[0])
-        y[1] = self._normalize_angle(y[1])
-        
-        # 测量雅可比矩阵 H (3x6)
-        H = np.zeros((3, 6), dtype=np.float64)
-        H[0, 0] = 1.0  # roll
-        H[1, 1] = 1.0  # pitch
-        # yaw不由加速度计测量
-        
-        # 调整测量噪声（根据信任度）
-        R = self.R_accel.copy()
-        R *= (1.0 / max(0.1, self.accel_trust_factor))
-        
-        # 卡尔曼增益 K = P * H^T * (H * P * H^T + R)^-1
-        S = H @ self.P @ H.T + R
-        K = self.P @ H.T @ np.linalg.inv(S)
-        
-        # 更新状态
-        self.state += K @ y
-        
-        # 归一化角度
-        self.state[0] = self._normalize_angle(self.state[0])
-        self.state[1] = self._normalize_angle(self.state[1])
-        self.state[2] = self._normalize_angle(self.state[2])
-        
-        # 更新协方差 P = (I - K * H) * P
-        I = np.eye(6, dtype=np.float64)
-        self.P = (I - K @ H) @ self.P
+        self.accel_trust_factor = _ekf_update_accel(
+            self.state, self.P, self._work, self.R_accel[0, 0],
+            accel_x, accel_y, accel_z, self.accel_trust_factor)
         
     def update_magnetometer(self, mag_angle):
         """
@@ -194,94 +805,269 @@ class ExtendedKalmanFilter:
         Args:
             mag_angle: 磁力计测量的角度（度，0-360）
         """
-        # 转换为弧度，并归一化到 [-pi, pi]
-        measured_yaw = self._normalize_angle(math.radians(mag_angle))
+        _ekf_update_mag(self.state, self.P, self._work, self.R_mag[0, 0],
+                        mag_angle, self.mag_trust_factor)
+    
+    def step(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+             mag_angle=None, mag_valid=False, dt=0.1):
+        """
+        单次调用完成预测和全部测量更新（热路径使用，只进入一次编译内核）
         
-        # 测量向量 z = [measured_yaw]
-        z = np.array([measured_yaw], dtype=np.float64)
+        Args:
+            accel_x, accel_y, accel_z: 加速度（g）
+            gyro_x, gyro_y, gyro_z: 角速度（度/秒）
+            mag_angle: 磁力计角度（度，0-360），可选
+            mag_valid: 磁力计数据是否有效
+            dt: 时间间隔（秒）
+        """
+        use_mag = mag_valid and mag_angle is not None
+        self.accel_trust_factor = _ekf_step(
+            self.state, self.P, self.Q, self._F, self._work,
+            self.R_accel[0, 0], self.R_mag[0, 0],
+            accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+            mag_angle if use_mag else 0.0, use_mag, dt,
+            self.accel_trust_factor, self.mag_trust_factor)
+    
+    def step_batch(self, accels, gyros, mags, valids, dts, noise_levels):
+        """
+        顺序处理一批样本（离线回放/批量接收使用）
         
-        # 预测的测量 h(x) = [yaw]
-        h = np.array([self.state[2]], dtype=np.float64)
+        Args:
+            accels, gyros: (K, 3)加速度（g）与角速度（度/秒）
+            mags: (K,)磁力计角度（度，0-360）
+            valids: (K,)磁力计数据是否有效
+            dts: (K,)每个样本的时间间隔（秒）
+            noise_levels: (K,)每个样本之后的过程噪声级别，<=0表示保持不变
+        """
+        if NUMBA_AVAILABLE:
+            self.accel_trust_factor = _ekf_run_batch(
+                self.state, self.P, self.Q, self._F, self._work,
+                self.R_accel[0, 0], self.R_mag[0, 0],
+                np.ascontiguousarray(accels, dtype=np.float64),
+                np.ascontiguousarray(gyros, dtype=np.float64),
+                np.ascontiguousarray(mags, dtype=np.float64),
+                np.ascontiguousarray(valids, dtype=np.bool_),
+                np.ascontiguousarray(dts, dtype=np.float64),
+                np.ascontiguousarray(noise_levels, dtype=np.float64),
+                self.accel_trust_factor, self.mag_trust_factor)
+            return
         
-        # 测量残差 y = z - h(x)
-        y = z - h
-        y[0] = self._normalize_angle(y[0])
+        # 无numba时逐样本调用，先转为Python标量避免numpy标量运算开销
+        for (ax, ay, az), (gx, gy, gz), mag, valid, dt, level in zip(
+                accels.tolist(), gyros.tolist(), mags.tolist(),
+                valids.tolist(), dts.tolist(), noise_levels.tolist()):
+            self.step(ax, ay, az, gx, gy, gz, mag_angle=mag, mag_valid=valid, dt=dt)
+            if level > 0.0:
+                self.set_process_noise(level)
+    
+    def _normalize_angle(self, angle):
+        """将角度归一化到 [-pi, pi]"""
+        return _normalize_angle(angle)
+    
+    def get_euler_angles(self):
+        """
+        获取当前姿态角
         
-        # 测量雅可比矩阵 H (1x6)
-        H = np.zeros((1, 6), dtype=np.float64)
-        H[0, 2] = 1.0  # yaw
+        Returns:
+            (roll, pitch, yaw): 姿态角（度）
+        """
+        # 一次tolist转为Python浮点数，之后的乘法不经过numpy标量
+        roll, pitch, yaw = self.state[0:3].tolist()
+        return (roll * _RAD2DEG, pitch * _RAD2DEG, yaw * _RAD2DEG)
+    
+    def get_quaternion(self):
+        """
+        获取当前姿态的四元数（直接由内部弧度状态计算）
         
-        # 调整测量噪声（根据信任度）
-        R = self.R_mag.copy()
-        R *= (1.0 / max(0.1, self.mag_trust_factor))
+        Returns:
+            (w, x, y, z): 四元数
+        """
+        return _state_quaternion(self.state)
+    
+    def get_gyro_bias(self):
+        """
+        获取陀螺仪零偏估计
         
-        # 卡尔曼增益 K = P * H^T * (H * P * H^T + R)^-1
-        S = H @ self.P @ H.T + R
-        K = self.P @ H.T @ np.linalg.inv(S)
+        Returns:
+            (bias_x, bias_y, bias_z): 零偏（度/秒）
+        """
+        bias_x, bias_y, bias_z = self.state[3:6].tolist()
+        return (bias_x * _RAD2DEG, bias_y * _RAD2DEG, bias_z * _RAD2DEG)
+    
+    def set_mag_trust(self, trust_factor):
+        """
+        设置磁力计信任度
         
-        # 更新状态
-        self.state += K @ y
+        Args:
+            trust_factor: 信任度 (0-1)，0表示完全不信任，1表示完全信任
+        """
+        self.mag_trust_factor = max(0.0, min(1.0, trust_factor))
+    
+    def set_process_noise(self, noise_level):
+        """
+        动态调整过程噪声（用于适应运动状态）
         
-        # 归一化角度
-        self.state[0] = self._normalize_angle(self.state[0])
-        self.state[1] = self._normalize_angle(self.state[1])
-        self.state[2] = self._normalize_angle(self.state[2])
+        Args:
+            noise_level: 噪声级别 (0.001-1.0)
+                        - 低噪声：静止或缓慢运动
+                        - 高噪声：快速运动或振动
+        """
+        # 原地写对角线，不分配临时矩阵
+        self._Q_diag[0:3] = noise_level
+        self._Q_diag[3:6] = noise_level * 0.001
+    
+    def reset(self):
+        """重置滤波器（原地重置，内核持有的数组引用保持有效）"""
+        self.state[:] = 0.0
+        self.P.fill(0.0)
+        np.fill_diagonal(self.P, 1.0)
+        self.update_count = 0
+        self.accel_trust_factor = 1.0
+        self.mag_trust_factor = 1.0
+    
+    def get_state_covariance(self):
+        """
+        获取状态协方差（用于评估估计的不确定性）
         
-        # 更新协方差 P = (I - K * H) * P
-        I = np.eye(6, dtype=np.float64)
-        self.P = (I - K @ H) @ self.P
+        Returns:
+            姿态角的标准差 (roll_std, pitch_std, yaw_std) 单位：度
+        """
+        var_roll, var_pitch, var_yaw = self.P.diagonal()[0:3].tolist()
+        return (math.sqrt(var_roll) * _RAD2DEG,
+                math.sqrt(var_pitch) * _RAD2DEG,
+                math.sqrt(var_yaw) * _RAD2DEG)
+
+
+class QuaternionEKF:
+    """
+    四元数状态扩展卡尔曼滤波器 - 无万向节锁的姿态估计
+    
+    状态向量: [qw, qx, qy, qz, gyro_bias_x, gyro_bias_y, gyro_bias_z]
+    - qw..qz: 姿态四元数（机体系到世界系）
+    - gyro_bias_*: 陀螺仪零偏（弧度/秒）
     
-    def _compute_state_jacobian(self, gx, gy, gz, dt):
-        """计算状态转移雅可比矩阵 F"""
-        F = np.eye(6, dtype=np.float64)
+    与ExtendedKalmanFilter接口一致。预测和加速度计观测均为四元数多项式，
+    不含tan(pitch)和1/cos(pitch)，俯仰角接近±90°时雅可比矩阵不会被截断。
+    """
+    
+    def __init__(self, process_noise=0.01, accel_noise=0.1, gyro_noise=0.01, mag_noise=0.05,
+                 dtype=np.float64):
+        """
+        初始化四元数EKF滤波器（参数含义同ExtendedKalmanFilter）
+        """
+        self.dtype = np.dtype(dtype)
         
-        roll = self.state[0]
-        pitch = self.state[1]
+        # 状态向量 [qw, qx, qy, qz, bias_x, bias_y, bias_z]
+        self.state = np.zeros(7, dtype=self.dtype)
+        self.state[0] = 1.0
         
-        sin_roll = math.sin(roll)
-        cos_roll = math.cos(roll)
-        sin_pitch = math.sin(pitch)
-        cos_pitch = math.cos(pitch)
-        tan_pitch = math.tan(pitch)
+        # 状态协方差矩阵（小角度时 δq ≈ ½·δθ，四元数方差取姿态角方差的1/4）
+        self.P = np.eye(7, dtype=self.dtype)
+        self.P[0:4, 0:4] *= 0.25
         
-        # 防止除零
-        if abs(cos_pitch) < 0.01:
-            cos_pitch = 0.01 if cos_pitch >= 0 else -0.01
+        # 过程噪声协方差（对角阵，保存对角线的可写视图供原地调整）
+        self.Q = np.eye(7, dtype=self.dtype)
+        self._Q_diag = np.einsum('ii->i', self.Q)
+        self.set_process_noise(process_noise)
         
-        # droll/droll, droll/dpitch
-        F[0, 0] = 1.0 + dt * (cos_roll * tan_pitch * gy - sin_roll * tan_pitch * gz)
-        F[0, 1] = dt * (sin_roll / (cos_pitch**2) * gy + cos_roll / (cos_pitch**2) * gz)
+        # 测量噪声协方差
+        self.R_accel = np.eye(3, dtype=self.dtype) * (accel_noise ** 2)
+        self.R_mag = np.eye(1, dtype=self.dtype) * (mag_noise ** 2)
         
-        # dpitch/droll
-        F[1, 0] = dt * (-sin_roll * gy - cos_roll * gz)
-        F[1, 1] = 1.0
+        # 陀螺仪噪声
+        self.gyro_noise = gyro_noise
         
-        # dyaw/droll, dyaw/dpitch
-        F[2, 0] = dt * ((cos_roll / cos_pitch) * gy - (sin_roll / cos_pitch) * gz)
-        F[2, 1] = dt * (sin_roll * sin_pitch / (cos_pitch**2) * gy + 
-                       cos_roll * sin_pitch / (cos_pitch**2) * gz)
-        F[2, 2] = 1.0
+        # 动态调整参数
+        self.accel_trust_factor = 1.0  # 加速度计信任度 (0-1)
+        self.mag_trust_factor = 1.0    # 磁力计信任度 (0-1)
         
-        # 零偏影响
-        F[0, 3] = -dt
-        F[0, 4] = -dt * sin_roll * tan_pitch
-        F[0, 5] = -dt * cos_roll * tan_pitch
+        # 内核使用的预分配临时矩阵
+        self._F = np.eye(7, dtype=self.dtype)
+        self._work = np.zeros((7, 7), dtype=self.dtype)
+        self._aux = np.zeros((7, 7), dtype=self.dtype)
         
-        F[1, 4] = -dt * cos_roll
-        F[1, 5] = dt * sin_roll
+        # 统计信息
+        self.update_count = 0
+        
+        # 预热JIT内核，避免第一个样本卡顿
+        if NUMBA_AVAILABLE:
+            _qekf_step(self.state.copy(), self.P.copy(), self.Q, self._F, self._work, self._aux,
+                       1.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0,
+                       0.0, True, 0.1, 1.0, 1.0)
+            empty = np.zeros(0, dtype=np.float64)
+            _qekf_run_batch(self.state.copy(), self.P.copy(), self.Q.copy(), self._F, self._work,
+                            self._aux, 1.0, 1.0, np.zeros((0, 3)), np.zeros((0, 3)), empty,
+                            np.zeros(0, dtype=np.bool_), empty, empty, 1.0, 1.0)
+            _qekf_attitude_std(self.state, self.P)
+    
+    def predict(self, gyro_x, gyro_y, gyro_z, dt):
+        """
+        预测步骤：使用陀螺仪数据积分四元数
+        
+        Args:
+            gyro_x, gyro_y, gyro_z: 陀螺仪角速度（度/秒）
+            dt: 时间间隔（秒）
+        """
+        _qekf_predict(self.state, self.P, self.Q, self._F, self._work,
+                      gyro_x, gyro_y, gyro_z, dt)
+    
+    def update_accel(self, accel_x, accel_y, accel_z):
+        """
+        更新步骤：使用加速度计观测的重力方向校正姿态
         
-        F[2, 4] = -dt * sin_roll / cos_pitch
-        F[2, 5] = -dt * cos_roll / cos_pitch
+        Args:
+            accel_x, accel_y, accel_z: 加速度计读数（g）
+        """
+        self.accel_trust_factor = _qekf_update_accel(
+            self.state, self.P, self._work, self._aux, self.R_accel[0, 0],
+            accel_x, accel_y, accel_z, self.accel_trust_factor)
+    
+    def update_magnetometer(self, mag_angle):
+        """
+        更新步骤：使用磁力计（MT6701角度传感器）数据校正Yaw角
         
-        return F
+        Args:
+            mag_angle: 磁力计测量的角度（度，0-360）
+        """
+        _qekf_update_mag(self.state, self.P, self._work, self._aux, self.R_mag[0, 0],
+                         mag_angle, self.mag_trust_factor)
     
-    def _normalize_angle(self, angle):
-        """将角度归一化到 [-pi, pi]"""
-        while angle > math.pi:
-            angle -= 2 * math.pi
-        while angle < -math.pi:
-            angle += 2 * math.pi
-        return angle
+    def step(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+             mag_angle=None, mag_valid=False, dt=0.1):
+        """
+        单次调用完成预测和全部测量更新（参数含义同ExtendedKalmanFilter.step）
+        """
+        use_mag = mag_valid and mag_angle is not None
+        self.accel_trust_factor = _qekf_step(
+            self.state, self.P, self.Q, self._F, self._work, self._aux,
+            self.R_accel[0, 0], self.R_mag[0, 0],
+            accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+            mag_angle if use_mag else 0.0, use_mag, dt,
+            self.accel_trust_factor, self.mag_trust_factor)
+    
+    def step_batch(self, accels, gyros, mags, valids, dts, noise_levels):
+        """
+        顺序处理一批样本（参数含义同ExtendedKalmanFilter.step_batch）
+        """
+        if NUMBA_AVAILABLE:
+            self.accel_trust_factor = _qekf_run_batch(
+                self.state, self.P, self.Q, self._F, self._work, self._aux,
+                self.R_accel[0, 0], self.R_mag[0, 0],
+                np.ascontiguousarray(accels, dtype=np.float64),
+                np.ascontiguousarray(gyros, dtype=np.float64),
+                np.ascontiguousarray(mags, dtype=np.float64),
+                np.ascontiguousarray(valids, dtype=np.bool_),
+                np.ascontiguousarray(dts, dtype=np.float64),
+                np.ascontiguousarray(noise_levels, dtype=np.float64),
+                self.accel_trust_factor, self.mag_trust_factor)
+            return
+        
+        for (ax, ay, az), (gx, gy, gz), mag, valid, dt, level in zip(
+                accels.tolist(), gyros.tolist(), mags.tolist(),
+                valids.tolist(), dts.tolist(), noise_levels.tolist()):
+            self.step(ax, ay, az, gx, gy, gz, mag_angle=mag, mag_valid=valid, dt=dt)
+            if level > 0.0:
+                self.set_process_noise(level)
     
     def get_euler_angles(self):
         """
@@ -290,11 +1076,16 @@ class ExtendedKalmanFilter:
         Returns:
             (roll, pitch, yaw): 姿态角（度）
         """
-        return (
-            math.degrees(self.state[0]),
-            math.degrees(self.state[1]),
-            math.degrees(self.state[2])
-        )
+        return quaternion_to_euler(*self.state[0:4].tolist())
+    
+    def get_quaternion(self):
+        """
+        获取当前姿态的四元数
+        
+        Returns:
+            (w, x, y, z): 四元数
+        """
+        return tuple(self.state[0:4].tolist())
     
     def get_gyro_bias(self):
         """
@@ -303,11 +1094,8 @@ class ExtendedKalmanFilter:
         Returns:
             (bias_x, bias_y, bias_z): 零偏（度/秒）
         """
-        return (
-            math.degrees(self.state[3]),
-            math.degrees(self.state[4]),
-            math.degrees(self.state[5])
-        )
+        bias_x, bias_y, bias_z = self.state[4:7].tolist()
+        return (bias_x * _RAD2DEG, bias_y * _RAD2DEG, bias_z * _RAD2DEG)
     
     def set_mag_trust(self, trust_factor):
         """
@@ -320,36 +1108,34 @@ class ExtendedKalmanFilter:
     
     def set_process_noise(self, noise_level):
         """
-        动态调整过程噪声（用于适应运动状态）
+        动态调整过程噪声（与ExtendedKalmanFilter的噪声级别含义相同）
         
         Args:
-            noise_level: 噪声级别 (0.001-1.0)
-                        - 低噪声：静止或缓慢运动
-                        - 高噪声：快速运动或振动
+            noise_level: 姿态角噪声级别 (0.001-1.0)
         """
-        self.Q[0:3, 0:3] = np.eye(3) * noise_level
-        self.Q[3:6, 3:6] = np.eye(3) * noise_level * 0.001
+        self._Q_diag[0:4] = noise_level * 0.25
+        self._Q_diag[4:7] = noise_level * 0.001
     
     def reset(self):
-        """重置滤波器"""
-        self.state = np.zeros(6, dtype=np.float64)
-        self.P = np.eye(6, dtype=np.float64) * 1.0
+        """重置滤波器（原地重置，内核持有的数组引用保持有效）"""
+        self.state[:] = 0.0
+        self.state[0] = 1.0
+        self.P.fill(0.0)
+        np.fill_diagonal(self.P, 1.0)
+        self.P[0:4, 0:4] *= 0.25
         self.update_count = 0
         self.accel_trust_factor = 1.0
         self.mag_trust_factor = 1.0
     
     def get_state_covariance(self):
         """
-        获取状态协方差（用于评估估计的不确定性）
+        获取姿态不确定性（由四元数协方差按小角度近似换算）
         
         Returns:
-            姿态角的标准差 (roll_std, pitch_std, yaw_std) 单位：度
+            绕X/Y/Z轴姿态角的标准差 (roll_std, pitch_std, yaw_std) 单位：度
         """
-        return (
-            math.degrees(math.sqrt(self.P[0, 0])),
-            math.degrees(math.sqrt(self.P[1, 1])),
-            math.degrees(math.sqrt(self.P[2, 2]))
-        )
+        std_x, std_y, std_z = _qekf_attitude_std(self.state, self.P)
+        return (std_x * _RAD2DEG, std_y * _RAD2DEG, std_z * _RAD2DEG)
 
 
 class AdaptiveEKFAttitudeEstimator:
@@ -363,18 +1149,32 @@ class AdaptiveEKFAttitudeEstimator:
     4. 提供平滑、快速响应、无漂移的姿态估计
     """
     
-    def __init__(self):
-        """初始化自适应EKF估计器"""
-        self.ekf = ExtendedKalmanFilter(
+    def __init__(self, dtype=np.float64, quaternion_state=False):
+        """
+        初始化自适应EKF估计器
+        
+        Args:
+            dtype: EKF状态与协方差的数据类型（np.float64或np.float32）
+            quaternion_state: True使用四元数状态EKF（大俯仰角下无万向节锁），
+                              False使用欧拉角状态EKF
+        """
+        filter_cls = QuaternionEKF if quaternion_state else ExtendedKalmanFilter
+        self.ekf = filter_cls(
             process_noise=0.01,
             accel_noise=0.1,
             gyro_noise=0.01,
-            mag_noise=0.05
+            mag_noise=0.05,
+            dtype=dtype
         )
         
         # 运动检测
-        self.accel_history = []
+        # 加速度大小（整数毫g）的定长环形缓冲区 + 滑动和/平方和，O(1)更新标准差
         self.max_history_len = 10
+        self._accel_ring = [0] * self.max_history_len
+        self._ring_idx = 0
+        self._ring_filled = 0
+        self._sum = 0
+        self._sumsq = 0
         
         # 统计
         self.update_count = 0
@@ -396,15 +1196,9 @@ class AdaptiveEKFAttitudeEstimator:
         Returns:
             (roll, pitch, yaw): 姿态角（度）
         """
-        # 1. 预测步骤（使用陀螺仪）
-        self.ekf.predict(gyro_x, gyro_y, gyro_z, dt)
-        
-        # 2. 更新步骤（使用加速度计）
-        self.ekf.update_accel(accel_x, accel_y, accel_z)
-        
-        # 3. 更新步骤（使用磁力计，如果可用）
-        if mag_valid and mag_angle is not None:
-            self.ekf.update_magnetometer(mag_angle)
+        # 1-3. 预测（陀螺仪）+ 加速度计更新 + 磁力计更新（如果可用），单次内核调用
+        self.ekf.step(accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+                      mag_angle=mag_angle, mag_valid=mag_valid, dt=dt)
         
         # 4. 自适应调整过程噪声
         self._adapt_process_noise(accel_x, accel_y, accel_z)
@@ -414,19 +1208,110 @@ class AdaptiveEKFAttitudeEstimator:
         # 返回姿态角
         return self.ekf.get_euler_angles()
     
-    def _adapt_process_noise(self, ax, ay, az):
-        """根据运动状态自适应调整过程噪声"""
-        # 计算加速度大小
-        accel_mag = math.sqrt(ax**2 + ay**2 + az**2)
+    def update_batch(self, accels, gyros, mags, valids, dt=0.1):
+        """
+        按顺序处理一批样本，只返回最后一个样本后的姿态（中间结果丢弃）
+        
+        递推的EKF状态无法跨样本向量化，但自适应过程噪声只依赖加速度历史，
+        可以先用numpy整批算出，再把整批样本交给一次内核调用。
+        
+        Args:
+            accels: (K, 3)加速度数组（g）
+            gyros: (K, 3)角速度数组（度/秒）
+            mags: (K,)磁力计角度数组（度，0-360）
+            valids: (K,)磁力计数据是否有效
+            dt: 时间间隔（秒），标量或(K,)数组
+        
+        Returns:
+            (roll, pitch, yaw): 姿态角（度）
+        """
+        count = len(accels)
+        if count == 0:
+            return self.ekf.get_euler_angles()
         
-        # 维护历史记录
-        self.accel_history.append(accel_mag)
-        if len(self.accel_history) > self.max_history_len:
-            self.accel_history.pop(0)
+        dts = np.broadcast_to(np.asarray(dt, dtype=np.float64), (count,))
+        noise_levels = self._batch_noise_levels(accels)
+        self.ekf.step_batch(accels, gyros, mags, valids, dts, noise_levels)
+        self.update_count += count
         
-        # 计算加速度变化（标准差）
-        if len(self.accel_history) >= 3:
-            accel_std = np.std(self.accel_history)
+        return self.ekf.get_euler_angles()
+    
+    def _batch_noise_levels(self, accels):
+        """
+        向量化计算一批样本各自之后的过程噪声级别（与逐样本_adapt_process_noise一致）
+        
+        Args:
+            accels: (K, 3)加速度数组（g）
+        
+        Returns:
+            (K,)噪声级别数组，0表示历史不足、保持当前噪声
+        """
+        magnitudes = np.sqrt(np.einsum('ij,ij->i', accels, accels))
+        quantized = np.floor(magnitudes * _ACCEL_HISTORY_SCALE + 0.5).astype(np.int64)
+        history = self._ordered_history()
+        history_len = len(history)
+        values = np.concatenate((np.asarray(history, dtype=np.int64), quantized))
+        
+        # 滑动窗口（最近max_history_len个值）的和与平方和，用整数前缀和一次求出
+        csum = np.concatenate(([0], np.cumsum(values)))
+        csum2 = np.concatenate(([0], np.cumsum(values * values)))
+        end = np.arange(history_len + 1, len(values) + 1)
+        start = np.maximum(end - self.max_history_len, 0)
+        window = end - start
+        window_sum = csum[end] - csum[start]
+        # n²·方差 = n·Σx² − (Σx)²，整数运算结果精确且非负
+        scaled_var = window * (csum2[end] - csum2[start]) - window_sum * window_sum
+        accel_std = np.sqrt(scaled_var) / (window * _ACCEL_HISTORY_SCALE)
+        
+        noise_levels = np.select([accel_std > 0.3, accel_std > 0.1], [0.05, 0.02], 0.01)
+        noise_levels[window < 3] = 0.0
+        
+        self._load_history(values[-self.max_history_len:].tolist())
+        return noise_levels
+    
+    def _ordered_history(self):
+        """按时间顺序（旧到新）返回环形缓冲区中的加速度大小（毫g）"""
+        if self._ring_filled < self.max_history_len:
+            return self._accel_ring[:self._ring_filled]
+        return self._accel_ring[self._ring_idx:] + self._accel_ring[:self._ring_idx]
+    
+    def _load_history(self, values):
+        """
+        用按时间排序的值重建环形缓冲区及滑动和
+        
+        Args:
+            values: 不超过max_history_len个加速度大小（毫g整数，旧到新）
+        """
+        count = len(values)
+        self._accel_ring[:] = list(values) + [0] * (self.max_history_len - count)
+        self._ring_idx = count % self.max_history_len
+        self._ring_filled = count
+        self._sum = sum(values)
+        self._sumsq = sum(v * v for v in values)
+    
+    def _adapt_process_noise(self, ax, ay, az):
+        """根据运动状态自适应调整过程噪声"""
+        # 计算加速度大小（量化为整数毫g）
+        accel_mag = int(math.sqrt(ax * ax + ay * ay + az * az) * _ACCEL_HISTORY_SCALE + 0.5)
+        
+        # 环形缓冲区替换最旧值（未填满时旧值为0），同步更新滑动和与平方和
+        ring = self._accel_ring
+        idx = self._ring_idx
+        old = ring[idx]
+        ring[idx] = accel_mag
+        idx += 1
+        if idx == self.max_history_len:
+            idx = 0
+        self._ring_idx = idx
+        if self._ring_filled < self.max_history_len:
+            self._ring_filled += 1
+        self._sum += accel_mag - old
+        self._sumsq += accel_mag * accel_mag - old * old
+        
+        # 计算加速度变化（总体标准差，单位g）：n²·方差 = n·Σx² − (Σx)²
+        n = self._ring_filled
+        if n >= 3:
+            accel_std = math.sqrt(n * self._sumsq - self._sum * self._sum) / (n * _ACCEL_HISTORY_SCALE)
             
             # 根据加速度变化调整过程噪声
             if accel_std > 0.3:  # 快速运动/振动
@@ -442,6 +1327,16 @@ class AdaptiveEKFAttitudeEstimator:
         """获取当前姿态角（度）"""
         return self.ekf.get_euler_angles()
     
+    def get_state(self):
+        """
+        获取当前姿态角和四元数
+        
+        Returns:
+            (roll, pitch, yaw, quaternion): 姿态角（度）和(w, x, y, z)四元数
+        """
+        roll, pitch, yaw = self.ekf.get_euler_angles()
+        return roll, pitch, yaw, self.ekf.get_quaternion()
+    
     def get_gyro_bias(self):
         """获取陀螺仪零偏估计（度/秒）"""
         return self.ekf.get_gyro_bias()
@@ -457,7 +1352,7 @@ class AdaptiveEKFAttitudeEstimator:
     def reset(self):
         """重置估计器"""
         self.ekf.reset()
-        self.accel_history.clear()
+        self._load_history([])
         self.update_count = 0
 
 
@@ -558,8 +1453,23 @@ if __name__ == '__main__':
             print(f"  Frame {i:2d}: Yaw={yaw:7.2f}°  磁力计={mag_angle:7.2f}°  "
                   f"陀螺仪漂移={'有' if gyro_z_with_drift > 0 else '无'}")
     
-    # 测试6: 性能测试
-    print("\n【测试6】性能测试")
+    # 测试6: 大俯仰角（欧拉角状态 vs 四元数状态）
+    print("\n【测试6】大俯仰角（85°）：欧拉角EKF vs 四元数EKF")
+    print("-" * 80)
+    angle_85 = math.radians(85)
+    for label, use_quat in (("欧拉角", False), ("四元数", True)):
+        estimator = AdaptiveEKFAttitudeEstimator(quaternion_state=use_quat)
+        for i in range(100):
+            roll, pitch, yaw = estimator.update(
+                accel_x=-math.sin(angle_85), accel_y=0.0, accel_z=math.cos(angle_85),
+                gyro_x=0.0, gyro_y=0.0, gyro_z=0.0,
+                mag_angle=45.0, mag_valid=True,
+                dt=0.1
+            )
+        print(f"  {label}EKF: Roll={roll:7.2f}° Pitch={pitch:7.2f}° Yaw={yaw:7.2f}°")
+    
+    # 测试7: 性能测试
+    print("\n【测试7】性能测试")
     print("-" * 80)
     import time
     
@@ -2,21 +2,128 @@
 3D模型加载器 - 支持加载外部3D模型文件
 """
 import os
+import re
 import numpy as np
 from OpenGL.GL import *
+from models import _VertexArray, _create_buffer
+
+
+# OBJ面顶点中"/"及其后的纹理/法线索引
+_OBJ_SLASH_RE = re.compile(r'/\S*')
+
+# 二进制STL：80字节文件头 + uint32三角形数 + 每个三角形50字节记录
+STL_HEADER_SIZE = 84
+STL_TRIANGLE_DTYPE = np.dtype([
+    ('normal', '<3f4'),
+    ('v0', '<3f4'),
+    ('v1', '<3f4'),
+    ('v2', '<3f4'),
+    ('attr', '<u2'),
+])
+
+
+def _stl_triangle_count(buf):
+    """
+    读取二进制STL文件头中的三角形数
+    
+    Args:
+        buf: 文件内容(bytes)，长度不小于STL_HEADER_SIZE
+    
+    Returns:
+        int: 三角形数
+    """
+    return int(np.frombuffer(buf, dtype='<u4', count=1, offset=80)[0])
+
+
+def is_binary_stl(buf):
+    """
+    判断STL文件内容是否为二进制格式
+    
+    部分二进制STL的文件头也以"solid"开头，因此按三角形数与文件长度是否吻合判断
+    （部分导出工具会在末尾追加填充字节，只要求文件长度足够容纳全部三角形）。
+    
+    Args:
+        buf: 文件内容(bytes)
+    
+    Returns:
+        bool: 是否为二进制STL
+    """
+    if len(buf) < STL_HEADER_SIZE:
+        return False
+    count = _stl_triangle_count(buf)
+    return len(buf) >= STL_HEADER_SIZE + count * STL_TRIANGLE_DTYPE.itemsize
+
+
+def _parse_obj_vectors(bodies):
+    """
+    批量解析OBJ的v/vn行（去掉关键字后的部分）为(N, 3)数组
+    
+    Args:
+        bodies: 数值部分字符串列表，如["1.0 2.0 3.0", ...]
+    
+    Returns:
+        np.ndarray: (N, 3)坐标数组
+    """
+    if not bodies:
+        return np.zeros((0, 3))
+    
+    values = np.fromstring(' '.join(bodies), sep=' ')
+    if len(values) == 3 * len(bodies):
+        return values.reshape(-1, 3)
+    
+    # 部分行带有w分量或顶点颜色，只取前三个值
+    return np.array([body.split()[:3] for body in bodies], dtype=np.float64)
+
+
+def _parse_obj_faces(bodies):
+    """
+    批量解析OBJ的f行，多边形按扇形三角化
+    
+    支持格式: v, v/vt, v/vt/vn, v//vn
+    
+    Args:
+        bodies: 去掉"f "后的面定义字符串列表
+    
+    Returns:
+        np.ndarray: (F, 3)三角形顶点索引（从0开始）
+    """
+    if not bodies:
+        return np.zeros((0, 3), dtype=np.int64)
+    
+    # 每行顶点数，用于把扁平索引还原为多边形
+    counts = np.array([len(body.split()) for body in bodies], dtype=np.int64)
+    
+    # 去掉每个顶点的"/vt/vn"部分，只保留顶点索引（OBJ索引从1开始）
+    indices = np.fromstring(_OBJ_SLASH_RE.sub('', ' '.join(bodies)), dtype=np.int64, sep=' ') - 1
+    
+    # 扇形三角化：第k个多边形生成 (p0, pi, pi+1), i = 1..n-2（四边形即原先的两个三角形）
+    tri_counts = np.maximum(counts - 2, 0)
+    starts = np.cumsum(counts) - counts
+    fan_base = np.repeat(starts, tri_counts)
+    fan_offset = np.arange(tri_counts.sum()) - np.repeat(np.cumsum(tri_counts) - tri_counts, tri_counts) + 1
+    
+    return np.stack((indices[fan_base],
+                     indices[fan_base + fan_offset],
+                     indices[fan_base + fan_offset + 1]), axis=1)
 
 
 class CustomModel:
     """自定义3D模型类"""
     
     def __init__(self):
-        self.vertices = []  # 顶点列表
-        self.faces = []     # 面列表
-        self.normals = []   # 法线列表
+        self.vertices = np.zeros((0, 3), dtype=np.float32)  # (N, 3)顶点坐标
+        self.faces = np.zeros((0, 3), dtype=np.int32)       # (F, 3)三角形顶点索引
+        self.normals = np.zeros((0, 3), dtype=np.float32)   # (F, 3)面法线
         self.colors = []    # 颜色列表
         self.name = "Custom Model"
         self.scale = 1.0
         
+        # GPU缓冲区在首次绘制时创建（加载时OpenGL上下文可能尚未就绪）
+        self._surface = None      # 表面：按面展开的位置+法线（步长24字节）
+        self._edges = None        # 线框：共享同一VBO的边索引
+        self._surface_count = 0
+        self._edge_count = 0
+        
     def load_from_obj(self, filepath):
         """
         从OBJ文件加载模型
@@ -29,61 +136,31 @@ class CustomModel:
         """
         try:
             with open(filepath, 'r') as f:
-                temp_vertices = []
-                temp_normals = []
-                
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    
-                    parts = line.split()
-                    if not parts:
-                        continue
-                    
-                    # 顶点坐标
-                    if parts[0] == 'v':
-                        x, y, z = float(parts[1]), float(parts[2]), float(parts[3])
-                        temp_vertices.append([x, y, z])
-                    
-                    # 法线
-                    elif parts[0] == 'vn':
-                        nx, ny, nz = float(parts[1]), float(parts[2]), float(parts[3])
-                        temp_normals.append([nx, ny, nz])
-                    
-                    # 面（三角形或四边形）
-                    elif parts[0] == 'f':
-                        face = []
-                        for vertex_data in parts[1:]:
-                            # 支持格式: v, v/vt, v/vt/vn, v//vn
-                            indices = vertex_data.split('/')
-                            vertex_index = int(indices[0]) - 1  # OBJ索引从1开始
-                            face.append(vertex_index)
-                        
-                        # 如果是四边形，分割成两个三角形
-                        if len(face) == 4:
-                            self.faces.append([face[0], face[1], face[2]])
-                            self.faces.append([face[0], face[2], face[3]])
-                        else:
-                            self.faces.append(face)
-                
-                self.vertices = temp_vertices
-                self.name = os.path.basename(filepath)
-                
-                # 如果没有法线，自动计算
-                if not temp_normals:
-                    self._calculate_normals()
-                else:
-                    self.normals = temp_normals
-                
-                # 自动缩放模型到合适大小
-                self._auto_scale()
-                
-                print(f"✅ 成功加载模型: {self.name}")
-                print(f"   顶点数: {len(self.vertices)}")
-                print(f"   面数: {len(self.faces)}")
-                
-                return True
+                lines = [line.lstrip() for line in f.read().splitlines()]
+            
+            # 按行首关键字整批分拣，数值部分一次性交给numpy解析
+            temp_vertices = _parse_obj_vectors([line[2:] for line in lines if line.startswith('v ')])
+            temp_normals = _parse_obj_vectors([line[3:] for line in lines if line.startswith('vn ')])
+            faces = _parse_obj_faces([line[2:] for line in lines if line.startswith('f ')])
+            
+            self.vertices = temp_vertices.astype(np.float32)
+            self.faces = faces.astype(np.int32)
+            self.name = os.path.basename(filepath)
+            
+            # 如果没有法线，自动计算
+            if not len(temp_normals):
+                self._calculate_normals()
+            else:
+                self.normals = temp_normals.astype(np.float32)
+            
+            # 自动缩放模型到合适大小
+            self._auto_scale()
+            
+            print(f"✅ 成功加载模型: {self.name}")
+            print(f"   顶点数: {len(self.vertices)}")
+            print(f"   面数: {len(self.faces)}")
+            
+            return True
                 
         except Exception as e:
             print(f"❌ 加载OBJ文件失败: {str(e)}")
@@ -91,7 +168,7 @@ class CustomModel:
     
     def load_from_stl(self, filepath):
         """
-        从STL文件加载模型（ASCII格式）
+        从STL文件加载模型（支持ASCII和二进制格式）
         
         Args:
             filepath: STL文件路径
@@ -100,143 +177,190 @@ class CustomModel:
             bool: 是否加载成功
         """
         try:
-            with open(filepath, 'r') as f:
-                content = f.read()
+            with open(filepath, 'rb') as f:
+                buf = f.read()
+            
+            if is_binary_stl(buf):
+                self._load_binary_stl(buf)
+            else:
+                content = buf.decode('utf-8', errors='replace')
                 
                 # 检查是否为ASCII格式
                 if not content.startswith('solid'):
-                    print("❌ 目前仅支持ASCII格式的STL文件")
+                    print("❌ 无法识别的STL文件格式")
                     return False
                 
-                lines = content.split('\n')
-                temp_vertices = []
-                current_face = []
-                
-                for line in lines:
-                    line = line.strip()
-                    
-                    if line.startswith('vertex'):
-                        parts = line.split()
-                        x, y, z = float(parts[1]), float(parts[2]), float(parts[3])
-                        temp_vertices.append([x, y, z])
-                        current_face.append(len(temp_vertices) - 1)
-                        
-                        if len(current_face) == 3:
-                            self.faces.append(current_face[:])
-                            current_face = []
-                
-                self.vertices = temp_vertices
-                self.name = os.path.basename(filepath)
-                
-                # 自动计算法线
-                self._calculate_normals()
-                
-                # 自动缩放
-                self._auto_scale()
-                
-                print(f"✅ 成功加载模型: {self.name}")
-                print(f"   顶点数: {len(self.vertices)}")
-                print(f"   面数: {len(self.faces)}")
-                
-                return True
+                self._load_ascii_stl(content)
+            
+            if len(self.faces) == 0:
+                print("❌ STL文件中没有三角形")
+                return False
+            
+            self.name = os.path.basename(filepath)
+            
+            # 自动缩放
+            self._auto_scale()
+            
+            print(f"✅ 成功加载模型: {self.name}")
+            print(f"   顶点数: {len(self.vertices)}")
+            print(f"   面数: {len(self.faces)}")
+            
+            return True
                 
         except Exception as e:
             print(f"❌ 加载STL文件失败: {str(e)}")
             return False
     
-    def _calculate_normals(self):
-        """自动计算面法线"""
-        self.normals = []
+    def _load_ascii_stl(self, content):
+        """
+        解析ASCII格式STL（逐行读取顶点，每三个顶点组成一个面）
         
-        for face in self.faces:
-            if len(face) < 3:
-                continue
-            
-            # 获取三角形的三个顶点
-            v0 = np.array(self.vertices[face[0]])
-            v1 = np.array(self.vertices[face[1]])
-            v2 = np.array(self.vertices[face[2]])
-            
-            # 计算两条边
-            edge1 = v1 - v0
-            edge2 = v2 - v0
-            
-            # 叉乘得到法线
-            normal = np.cross(edge1, edge2)
-            
-            # 归一化
-            length = np.linalg.norm(normal)
-            if length > 0:
-                normal = normal / length
+        Args:
+            content: 文件文本
+        """
+        temp_vertices = []
+        
+        for line in content.split('\n'):
+            line = line.strip()
             
-            self.normals.append(normal.tolist())
+            if line.startswith('vertex'):
+                parts = line.split()
+                temp_vertices.append((float(parts[1]), float(parts[2]), float(parts[3])))
+        
+        self.vertices = np.array(temp_vertices, dtype=np.float32).reshape(-1, 3)
+        face_count = len(temp_vertices) // 3
+        self.faces = np.arange(face_count * 3, dtype=np.int32).reshape(face_count, 3)
+        
+        # 自动计算法线
+        self._calculate_normals()
+    
+    def _load_binary_stl(self, buf):
+        """
+        解析二进制格式STL（整块frombuffer，无逐行解析）
+        
+        Args:
+            buf: 文件内容(bytes)
+        """
+        # 按文件头的三角形数读取，忽略末尾填充字节
+        count = _stl_triangle_count(buf)
+        triangles = np.frombuffer(buf, dtype=STL_TRIANGLE_DTYPE, count=count,
+                                  offset=STL_HEADER_SIZE)
+        
+        # 每个三角形三个独立顶点，面索引为连续整数
+        vertices = np.stack((triangles['v0'], triangles['v1'], triangles['v2']), axis=1)
+        self.vertices = vertices.reshape(-1, 3)
+        self.faces = np.arange(count * 3, dtype=np.int32).reshape(count, 3)
+        
+        # 优先直接使用文件中的法线；不少导出工具写入全零法线，此时重新计算
+        normals = triangles['normal']
+        if np.all(np.einsum('ij,ij->i', normals, normals) > 0.5):
+            self.normals = normals.copy()
+        else:
+            self._calculate_normals()
+    
+    def _calculate_normals(self):
+        """自动计算面法线（对全部三角形一次叉乘）"""
+        triangles = self.vertices[self.faces]  # (F, 3, 3)
+        normals = np.cross(triangles[:, 1] - triangles[:, 0],
+                           triangles[:, 2] - triangles[:, 0])
+        
+        # 归一化（退化三角形保持零向量）
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        self.normals = np.divide(normals, lengths, out=normals, where=lengths > 0)
     
     def _auto_scale(self):
-        """自动缩放模型到合适大小（约2单位）"""
-        if not self.vertices:
+        """自动缩放模型到合适大小（约2单位）并居中"""
+        if not len(self.vertices):
             return
         
-        vertices_array = np.array(self.vertices)
-        
         # 计算边界框
-        min_coords = vertices_array.min(axis=0)
-        max_coords = vertices_array.max(axis=0)
+        min_coords = self.vertices.min(axis=0)
+        max_coords = self.vertices.max(axis=0)
         
         # 计算最大尺寸
-        dimensions = max_coords - min_coords
-        max_dimension = dimensions.max()
+        max_dimension = float((max_coords - min_coords).max())
         
         if max_dimension > 0:
             # 缩放到目标大小（例如2单位）
             target_size = 2.0
             self.scale = target_size / max_dimension
             
-            # 缩放所有顶点
-            self.vertices = (vertices_array * self.scale).tolist()
-            
-            # 居中模型
-            center = (np.array(self.vertices).max(axis=0) + 
-                     np.array(self.vertices).min(axis=0)) / 2
-            self.vertices = (np.array(self.vertices) - center).tolist()
+            # 原地居中并缩放所有顶点（不产生临时副本）
+            center = (max_coords + min_coords) / 2
+            self.vertices -= center
+            self.vertices *= np.float32(self.scale)
     
     def draw(self):
-        """绘制模型"""
-        if not self.vertices or not self.faces:
+        """绘制模型（表面 + 线框）"""
+        if not len(self.vertices) or not len(self.faces):
             return
         
-        glBegin(GL_TRIANGLES)
-        
-        for i, face in enumerate(self.faces):
-            # 设置法线（如果有）
-            if i < len(self.normals):
-                glNormal3fv(self.normals[i])
-            
-            # 设置颜色（灰色金属质感）
-            glColor3f(0.7, 0.7, 0.75)
-            
-            # 绘制三角形的三个顶点
-            for vertex_index in face:
-                if vertex_index < len(self.vertices):
-                    glVertex3fv(self.vertices[vertex_index])
-        
-        glEnd()
+        self.draw_surface()
         
         # 绘制线框（可选，增强立体感）
         glDisable(GL_LIGHTING)
-        glColor3f(0.2, 0.2, 0.2)
         glLineWidth(1.0)
+        self.draw_wireframe()
+        glEnable(GL_LIGHTING)
+    
+    def _build_buffers(self):
+        """
+        构建并上传顶点缓冲区（只执行一次）
         
-        glBegin(GL_LINES)
-        for face in self.faces:
-            for i in range(len(face)):
-                v1 = face[i]
-                v2 = face[(i + 1) % len(face)]
-                if v1 < len(self.vertices) and v2 < len(self.vertices):
-                    glVertex3fv(self.vertices[v1])
-                    glVertex3fv(self.vertices[v2])
-        glEnd()
+        平面着色需要每个三角形使用自己的面法线，因此顶点按面展开为3F个，
+        位置与法线交错存放；线框通过索引缓冲区复用同一份顶点。
+        """
+        # 丢弃索引越界的面（与原逐顶点绘制时的越界检查一致）
+        valid = ((self.faces >= 0) & (self.faces < len(self.vertices))).all(axis=1)
+        if not valid.all():
+            self.faces = self.faces[valid]
+            self.normals = np.zeros((0, 3), dtype=np.float32)
+        if len(self.normals) != len(self.faces):
+            self._calculate_normals()
         
-        glEnable(GL_LIGHTING)
+        face_count = len(self.faces)
+        data = np.empty((face_count, 3, 6), dtype=np.float32)
+        data[:, :, :3] = self.vertices[self.faces]
+        data[:, :, 3:] = self.normals[:, None, :]
+        
+        # 每个三角形三条边：(0,1) (1,2) (2,0)
+        base = np.arange(face_count, dtype=np.uint32)[:, None] * 3
+        edge_indices = (base + np.array([0, 1, 1, 2, 2, 0], dtype=np.uint32)).ravel()
+        
+        vbo = _create_buffer(GL_ARRAY_BUFFER, data)
+        self._surface = _VertexArray(vbo, 24, normal_offset=12)
+        self._edges = _VertexArray(vbo, 24, ibo=_create_buffer(GL_ELEMENT_ARRAY_BUFFER, edge_indices))
+        self._surface_count = face_count * 3
+        self._edge_count = len(edge_indices)
+    
+    def draw_surface(self):
+        """绘制模型表面（需要光照）"""
+        if not len(self.vertices) or not len(self.faces):
+            return
+        
+        if self._surface is None:
+            self._build_buffers()
+        
+        # 灰色金属质感
+        glColor3f(0.7, 0.7, 0.75)
+        
+        self._surface.bind()
+        glDrawArrays(GL_TRIANGLES, 0, self._surface_count)
+        self._surface.release()
+    
+    def draw_wireframe(self):
+        """绘制模型线框（不需要光照，线宽由调用方设置）"""
+        if not len(self.vertices) or not len(self.faces):
+            return
+        
+        if self._edges is None:
+            self._build_buffers()
+        
+        glColor3f(0.2, 0.2, 0.2)
+        
+        self._edges.bind()
+        glDrawElements(GL_LINES, self._edge_count, GL_UNSIGNED_INT, None)
+        self._edges.release()
 
 
 def load_model(filepath):
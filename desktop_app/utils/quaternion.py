@@ -11,6 +11,208 @@
 import numpy as np
 import math
 
+from jit import njit, NUMBA_AVAILABLE
+
+
+# 角度/弧度换算系数（内核中作为编译期常量）
+_DEG2RAD = math.pi / 180.0
+_RAD2DEG = 180.0 / math.pi
+_HALF_DEG2RAD = 0.5 * _DEG2RAD  # 度 -> 半角弧度
+
+# 加速度模长下限(g)，低于该值视为无效加速度，只做陀螺仪积分
+ACCEL_NORM_EPS = 1e-12
+
+# 每隔多少步做一次完整（开方）归一化，限制一阶近似的累积误差
+FULL_NORMALIZE_INTERVAL = 64
+
+# 模长平方偏离1超过该值时一阶近似不再准确，直接完整归一化
+FAST_NORMALIZE_TOLERANCE = 1e-2
+
+
+@njit(cache=True, fastmath=True)
+def quat_fast_normalize(q0, q1, q2, q3):
+    """
+    接近单位长度的四元数的一阶归一化（无开方）
+    
+    1/sqrt(n)在n=1处的一阶展开为(3 - n) / 2，其中n为模长平方。
+    
+    Args:
+        q0, q1, q2, q3: 四元数分量(w, x, y, z)
+    
+    Returns:
+        (w, x, y, z): 归一化后的四元数
+    """
+    scale = 0.5 * (3.0 - (q0*q0 + q1*q1 + q2*q2 + q3*q3))
+    return q0 * scale, q1 * scale, q2 * scale, q3 * scale
+
+
+@njit(cache=True, fastmath=True)
+def _normalize4(x1, x2, x3, x4):
+    """
+    防溢出的四维向量归一化：先除以最大分量再求模长
+    
+    分量超过sqrt(浮点上限)或极小时，直接平方求和会上溢/下溢，
+    缩放后平方和位于[1, 4]之间，float32下同样安全。
+    
+    Args:
+        x1, x2, x3, x4: 向量分量
+    
+    Returns:
+        归一化后的四个分量（全零输入原样返回）
+    """
+    m = max(abs(x1), abs(x2), abs(x3), abs(x4))
+    if m == 0.0:
+        return x1, x2, x3, x4
+    t1 = x1 / m
+    t2 = x2 / m
+    t3 = x3 / m
+    t4 = x4 / m
+    inv_norm = 1.0 / (m * math.sqrt(t1*t1 + t2*t2 + t3*t3 + t4*t4))
+    return x1 * inv_norm, x2 * inv_norm, x3 * inv_norm, x4 * inv_norm
+
+
+@njit(cache=True, fastmath=True)
+def _normalize_counted(q0, q1, q2, q3, steps):
+    """
+    归一化四元数并维护完整归一化计数
+    
+    通常使用无开方的一阶近似；每FULL_NORMALIZE_INTERVAL步，
+    或模长偏离1较多（如快速旋转）时做一次完整归一化。
+    
+    Args:
+        q0, q1, q2, q3: 未归一化的四元数
+        steps: 距上次完整归一化的步数
+    
+    Returns:
+        (w, x, y, z, steps): 归一化后的四元数及更新后的步数
+    """
+    steps += 1
+    norm_sq = q0*q0 + q1*q1 + q2*q2 + q3*q3
+    if steps >= FULL_NORMALIZE_INTERVAL or abs(norm_sq - 1.0) > FAST_NORMALIZE_TOLERANCE:
+        q0, q1, q2, q3 = _normalize4(q0, q1, q2, q3)
+        return q0, q1, q2, q3, 0
+    q0, q1, q2, q3 = quat_fast_normalize(q0, q1, q2, q3)
+    return q0, q1, q2, q3, steps
+
+
+@njit(cache=True, fastmath=True)
+def _madgwick_step(q0, q1, q2, q3, ax, ay, az, gyro_x, gyro_y, gyro_z, beta, dt, steps):
+    """
+    Madgwick单步更新内核
+    
+    Args:
+        q0, q1, q2, q3: 当前四元数
+        ax, ay, az: 加速度 (g)
+        gyro_x, gyro_y, gyro_z: 角速度 (度/秒)
+        beta: 梯度修正增益
+        dt: 时间间隔 (秒)
+        steps: 距上次完整归一化的步数
+    
+    Returns:
+        (w, x, y, z, steps): 同_normalize_counted
+    """
+    # 转换陀螺仪为弧度/秒，并预先乘以四元数导数中的0.5（半角速度）
+    gx = gyro_x * _HALF_DEG2RAD
+    gy = gyro_y * _HALF_DEG2RAD
+    gz = gyro_z * _HALF_DEG2RAD
+    
+    # 归一化加速度计数据（下限保护避免除零，无分支）
+    norm = math.sqrt(ax*ax + ay*ay + az*az)
+    inv_norm = 1.0 / max(norm, ACCEL_NORM_EPS)
+    ax *= inv_norm
+    ay *= inv_norm
+    az *= inv_norm
+    
+    # 辅助变量（避免重复计算）
+    _2q0 = 2.0 * q0
+    _2q1 = 2.0 * q1
+    _2q2 = 2.0 * q2
+    _2q3 = 2.0 * q3
+    q1q1_q2q2 = q1 * q1 + q2 * q2
+    # s1/s2共用的公因子：q3² + az - 1 + q0² + 2(q1² + q2²)
+    k12 = q0 * q0 + q3 * q3 + az - 1.0 + 2.0 * q1q1_q2q2
+    
+    # 梯度下降算法：计算目标函数的梯度
+    # 目标：使预测的重力方向与加速度计测量一致
+    # 梯度随后会被归一化，因此直接计算各项系数减半后的梯度（省去每项的乘2）
+    s0 = _2q0 * q1q1_q2q2 + q2 * ax - q1 * ay
+    s1 = _2q1 * k12 - q3 * ax - q0 * ay
+    s2 = _2q2 * k12 + q0 * ax - q3 * ay
+    s3 = _2q3 * q1q1_q2q2 - q1 * ax - q2 * ay
+    
+    # 归一化梯度（梯度为零时保持为零）
+    s0, s1, s2, s3 = _normalize4(s0, s1, s2, s3)
+    
+    # 陀螺仪积分的四元数导数（角速度已是半值）
+    qDot1 = -q1 * gx - q2 * gy - q3 * gz
+    qDot2 = q0 * gx + q2 * gz - q3 * gy
+    qDot3 = q0 * gy - q1 * gz + q3 * gx
+    qDot4 = q0 * gz + q1 * gy - q2 * gx
+    
+    # 加速度为零时修正增益为0，退化为纯陀螺仪积分（条件表达式编译为select，不产生分支）
+    beta = beta if norm > ACCEL_NORM_EPS else 0.0
+    
+    # 应用梯度修正并归一化
+    return _normalize_counted(q0 + (qDot1 - beta * s0) * dt,
+                              q1 + (qDot2 - beta * s1) * dt,
+                              q2 + (qDot3 - beta * s2) * dt,
+                              q3 + (qDot4 - beta * s3) * dt, steps)
+
+
+@njit(cache=True, fastmath=True)
+def _madgwick_step_euler(q0, q1, q2, q3, ax, ay, az, gyro_x, gyro_y, gyro_z, beta, dt, steps):
+    """
+    Madgwick单步更新并直接由新四元数计算欧拉角（一次内核调用完成）
+    
+    参数同_madgwick_step
+    
+    Returns:
+        (w, x, y, z, steps, roll, pitch, yaw): 新四元数、归一化步数、姿态角(度)
+    """
+    q0, q1, q2, q3, steps = _madgwick_step(q0, q1, q2, q3, ax, ay, az,
+                                           gyro_x, gyro_y, gyro_z, beta, dt, steps)
+    roll, pitch, yaw = quaternion_to_euler(q0, q1, q2, q3)
+    return q0, q1, q2, q3, steps, roll, pitch, yaw
+
+
+@njit(cache=True, fastmath=True)
+def _madgwick_run_batch(q0, q1, q2, q3, accels, gyros, dts, beta, steps):
+    """
+    批量Madgwick内核：四元数在整批样本间保持为局部变量
+    
+    Args:
+        q0, q1, q2, q3: 当前四元数
+        accels: (K, 3)加速度 (g)
+        gyros: (K, 3)角速度 (度/秒)
+        dts: (K,)时间间隔 (秒)
+        beta: 梯度修正增益
+        steps: 距上次完整归一化的步数
+    
+    Returns:
+        (w, x, y, z, steps): 更新后的四元数与归一化步数
+    """
+    for i in range(accels.shape[0]):
+        q0, q1, q2, q3, steps = _madgwick_step(
+            q0, q1, q2, q3, accels[i, 0], accels[i, 1], accels[i, 2],
+            gyros[i, 0], gyros[i, 1], gyros[i, 2], beta, dts[i], steps)
+    return q0, q1, q2, q3, steps
+
+
+def _as_sample_array(values):
+    """
+    将批量样本转换为连续数组：float32输入保持原精度（内核按元素提升到float64计算），
+    其他类型转换为float64
+    
+    Args:
+        values: 样本数组
+    
+    Returns:
+        C连续的float32或float64数组
+    """
+    values = np.asarray(values)
+    dtype = np.float32 if values.dtype == np.float32 else np.float64
+    return np.ascontiguousarray(values, dtype=dtype)
+
 
 class MadgwickQuaternion:
     """
@@ -36,10 +238,15 @@ class MadgwickQuaternion:
         self.sample_period = 1.0 / sample_freq
         
         # 四元数 [w, x, y, z] - 初始为单位四元数(无旋转)
-        self.q = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float64)
+        # 以四个标量属性保存，每帧更新无需numpy装箱/拆箱
+        self.q0, self.q1, self.q2, self.q3 = 1.0, 0.0, 0.0, 0.0
+        
+        # 旋转矩阵输出缓冲区（第4行/列保持单位阵，每次只重写3x3部分）
+        self._rot = np.eye(4, dtype=np.float32)
         
         # 统计信息
         self.update_count = 0
+        self._steps_since_normalize = 0  # 距上次完整归一化的步数
         
     def update(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, dt=None):
         """
@@ -58,100 +265,55 @@ class MadgwickQuaternion:
         else:
             sample_period = self.sample_period
         
-        # 转换陀螺仪为弧度/秒
-        gx = math.radians(gyro_x)
-        gy = math.radians(gyro_y)
-        gz = math.radians(gyro_z)
-        
-        # 归一化加速度计数据
-        ax, ay, az = accel_x, accel_y, accel_z
-        norm = math.sqrt(ax*ax + ay*ay + az*az)
-        
-        if norm == 0:
-            # 加速度为零，只使用陀螺仪
-            return self._update_imu_gyro_only(gx, gy, gz, sample_period)
-        
-        ax /= norm
-        ay /= norm
-        az /= norm
-        
-        # 提取四元数
-        q0, q1, q2, q3 = self.q
-        
-        # 辅助变量（避免重复计算）
-        _2q0 = 2.0 * q0
-        _2q1 = 2.0 * q1
-        _2q2 = 2.0 * q2
-        _2q3 = 2.0 * q3
-        _4q0 = 4.0 * q0
-        _4q1 = 4.0 * q1
-        _4q2 = 4.0 * q2
-        _8q1 = 8.0 * q1
-        _8q2 = 8.0 * q2
-        q0q0 = q0 * q0
-        q1q1 = q1 * q1
-        q2q2 = q2 * q2
-        q3q3 = q3 * q3
-        
-        # 梯度下降算法：计算目标函数的梯度
-        # 目标：使预测的重力方向与加速度计测量一致
-        s0 = _4q0 * q2q2 + _2q2 * ax + _4q0 * q1q1 - _2q1 * ay
-        s1 = _4q1 * q3q3 - _2q3 * ax + 4.0 * q0q0 * q1 - _2q0 * ay - _4q1 + _8q1 * q1q1 + _8q1 * q2q2 + _4q1 * az
-        s2 = 4.0 * q0q0 * q2 + _2q0 * ax + _4q2 * q3q3 - _2q3 * ay - _4q2 + _8q2 * q1q1 + _8q2 * q2q2 + _4q2 * az
-        s3 = 4.0 * q1q1 * q3 - _2q1 * ax + 4.0 * q2q2 * q3 - _2q2 * ay
-        
-        # 归一化梯度
-        norm = math.sqrt(s0*s0 + s1*s1 + s2*s2 + s3*s3)
-        if norm > 0:
-            s0 /= norm
-            s1 /= norm
-            s2 /= norm
-            s3 /= norm
-        
-        # 陀螺仪积分的四元数导数
-        qDot1 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
-        qDot2 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
-        qDot3 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
-        qDot4 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
-        
-        # 应用梯度修正
-        q0 += (qDot1 - self.beta * s0) * sample_period
-        q1 += (qDot2 - self.beta * s1) * sample_period
-        q2 += (qDot3 - self.beta * s2) * sample_period
-        q3 += (qDot4 - self.beta * s3) * sample_period
-        
-        # 归一化四元数
-        norm = math.sqrt(q0*q0 + q1*q1 + q2*q2 + q3*q3)
-        self.q[0] = q0 / norm
-        self.q[1] = q1 / norm
-        self.q[2] = q2 / norm
-        self.q[3] = q3 / norm
+        # 更新与欧拉角转换在同一次内核调用中完成
+        (self.q0, self.q1, self.q2, self.q3, self._steps_since_normalize,
+         roll, pitch, yaw) = _madgwick_step_euler(
+            self.q0, self.q1, self.q2, self.q3,
+            accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+            self.beta, sample_period, self._steps_since_normalize)
         
         self.update_count += 1
         
-        # 转换为欧拉角返回
-        return self.get_euler_angles()
+        return roll, pitch, yaw
     
-    def _update_imu_gyro_only(self, gx, gy, gz, dt):
-        """仅使用陀螺仪更新（当加速度计数据无效时）"""
-        q0, q1, q2, q3 = self.q
-        
-        qDot1 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
-        qDot2 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
-        qDot3 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
-        qDot4 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+    def update_batch(self, accels, gyros, dt=None):
+        """
+        按顺序处理一批样本，只返回最后一个样本后的姿态
         
-        q0 += qDot1 * dt
-        q1 += qDot2 * dt
-        q2 += qDot3 * dt
-        q3 += qDot4 * dt
+        Args:
+            accels: (K, 3)加速度数组 (g)，float32数组保持原精度传入内核
+            gyros: (K, 3)角速度数组 (度/秒)，float32数组保持原精度传入内核
+            dt: 时间间隔 (秒)，标量或(K,)数组，为None时使用sample_period
         
-        # 归一化
-        norm = math.sqrt(q0*q0 + q1*q1 + q2*q2 + q3*q3)
-        self.q[0] = q0 / norm
-        self.q[1] = q1 / norm
-        self.q[2] = q2 / norm
-        self.q[3] = q3 / norm
+        Returns:
+            (roll, pitch, yaw): 姿态角(度)
+        """
+        count = len(accels)
+        if count:
+            if dt is None:
+                dt = self.sample_period
+            dts = np.broadcast_to(np.asarray(dt, dtype=np.float64), (count,))
+            
+            if NUMBA_AVAILABLE:
+                (self.q0, self.q1, self.q2, self.q3,
+                 self._steps_since_normalize) = _madgwick_run_batch(
+                    self.q0, self.q1, self.q2, self.q3,
+                    _as_sample_array(accels),
+                    _as_sample_array(gyros),
+                    np.ascontiguousarray(dts),
+                    self.beta, self._steps_since_normalize)
+            else:
+                # 无numba时逐样本调用，先转为Python标量
+                q0, q1, q2, q3 = self.q0, self.q1, self.q2, self.q3
+                steps = self._steps_since_normalize
+                for (ax, ay, az), (gx, gy, gz), step_dt in zip(
+                        accels.tolist(), gyros.tolist(), dts.tolist()):
+                    q0, q1, q2, q3, steps = _madgwick_step(
+                        q0, q1, q2, q3, ax, ay, az, gx, gy, gz, self.beta, step_dt, steps)
+                self.q0, self.q1, self.q2, self.q3 = q0, q1, q2, q3
+                self._steps_since_normalize = steps
+            
+            self.update_count += count
         
         return self.get_euler_angles()
     
@@ -162,27 +324,16 @@ class MadgwickQuaternion:
         Returns:
             (roll, pitch, yaw): 姿态角(度)
         """
-        q0, q1, q2, q3 = self.q
-        
-        # Roll (X轴)
-        sinr_cosp = 2.0 * (q0 * q1 + q2 * q3)
-        cosr_cosp = 1.0 - 2.0 * (q1 * q1 + q2 * q2)
-        roll = math.atan2(sinr_cosp, cosr_cosp)
-        
-        # Pitch (Y轴)
-        sinp = 2.0 * (q0 * q2 - q3 * q1)
-        if abs(sinp) >= 1:
-            pitch = math.copysign(math.pi / 2, sinp)  # ±90度
-        else:
-            pitch = math.asin(sinp)
-        
-        # Yaw (Z轴)
-        siny_cosp = 2.0 * (q0 * q3 + q1 * q2)
-        cosy_cosp = 1.0 - 2.0 * (q2 * q2 + q3 * q3)
-        yaw = math.atan2(siny_cosp, cosy_cosp)
-        
-        # 转换为度数
-        return math.degrees(roll), math.degrees(pitch), math.degrees(yaw)
+        return quaternion_to_euler(self.q0, self.q1, self.q2, self.q3)
+    
+    @property
+    def q(self):
+        """当前四元数 [w, x, y, z] 的numpy数组副本（兼容旧接口）"""
+        return np.array([self.q0, self.q1, self.q2, self.q3], dtype=np.float64)
+    
+    @q.setter
+    def q(self, value):
+        self.q0, self.q1, self.q2, self.q3 = (float(v) for v in value)
     
     def get_quaternion(self):
         """
@@ -191,16 +342,17 @@ class MadgwickQuaternion:
         Returns:
             (w, x, y, z): 四元数
         """
-        return tuple(self.q)
+        return (self.q0, self.q1, self.q2, self.q3)
     
     def get_rotation_matrix(self):
         """
         获取旋转矩阵（4x4，用于OpenGL）
         
         Returns:
-            4x4旋转矩阵 (numpy array)
+            4x4旋转矩阵 (numpy array)，为内部复用的缓冲区，
+            下次调用时会被覆盖，需要保留时请自行copy()
         """
-        q0, q1, q2, q3 = self.q
+        q0, q1, q2, q3 = self.q0, self.q1, self.q2, self.q3
         
         # 优化的四元数到旋转矩阵转换
         q0q0 = q0 * q0
@@ -215,19 +367,24 @@ class MadgwickQuaternion:
         q13 = q1 * q3
         q23 = q2 * q3
         
-        matrix = np.array([
-            [q0q0 + q1q1 - q2q2 - q3q3, 2.0 * (q12 - q03),           2.0 * (q13 + q02),           0.0],
-            [2.0 * (q12 + q03),           q0q0 - q1q1 + q2q2 - q3q3, 2.0 * (q23 - q01),           0.0],
-            [2.0 * (q13 - q02),           2.0 * (q23 + q01),           q0q0 - q1q1 - q2q2 + q3q3, 0.0],
-            [0.0,                         0.0,                         0.0,                         1.0]
-        ], dtype=np.float32)
+        rot = self._rot
+        rot[0, 0] = q0q0 + q1q1 - q2q2 - q3q3
+        rot[0, 1] = 2.0 * (q12 - q03)
+        rot[0, 2] = 2.0 * (q13 + q02)
+        rot[1, 0] = 2.0 * (q12 + q03)
+        rot[1, 1] = q0q0 - q1q1 + q2q2 - q3q3
+        rot[1, 2] = 2.0 * (q23 - q01)
+        rot[2, 0] = 2.0 * (q13 - q02)
+        rot[2, 1] = 2.0 * (q23 + q01)
+        rot[2, 2] = q0q0 - q1q1 - q2q2 + q3q3
         
-        return matrix
+        return rot
     
     def reset(self):
         """重置为初始姿态（单位四元数）"""
-        self.q = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float64)
+        self.q0, self.q1, self.q2, self.q3 = 1.0, 0.0, 0.0, 0.0
         self.update_count = 0
+        self._steps_since_normalize = 0
     
     def set_beta(self, beta):
         """
@@ -247,7 +404,7 @@ class MadgwickQuaternion:
         """
         return {
             'updates': self.update_count,
-            'quaternion': self.q.tolist(),
+            'quaternion': [self.q0, self.q1, self.q2, self.q3],
             'beta': self.beta,
             'sample_freq': self.sample_freq
         }
@@ -272,37 +429,25 @@ class AttitudeCalculator(MadgwickQuaternion):
         beta = (1 - alpha) * 2.0  # 经验转换公式
         beta = max(0.033, min(0.3, beta))  # 限制范围
         
+        # sample_freq=10Hz，即默认dt=0.1秒，与旧接口update(dt=0.1)一致，
+        # 因此update/update_batch直接沿用基类实现，无需逐帧包装
         super().__init__(beta=beta, sample_freq=10.0)
-        
-        # 保存欧拉角用于兼容性
-        self.roll = 0.0
-        self.pitch = 0.0
-        self.yaw = 0.0
     
-    def update(self, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z, dt=0.1):
-        """
-        更新姿态角（兼容旧接口）
-        
-        Args:
-            accel_x, accel_y, accel_z: 加速度 (g)
-            gyro_x, gyro_y, gyro_z: 角速度 (度/秒)
-            dt: 时间间隔 (秒)
-        
-        Returns:
-            (roll, pitch, yaw): 姿态角(度)
-        """
-        # 调用Madgwick更新
-        roll, pitch, yaw = super().update(accel_x, accel_y, accel_z, 
-                                          gyro_x, gyro_y, gyro_z, dt)
-        
-        # 保存结果
-        self.roll = roll
-        self.pitch = pitch
-        self.yaw = yaw
-        
-        return roll, pitch, yaw
+    # 欧拉角属性（兼容旧接口），读取时由当前四元数计算，更新时无需额外赋值
+    @property
+    def roll(self):
+        return self.get_euler_angles()[0]
+    
+    @property
+    def pitch(self):
+        return self.get_euler_angles()[1]
+    
+    @property
+    def yaw(self):
+        return self.get_euler_angles()[2]
 
 
+@njit(cache=True, fastmath=True)
 def euler_to_quaternion(roll, pitch, yaw):
     """
     欧拉角转四元数
@@ -313,16 +458,16 @@ def euler_to_quaternion(roll, pitch, yaw):
     Returns:
         (w, x, y, z): 四元数
     """
-    roll_rad = math.radians(roll)
-    pitch_rad = math.radians(pitch)
-    yaw_rad = math.radians(yaw)
+    half_roll = roll * _HALF_DEG2RAD
+    half_pitch = pitch * _HALF_DEG2RAD
+    half_yaw = yaw * _HALF_DEG2RAD
     
-    cr = math.cos(roll_rad * 0.5)
-    sr = math.sin(roll_rad * 0.5)
-    cp = math.cos(pitch_rad * 0.5)
-    sp = math.sin(pitch_rad * 0.5)
-    cy = math.cos(yaw_rad * 0.5)
-    sy = math.sin(yaw_rad * 0.5)
+    cr = math.cos(half_roll)
+    sr = math.sin(half_roll)
+    cp = math.cos(half_pitch)
+    sp = math.sin(half_pitch)
+    cy = math.cos(half_yaw)
+    sy = math.sin(half_yaw)
     
     w = cr * cp * cy + sr * sp * sy
     x = sr * cp * cy - cr * sp * sy
@@ -332,6 +477,7 @@ def euler_to_quaternion(roll, pitch, yaw):
     return w, x, y, z
 
 
+@njit(cache=True, fastmath=True)
 def quaternion_to_euler(w, x, y, z):
     """
     四元数转欧拉角
@@ -348,18 +494,16 @@ def quaternion_to_euler(w, x, y, z):
     roll = math.atan2(sinr_cosp, cosr_cosp)
     
     # Pitch (y轴)
+    # 限幅到[-1, 1]：asin(±1) = ±90°，万向锁附近无需分支
     sinp = 2 * (w * y - z * x)
-    if abs(sinp) >= 1:
-        pitch = math.copysign(math.pi / 2, sinp)
-    else:
-        pitch = math.asin(sinp)
+    pitch = math.asin(max(-1.0, min(1.0, sinp)))
     
     # Yaw (z轴)
     siny_cosp = 2 * (w * z + x * y)
     cosy_cosp = 1 - 2 * (y * y + z * z)
     yaw = math.atan2(siny_cosp, cosy_cosp)
     
-    return math.degrees(roll), math.degrees(pitch), math.degrees(yaw)
+    return roll * _RAD2DEG, pitch * _RAD2DEG, yaw * _RAD2DEG
 
 
 # 测试代码
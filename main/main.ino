@@ -591,14 +591,19 @@ void handleRoot() {
 unsigned long lastSensorReadTime = 0;
 const unsigned long sensorReadInterval = 20;  // 20ms采样间隔（50Hz）
 
-void handleData() {
-  // 性能优化：缓存机制 - 避免每次HTTP请求都读传感器
-  // 只有距离上次读取超过20ms才重新读取
+// 按需刷新传感器缓存
+// 性能优化：缓存机制 - 避免每次HTTP请求都读传感器
+// 只有距离上次读取超过20ms才重新读取
+void refreshSensorData() {
   unsigned long currentTime = millis();
   if (currentTime - lastSensorReadTime >= sensorReadInterval) {
     readSensorData();
     lastSensorReadTime = currentTime;
   }
+}
+
+void handleData() {
+  refreshSensorData();
   
   // 优化JSON构建 - 使用snprintf减少内存分配
   char json[256];  // 预分配缓冲区
@@ -617,6 +622,39 @@ void handleData() {
   server.send(200, "application/json", json);
 }
 
+// 二进制数据包（小端，36字节）：比JSON小约4倍，客户端用struct直接解包
+// 布局：7×float(加速度、角速度、温度) + float角度 + uint16原始角度 + uint16标志位
+#define PACKET_FLAG_VALID        0x01  // IMU数据有效
+#define PACKET_FLAG_ANGLE_VALID  0x02  // MT6701角度有效
+
+struct __attribute__((packed)) SensorPacket {
+  float accelX, accelY, accelZ;
+  float gyroX, gyroY, gyroZ;
+  float temp;
+  float angle;
+  uint16_t angleRaw;
+  uint16_t flags;
+};
+
+void handleDataBin() {
+  refreshSensorData();
+  
+  SensorPacket packet;
+  packet.accelX = sensorData.accelX;
+  packet.accelY = sensorData.accelY;
+  packet.accelZ = sensorData.accelZ;
+  packet.gyroX = sensorData.gyroX;
+  packet.gyroY = sensorData.gyroY;
+  packet.gyroZ = sensorData.gyroZ;
+  packet.temp = sensorData.temp;
+  packet.angle = sensorData.angle;
+  packet.angleRaw = sensorData.angleRaw;
+  packet.flags = (sensorData.isValid ? PACKET_FLAG_VALID : 0) |
+                 (sensorData.angleValid ? PACKET_FLAG_ANGLE_VALID : 0);
+  
+  server.send_P(200, "application/octet-stream", (const char*)&packet, sizeof(packet));
+}
+
 void setup() {
   // 初始化串口
   Serial.begin(115200);
@@ -701,6 +739,7 @@ void setup() {
   // 配置Web服务器
   server.on("/", handleRoot);
   server.on("/data", handleData);
+  server.on("/data_bin", handleDataBin);
   server.begin();
   
   Serial.println("\n========================================");